@@ -5,20 +5,40 @@ Final Year Project - Complete Implementation
 
 import streamlit as st
 from dotenv import load_dotenv
+import functools
 import os
 import sys
+import threading
+import time
+import uuid
 
 # Add paths
 sys.path.append(os.path.dirname(__file__))
 
 from utils.transcript_extractor import TranscriptExtractor
+from utils.transcript_normalizer import TranscriptNormalizer
 from services.notes_generator import NotesGenerator
 from services.quiz_generator import QuizGenerator
+from services.study_pack_generator import StudyPackGenerator
+from services.video_qa import VideoQA
+from services.course_notes import CourseNotesGenerator
+from services.gemini_gateway import GeminiGateway
+from services.prefetcher import prefetcher
+from services.fair_scheduler import FairScheduler, fair_scheduler, in_current_context
 from utils.pdf_generator import PDFGenerator
+from utils.extractive_notes import ExtractiveNotes
+from utils.transcript_index import transcript_index
+from utils.deadline import Deadline
+from utils.metrics import metrics, start_metrics_server
+from utils.token_ledger import token_ledger
+from utils.api_key_manager import APIKeyManager
 
 # Load environment
 load_dotenv()
 
+# ✅ Expose /metrics when METRICS_PORT is set (no-op otherwise, safe on reruns)
+start_metrics_server()
+
 
 # ========== SESSION STATE INITIALIZATION ==========
 # Initialize current_page for navigation
@@ -51,9 +71,20 @@ if 'video_url' not in st.session_state:
     
 if 'notes' not in st.session_state:
     st.session_state.notes = None
+
+if 'notes_offline' not in st.session_state:
+    st.session_state.notes_offline = False  # ✅ "quota" / "no_key" while showing local extractive notes
     
 if 'quiz_data' not in st.session_state:
     st.session_state.quiz_data = None
+
+# Ask-the-video turns: [{"video_id", "question", "answer", "info"}]
+if 'qa_history' not in st.session_state:
+    st.session_state.qa_history = []
+
+# Last built course (CourseNotesGenerator.build result)
+if 'course_result' not in st.session_state:
+    st.session_state.course_result = None
     
 if 'user_answers' not in st.session_state:
     st.session_state.user_answers = {}
@@ -61,6 +92,64 @@ if 'user_answers' not in st.session_state:
 if 'quiz_submitted' not in st.session_state:
     st.session_state.quiz_submitted = False
 
+# Anonymous per-session id used by the question bank to avoid repeats
+if 'user_id' not in st.session_state:
+    st.session_state.user_id = uuid.uuid4().hex
+
+# ✅ Every Gemini call from this run counts against this session's fair share
+FairScheduler.set_tenant(st.session_state.user_id)
+
+# Live state of a streaming quiz generation ({"questions", "done", "expected", "deadline"})
+if 'quiz_stream' not in st.session_state:
+    st.session_state.quiz_stream = None
+
+# In-flight request deadlines for this session (Clear All cancels them)
+if 'deadlines' not in st.session_state:
+    st.session_state.deadlines = []
+
+
+def new_deadline(seconds=None) -> Deadline:
+    """Fresh request deadline, tracked so Clear All can cancel it"""
+    st.session_state.deadlines = [d for d in st.session_state.deadlines if not d.expired()]
+    deadline = Deadline.for_request(seconds)
+    st.session_state.deadlines.append(deadline)
+    return deadline
+
+
+def cancel_all_requests():
+    """Stop every generation this session still has in flight (prefetch and streams included)"""
+    for deadline in st.session_state.deadlines:
+        deadline.cancel("Cleared")
+    st.session_state.deadlines = []
+
+
+def run_cancellable(fn, label: str, seconds=None, status=None):
+    """
+    Run fn off the script thread under a new deadline
+    Clicking Cancel (or anything else) reruns the script, which interrupts the wait and cancels fn
+    status: optional callable returning a progress string shown next to the countdown
+    """
+    deadline = new_deadline(seconds)
+    cancel_slot, ticker = st.empty(), st.empty()
+    cancel_slot.button("⏹️ Cancel", key=f"cancel_{label}")
+
+    def tick(d):
+        progress = f" — {status()}" if status else ""
+        ticker.caption(f"⏳ {label}{progress} — {d.remaining():.0f}s left")
+
+    try:
+        return deadline.run(fn, on_tick=tick)
+    finally:
+        cancel_slot.empty()
+        ticker.empty()
+
+
+def offline_reason(error) -> str:
+    """Why AI notes failed, if offline extractive notes should stand in ("no_key" / "quota", else "")"""
+    if error == NotesGenerator.NO_KEY_ERROR or APIKeyManager().total_keys() == 0:
+        return "no_key"
+    return "quota" if error and GeminiGateway.is_quota_error(error) else ""
+
 
 # Page configuration
 st.set_page_config(
@@ -476,6 +565,38 @@ with st.sidebar:
         st.button("📊 Quiz Setup (Transcript needed)", key="nav_quiz_disabled",
                 use_container_width=True, disabled=True)
 
+    # SEARCH BUTTON - Always visible (searches every transcript extracted on this server)
+    if st.session_state.page == "search":
+        st.markdown("""
+        <div style='background: linear-gradient(135deg, #43e97b 0%, #38f9d7 100%);
+                    padding: 1rem; border-radius: 10px; margin-bottom: 0.5rem;
+                    box-shadow: 0 4px 12px rgba(67, 233, 123, 0.4);'>
+            <p style='color: #000000; margin: 0; font-size: 1.2rem; font-weight: 700;'>
+                🔎 Search Library <span style='font-size: 0.9rem;'>← You are here</span>
+            </p>
+        </div>
+        """, unsafe_allow_html=True)
+    else:
+        if st.button("🔎 Search Library", key="nav_search", use_container_width=True, type="primary"):
+            st.session_state.page = "search"
+            st.rerun()
+
+    # COURSE BUTTON - Always visible (playlist / multi-video notes)
+    if st.session_state.page == "course":
+        st.markdown("""
+        <div style='background: linear-gradient(135deg, #fa709a 0%, #fee140 100%);
+                    padding: 1rem; border-radius: 10px; margin-bottom: 0.5rem;
+                    box-shadow: 0 4px 12px rgba(250, 112, 154, 0.4);'>
+            <p style='color: #000000; margin: 0; font-size: 1.2rem; font-weight: 700;'>
+                📚 Course Notes <span style='font-size: 0.9rem;'>← You are here</span>
+            </p>
+        </div>
+        """, unsafe_allow_html=True)
+    else:
+        if st.button("📚 Course Notes", key="nav_course", use_container_width=True, type="primary"):
+            st.session_state.page = "course"
+            st.rerun()
+
     st.markdown("---")
 
 
@@ -543,11 +664,14 @@ with st.sidebar:
         
         # Clear all button
         if st.button("🗑️ Clear All Data", use_container_width=True):
+            cancel_all_requests()
             st.session_state.transcript = None
             st.session_state.video_id = None
             st.session_state.video_url = None
             st.session_state.notes = None
+            st.session_state.notes_offline = False
             st.session_state.quiz_data = None
+            st.session_state.quiz_stream = None
             st.session_state.user_answers = {}
             st.session_state.quiz_submitted = False
             st.session_state.page = 'home'
@@ -555,6 +679,14 @@ with st.sidebar:
     
     st.markdown("---")
     
+    # ========== ADMIN (open app with ?admin=1) ==========
+    if st.query_params.get("admin") == "1":
+        st.markdown("### 🛠️ Admin")
+        if st.button("📈 System Metrics", key="nav_metrics", use_container_width=True):
+            st.session_state.page = 'metrics'
+            st.rerun()
+        st.markdown("---")
+    
     # ========== FOOTER ==========
     st.markdown("""
     <div style='text-align: center; color: #666; font-size: 0.8rem; padding: 1rem 0;'>
@@ -635,6 +767,13 @@ if st.session_state.page == 'home':
 
     st.markdown("")
 
+    prefetch_mode = st.checkbox(
+        "⚡ Prepare notes & a 5-question quiz in the background after extraction",
+        value=prefetcher.enabled_by_default(),
+        key="prefetch_toggle",
+        help="Uses spare API quota; switches itself off when quota runs low"
+    )
+
     # ========== EXTRACT BUTTON SECTION ==========
     col1, col2 = st.columns(2)
     with col1:
@@ -649,7 +788,11 @@ if st.session_state.page == 'home':
                     video_id = TranscriptExtractor.extract_video_id(youtube_url)
                     st.info(f"🎬 Video ID: `{video_id}`")
                     with st.spinner("🔄 Extracting transcript..."):
-                        transcript, error = TranscriptExtractor.get_transcript(video_id)
+                        segments, error = run_cancellable(
+                            functools.partial(TranscriptExtractor.get_transcript_segments, video_id),
+                            "Fetching captions", seconds=45
+                        )
+                        transcript, clean_stats = TranscriptNormalizer.normalize(segments or [])
                     if transcript:
                         st.session_state.transcript = transcript
                         st.session_state.video_id = video_id
@@ -658,19 +801,32 @@ if st.session_state.page == 'home':
                         st.session_state.transcript_stats = {
                             'words': len(transcript.split()),
                             'chars': len(transcript),
-                            'duration': f"~{len(transcript.split())//150} min"
+                            'duration': f"~{len(transcript.split())//150} min",
+                            'compression': clean_stats['compression_ratio']
                         }
+                        # ✅ Make the video findable from the Search Library page (merges run off the UI thread)
+                        threading.Thread(
+                            target=transcript_index.add,
+                            args=(video_id, segments, (st.session_state.video_metadata or {}).get('title')),
+                            daemon=True
+                        ).start()
+                        if prefetch_mode:
+                            prefetcher.schedule(transcript, video_id,
+                                                deadline=new_deadline(prefetcher.JOB_DEADLINE_SECONDS))
                         st.success("✅ Transcript extracted successfully!")
                         st.rerun()
                     else:
-                        st.error(f"❌ {error}")
+                        st.error(f"❌ {error or 'Transcript is empty after cleanup'}")
 
     with col2:
         if st.button("🔄 Clear All", type="primary",use_container_width=True):
+            cancel_all_requests()
             st.session_state.transcript = None
             st.session_state.video_id = None
             st.session_state.notes = None
+            st.session_state.notes_offline = False
             st.session_state.quiz_data = None
+            st.session_state.quiz_stream = None
             st.session_state.youtube_url = ''      # ✅ Also clear saved URL
             st.session_state.transcript_stats = None
             st.rerun()
@@ -679,15 +835,59 @@ if st.session_state.page == 'home':
     if st.session_state.transcript:
         stats = st.session_state.transcript_stats
         if stats:
-            col1, col2, col3 = st.columns(3)
+            col1, col2, col3, col4 = st.columns(4)
             with col1:
                 st.metric("Words", stats['words'])
             with col2:
                 st.metric("Characters", stats['chars'])
             with col3:
                 st.metric("Duration", stats['duration'])
+            with col4:
+                if 'compression' in stats:
+                    st.metric("Cleaned Size", f"{stats['compression']:.0%}",
+                              help="Size after removing [Music] markers, fillers and repeated captions")
         st.success("✅ Transcript extracted! Use sidebar to navigate.")
         st.info("👈 **Use sidebar to generate Notes or Quiz!**")
+
+        # ========== STUDY PACK (notes + quiz in one call) ==========
+        if not st.session_state.notes and not st.session_state.quiz_data:
+            col1, col2 = st.columns([1, 2])
+            with col1:
+                pack_questions = st.selectbox(
+                    "Quiz questions",
+                    options=[5, 10],
+                    index=0,
+                    key="pack_questions_select"
+                )
+            with col2:
+                st.markdown("")
+                if st.button("📦 Generate Notes + Quiz together", use_container_width=True,
+                             key="study_pack_btn", help="One AI call instead of two — faster, uses half the quota"):
+                    with st.spinner("🤖 Creating your notes and quiz in one go..."):
+                        notes, quiz_data, warnings = run_cancellable(
+                            functools.partial(
+                                StudyPackGenerator().generate,
+                                st.session_state.transcript,
+                                pack_questions,
+                                "Medium",
+                                video_id=st.session_state.video_id,
+                                user_id=st.session_state.user_id
+                            ),
+                            "Building study pack"
+                        )
+                    for warning in dict.fromkeys(warnings):
+                        st.warning(warning)
+                    if notes and quiz_data:
+                        st.session_state.notes = notes
+                        st.session_state.notes_offline = False
+                        st.session_state.quiz_data = quiz_data
+                        st.session_state.quiz_submitted = False
+                        st.session_state.user_answers = {}
+                        st.session_state.page = 'notes'
+                        st.rerun()
+                    else:
+                        st.error("❌ Could not build the study pack — use Notes and Quiz separately.")
+
         st.markdown("---")
         with st.expander("📄 View Transcript", expanded=False):
             st.text_area("Transcript Content", st.session_state.transcript, height=300, disabled=True, label_visibility="collapsed")
@@ -708,6 +908,15 @@ elif st.session_state.page == 'notes':
                 st.session_state.page = 'home'
                 st.rerun()
     else:
+        # ✅ Pick up notes prepared in the background after extraction
+        if not st.session_state.notes:
+            if prefetcher.pending("notes", st.session_state.video_id):
+                with st.spinner("⚡ Notes are already being prepared in the background..."):
+                    run_cancellable(functools.partial(prefetcher.wait, "notes", st.session_state.video_id),
+                                    "Waiting for background notes")
+            st.session_state.notes = prefetcher.take_notes(st.session_state.video_id)
+            st.session_state.notes_offline = False
+
         if not st.session_state.notes:
             # Generate Notes Section
             st.info("💡 Click the button below to generate comprehensive AI-powered notes from your transcript")
@@ -721,20 +930,55 @@ elif st.session_state.page == 'notes':
                             st.write("🧠 Extracting key concepts...")
                             st.write("📝 Formatting notes...")
                             
-                            notes_gen = NotesGenerator()
-                            notes, error = notes_gen.generate_notes(st.session_state.transcript)
+                            notes_gen = NotesGenerator(silent=True)
+                            notes, error = run_cancellable(
+                                functools.partial(notes_gen.generate_notes, st.session_state.transcript,
+                                                  video_id=st.session_state.video_id),
+                                "Generating notes"
+                            )
                             
                             if notes:
                                 st.session_state.notes = notes
+                                st.session_state.notes_offline = False
                                 status.update(label="✅ Notes generated successfully!", state="complete")
                                 st.rerun()
+                            elif offline_reason(error) and len(st.session_state.transcript) >= 50:
+                                # ✅ No quota left or no key — fall back to local extractive notes
+                                st.session_state.notes = ExtractiveNotes.generate(st.session_state.transcript)
+                                st.session_state.notes_offline = offline_reason(error)
+                                status.update(label="⚡ AI unavailable — built offline notes", state="complete")
+                                st.rerun()
                             else:
                                 status.update(label="❌ Generation failed", state="error")
                                 st.error(f"Error: {error}")
                                 st.info("💡 Try again or check your API key configuration")
         else:
             # Display Generated Notes
-            st.success("✅ Notes generated successfully! Review and download below.")
+            if st.session_state.notes_offline == "no_key":
+                st.warning("⚡ Offline notes — no Gemini API key is configured, so these were extracted locally from the transcript.")
+                st.caption("Add a Gemini API key to upgrade to AI notes.")
+            elif st.session_state.notes_offline:
+                st.warning("⚡ Offline notes — AI quota is unavailable, so these were extracted locally from the transcript.")
+                key_labels = [f"key{i + 1}" for i in range(max(APIKeyManager().total_keys(), 1))]
+                if GeminiGateway.quota_available(key_labels):
+                    if st.button("✨ Upgrade to AI notes", type="primary", key="upgrade_notes_btn"):
+                        with st.spinner("🤖 AI is rewriting your notes..."):
+                            notes, error = run_cancellable(
+                                functools.partial(NotesGenerator(silent=True).generate_notes,
+                                                  st.session_state.transcript,
+                                                  video_id=st.session_state.video_id),
+                                "Upgrading notes"
+                            )
+                        if notes:
+                            st.session_state.notes = notes
+                            st.session_state.notes_offline = False
+                            st.rerun()
+                        else:
+                            st.error(f"Error: {error}")
+                else:
+                    st.caption("The AI upgrade will be offered again once quota recovers.")
+            else:
+                st.success("✅ Notes generated successfully! Review and download below.")
             st.markdown("---")
             
             # ========== ONLY 3 ACTION BUTTONS - CLEAN VERSION ==========
@@ -747,6 +991,7 @@ elif st.session_state.page == 'notes':
                 # ✅ CHANGED: Copy button replaced with Regenerate button
                 if st.button("🔄 Regenerate Notes", use_container_width=True, type="primary", key="regen_btn"):
                     st.session_state.notes = None
+                    st.session_state.notes_offline = False
                     st.rerun()
 
             with col2:
@@ -780,6 +1025,34 @@ elif st.session_state.page == 'notes':
                 except Exception as e:
                     st.error(f"PDF error: {str(e)}")
 
+            # ========== SINGLE-SECTION REGENERATION ==========
+            with st.expander("🎯 Improve a single section (faster than regenerating everything)", expanded=False):
+                section_names = [heading for heading, _ in NotesGenerator.SECTIONS]
+                sec_col1, sec_col2 = st.columns([2, 1])
+                with sec_col1:
+                    section_choice = st.selectbox(
+                        "Section to regenerate",
+                        options=section_names,
+                        index=section_names.index("💡 Practical Takeaways"),
+                        key="regen_section_select",
+                        label_visibility="collapsed"
+                    )
+                with sec_col2:
+                    if st.button("🔄 Regenerate Section", type="primary", use_container_width=True, key="regen_section_btn"):
+                        with st.spinner(f"🤖 Rewriting {section_choice}..."):
+                            notes_gen = NotesGenerator(silent=True)
+                            updated, error = run_cancellable(
+                                functools.partial(notes_gen.regenerate_section, st.session_state.transcript,
+                                                  st.session_state.notes, section_choice,
+                                                  video_id=st.session_state.video_id),
+                                "Rewriting section"
+                            )
+                        if updated:
+                            st.session_state.notes = updated
+                            st.rerun()
+                        else:
+                            st.error(f"Error: {error}")
+
             st.markdown("---")
             
             # Display notes with enhanced formatting
@@ -798,6 +1071,50 @@ elif st.session_state.page == 'notes':
                 # Raw markdown view
                 st.code(st.session_state.notes, language="markdown")
             
+            # ========== ASK THE VIDEO ==========
+            st.markdown("---")
+            st.markdown("## 💬 Ask the Video")
+            st.caption("Answers use only the transcript passages that match your question")
+            qa_turns = [t for t in st.session_state.qa_history if t['video_id'] == st.session_state.video_id]
+            for turn in qa_turns:
+                st.markdown(f"**🙋 {turn['question']}**")
+                st.markdown(turn['answer'])
+                info = turn['info']
+                if info.get('sources'):
+                    with st.expander(f"📎 {len(info['sources'])} of {info['chunks_total']} passages used "
+                                     f"· retrieved in {info['retrieval_ms']:.1f} ms · ~{info['prompt_tokens']} prompt tokens",
+                                     expanded=False):
+                        for source in info['sources']:
+                            st.markdown(f"> {source['text']}")
+
+            qa_col1, qa_col2 = st.columns([4, 1])
+            with qa_col1:
+                qa_question = st.text_input(
+                    "Your question",
+                    placeholder="e.g. Why does a large learning rate overshoot?",
+                    key=f"qa_input_{len(qa_turns)}",
+                    label_visibility="collapsed"
+                )
+            with qa_col2:
+                ask_clicked = st.button("💬 Ask", type="primary", use_container_width=True, key="qa_ask_btn")
+            if ask_clicked and qa_question.strip():
+                with st.spinner("🤖 Looking through the video..."):
+                    qa_answer, qa_info, error = run_cancellable(
+                        functools.partial(VideoQA(silent=True).answer, st.session_state.transcript, qa_question,
+                                          video_id=st.session_state.video_id, history=qa_turns),
+                        "Answering"
+                    )
+                if qa_answer:
+                    st.session_state.qa_history.append({
+                        'video_id': st.session_state.video_id,
+                        'question': qa_question.strip(),
+                        'answer': qa_answer,
+                        'info': qa_info,
+                    })
+                    st.rerun()
+                else:
+                    st.error(f"Error: {error}")
+
             # Back to home button at bottom
             st.markdown("---")
             col1, col2, col3 = st.columns([1, 1, 1])
@@ -975,6 +1292,13 @@ elif st.session_state.page == 'quiz_setup':
                     label_visibility="collapsed"
                 )
 
+            st.markdown("")
+            stream_mode = st.checkbox(
+                "⚡ Start answering while the remaining questions are still generating",
+                value=False,
+                key="stream_quiz_toggle"
+            )
+
             st.markdown("---")
             st.markdown("")
 
@@ -982,30 +1306,70 @@ elif st.session_state.page == 'quiz_setup':
             col1, col2, col3 = st.columns([1, 2, 1])
             with col2:
                 if st.button("🚀 Generate Quiz", type="primary", use_container_width=True, key="generate_quiz_btn"):
-                    with st.spinner("🤖 AI is creating your quiz... This may take 30-60 seconds..."):
-                        with st.status("Processing...", expanded=True) as status:
-                            st.write("📊 Analyzing content...")
-                            st.write("❓ Generating questions...")
-                            st.write("✅ Creating answers...")
-
-                            quiz_gen = QuizGenerator()
-                            quiz_data = quiz_gen.generate_quiz(
-                                st.session_state.transcript,
-                                num_questions,
-                                difficulty
-                            )
-
-                        if quiz_data:
-                            st.session_state.quiz_data = quiz_data
-                            st.session_state.quiz_submitted = False
-                            st.session_state.user_answers = {}
-                            st.session_state.page = 'quiz'
-                            status.update(label="✅ Quiz ready!", state="complete")
-                            st.rerun()
-                        else:
-                            status.update(label="❌ Generation failed", state="error")
-                            st.error("Failed to generate quiz. Please try again.")
-                            st.info("💡 Try with fewer questions or check API key")
+                    # A background prefetch is filling the question bank — let it land first
+                    if prefetcher.pending("quiz", st.session_state.video_id):
+                        with st.spinner("⚡ Questions are already being prepared in the background..."):
+                            run_cancellable(functools.partial(prefetcher.wait, "quiz", st.session_state.video_id),
+                                            "Waiting for background questions")
+                    if stream_mode:
+                        quiz_gen = QuizGenerator()
+                        # No key or no quota still streams offline cloze questions
+                        # Background thread fills the shared list; the quiz page re-renders as it grows
+                        stream_state = {"questions": [], "done": False, "expected": num_questions,
+                                        "deadline": new_deadline()}
+
+                        def _consume_stream(gen=quiz_gen, transcript=st.session_state.transcript,
+                                            n=num_questions, level=difficulty,
+                                            video_id=st.session_state.video_id,
+                                            user_id=st.session_state.user_id, state=stream_state):
+                            try:
+                                with state["deadline"].activate():
+                                    for question in gen.stream_quiz(transcript, n, level, video_id=video_id,
+                                                                    user_id=user_id):
+                                        state["questions"].append(question)
+                            finally:
+                                state["done"] = True
+
+                        threading.Thread(target=in_current_context(_consume_stream), daemon=True,
+                                         name="quiz-stream").start()
+                        st.session_state.quiz_stream = stream_state
+                        st.session_state.quiz_data = {"questions": stream_state["questions"]}
+                        st.session_state.quiz_submitted = False
+                        st.session_state.user_answers = {}
+                        st.session_state.page = 'quiz'
+                        st.rerun()
+                    else:
+                        with st.spinner("🤖 AI is creating your quiz... This may take 30-60 seconds..."):
+                            with st.status("Processing...", expanded=True) as status:
+                                st.write("📊 Analyzing content...")
+                                st.write("❓ Generating questions...")
+                                st.write("✅ Creating answers...")
+
+                                quiz_gen = QuizGenerator()
+                                # Clicking Cancel reruns the script, which cancels the generation
+                                cancel_slot = st.empty()
+                                cancel_slot.button("⏹️ Cancel", key="cancel_quiz_btn")
+                                quiz_data = quiz_gen.generate_quiz(
+                                    st.session_state.transcript,
+                                    num_questions,
+                                    difficulty,
+                                    video_id=st.session_state.video_id,
+                                    user_id=st.session_state.user_id,
+                                    deadline=new_deadline()
+                                )
+                                cancel_slot.empty()
+
+                            if quiz_data:
+                                st.session_state.quiz_data = quiz_data
+                                st.session_state.quiz_submitted = False
+                                st.session_state.user_answers = {}
+                                st.session_state.page = 'quiz'
+                                status.update(label="✅ Quiz ready!", state="complete")
+                                st.rerun()
+                            else:
+                                status.update(label="❌ Generation failed", state="error")
+                                st.error("Failed to generate quiz. Please try again.")
+                                st.info("💡 Try with fewer questions or check API key")
 
 # ==================== QUIZ PAGE ====================
 elif st.session_state.page == 'quiz':
@@ -1018,11 +1382,28 @@ elif st.session_state.page == 'quiz':
             st.rerun()
     else:
         quiz = st.session_state.quiz_data
-        questions = quiz.get('questions', [])
+        # Snapshot — a streaming generation may still be appending to this list
+        questions = list(quiz.get('questions', []))
+        
+        stream = st.session_state.quiz_stream
+        still_generating = stream is not None and not stream["done"]
+        if stream is not None and stream["done"]:
+            st.session_state.quiz_stream = None
+            if not questions:
+                st.session_state.quiz_data = None
+                st.error("❌ Failed to generate quiz. Please try again with fewer questions.")
+                st.stop()
         
         if not st.session_state.quiz_submitted:
             # Display questions
-            st.info(f"📝 Answer all {len(questions)} questions and submit when ready!")
+            if still_generating:
+                st.info(f"⏳ {len(questions)}/{stream['expected']} questions ready — start answering, more are on the way...")
+                if st.button("⏹️ Stop generating", key="stop_stream_btn"):
+                    stream["deadline"].cancel("Stopped")
+                    stream["expected"] = len(questions)
+                    st.rerun()
+            else:
+                st.info(f"📝 Answer all {len(questions)} questions and submit when ready!")
             st.markdown("---")
             
             for i, q in enumerate(questions):
@@ -1053,12 +1434,17 @@ elif st.session_state.page == 'quiz':
             st.markdown("---")
             col1, col2, col3 = st.columns([1, 2, 1])
             with col2:
-                if st.button("✅ Submit Quiz", type="primary", use_container_width=True):
+                if st.button("✅ Submit Quiz", type="primary", use_container_width=True, disabled=still_generating):
                     if len(st.session_state.user_answers) < len(questions):
                         st.warning(f"⚠️ Please answer all questions! ({len(st.session_state.user_answers)}/{len(questions)} answered)")
                     else:
                         st.session_state.quiz_submitted = True
                         st.rerun()
+            
+            # Poll for newly streamed questions (any click interrupts this and reruns immediately)
+            if still_generating:
+                time.sleep(1)
+                st.rerun()
         
         else:
             # Show results
@@ -1123,6 +1509,205 @@ elif st.session_state.page == 'quiz':
                     st.session_state.page = 'home'
                     st.rerun()
 
+# ==================== SEARCH PAGE ====================
+elif st.session_state.page == 'search':
+    st.markdown("# 🔎 Search Library")
+    st.markdown(f"### Find where any of the {len(transcript_index):,} extracted videos explains a topic")
+    st.markdown("---")
+
+    search_query = st.text_input(
+        "Search transcripts",
+        placeholder='e.g. backpropagation, or "learning rate schedule" for an exact phrase',
+        key="library_query"
+    )
+    if search_query:
+        started = time.perf_counter()
+        results = transcript_index.search(search_query, limit=10)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        st.caption(f"{len(results)} videos in {elapsed_ms:.1f} ms")
+        if not results:
+            st.info("💡 No matches — try fewer or different words.")
+        for result in results:
+            st.markdown(f"#### 🎬 {result['title']}")
+            for hit in result['hits']:
+                seconds = int(hit['time'])
+                link = f"https://www.youtube.com/watch?v={result['video_id']}&t={seconds}s"
+                st.markdown(f"[▶️ {seconds // 60}:{seconds % 60:02d}]({link}) — …{hit['snippet']}…")
+    elif not len(transcript_index):
+        st.info("💡 The library is empty — extract a transcript on the Home page first.")
+
+    st.markdown("---")
+    if st.button("🏠 Back to Home", type="primary", use_container_width=True, key="search_home_btn"):
+        st.session_state.page = 'home'
+        st.rerun()
+
+# ==================== COURSE NOTES PAGE ====================
+elif st.session_state.page == 'course':
+    st.markdown("# 📚 Course Notes")
+    st.markdown("### One course summary and per-module notes for a whole playlist")
+    st.markdown("---")
+
+    course_title = st.text_input("Course title", value="My Course", key="course_title_input")
+    course_outline = st.text_area(
+        "Videos",
+        height=200,
+        key="course_outline_input",
+        placeholder="Paste a playlist URL or one video URL per line.\n"
+                    "Optional: start a module with a line like  # Module 1: Foundations\n"
+                    f"Without module lines, every {CourseNotesGenerator.MODULE_SIZE} videos form a module."
+    )
+    st.caption("⚡ Every video, module and course summary is cached — adding a video later only "
+               "recomputes that video, its module and the course overview.")
+
+    if st.button("🏗️ Build Course Notes", type="primary", use_container_width=True, key="build_course_btn"):
+        if not CourseNotesGenerator.parse_outline(course_outline):
+            st.error("⚠️ Please paste at least one YouTube video or playlist URL")
+        else:
+            course_gen = CourseNotesGenerator()
+
+            def course_status(gen=course_gen):
+                p = gen.progress
+                return f"{p['video_done']}/{p['video_total'] or '?'} videos summarized"
+
+            with st.spinner("🤖 Summarizing videos, then modules, then the course..."):
+                st.session_state.course_result = run_cancellable(
+                    functools.partial(course_gen.build, course_title, course_outline),
+                    "Building course notes", seconds=CourseNotesGenerator.DEADLINE_SECONDS,
+                    status=course_status
+                )
+            reused = sum(v for k, v in course_gen.progress.items() if k.endswith("_reused"))
+            generated = sum(v for k, v in course_gen.progress.items() if k.endswith("_generated"))
+            st.session_state.course_result["cache_stats"] = f"{reused} summaries reused, {generated} generated"
+            st.rerun()
+
+    course = st.session_state.course_result
+    if course:
+        st.markdown("---")
+        for warning in course.get("warnings", []):
+            st.warning(f"⚠️ {warning}")
+        if course.get("error"):
+            st.error(f"❌ {course['error']}")
+        if course.get("cache_stats"):
+            st.caption(f"♻️ {course['cache_stats']}")
+
+        if course.get("modules"):
+            course_markdown = CourseNotesGenerator.to_markdown(course)
+            col1, col2 = st.columns(2)
+            with col1:
+                st.download_button("📥 Download Markdown", data=course_markdown,
+                                   file_name="course_notes.md", mime="text/markdown",
+                                   type="primary", use_container_width=True, key="course_md_btn")
+            with col2:
+                try:
+                    st.download_button("📄 Download PDF", data=PDFGenerator.generate_notes_pdf(course_markdown),
+                                       file_name="course_notes.pdf", mime="application/pdf",
+                                       type="primary", use_container_width=True, key="course_pdf_btn")
+                except Exception as e:
+                    st.error(f"PDF error: {str(e)}")
+
+            st.markdown(f"## 🎓 {course['title']} — Course Overview")
+            st.markdown(course.get("summary") or "_Course summary unavailable._")
+            for i, module in enumerate(course["modules"]):
+                with st.expander(f"📦 Module {i + 1}: {module['title']} ({len(module['videos'])} videos)",
+                                 expanded=False):
+                    if module.get("notes"):
+                        st.markdown(module["notes"])
+                    else:
+                        st.warning(f"⚠️ {module.get('error')}")
+                    st.markdown("**Videos in this module**")
+                    for video in module["videos"]:
+                        link = f"https://www.youtube.com/watch?v={video['video_id']}"
+                        status_icon = "✅" if video.get("summary") else f"❌ {video.get('error')}"
+                        st.markdown(f"- [{video['title']}]({link}) {status_icon}")
+
+    st.markdown("---")
+    if st.button("🏠 Back to Home", type="primary", use_container_width=True, key="course_home_btn"):
+        st.session_state.page = 'home'
+        st.rerun()
+
+# ==================== METRICS PAGE (ADMIN) ====================
+elif st.session_state.page == 'metrics':
+    st.markdown("# 📈 System Metrics")
+    st.markdown("### Stage timings, fallbacks and key rotations for this server process")
+    st.markdown("---")
+
+    rows = metrics.summary()
+    if rows:
+        st.markdown("#### ⏱️ Stage Timings (seconds)")
+        st.dataframe([
+            {
+                "stage": r["name"],
+                "labels": ", ".join(f"{k}={v}" for k, v in r["labels"].items()),
+                "count": r["count"],
+                "p50": round(r["p50"], 3),
+                "p95": round(r["p95"], 3),
+                "p99": round(r["p99"], 3),
+            }
+            for r in rows
+        ], use_container_width=True)
+    else:
+        st.info("💡 No spans recorded yet — extract a transcript or generate notes first.")
+
+    counters = metrics.counters()
+    if counters:
+        st.markdown("#### 🔁 Fallbacks & Counters")
+        st.dataframe([
+            {
+                "counter": c["name"],
+                "labels": ", ".join(f"{k}={v}" for k, v in c["labels"].items()),
+                "value": c["value"],
+            }
+            for c in counters
+        ], use_container_width=True)
+
+    # ========== TOKEN CONSUMPTION ==========
+    st.markdown("#### 🪙 Gemini Usage Today")
+    key_labels = [f"key{i + 1}" for i in range(max(APIKeyManager().total_keys(), 1))]
+    st.dataframe(token_ledger.quota_report(GeminiGateway.MODELS, key_labels), use_container_width=True)
+
+    # ========== GEMINI SCHEDULER ==========
+    st.markdown("#### 🚦 Gemini Queue")
+    st.caption(
+        f"{fair_scheduler.depth()} calls waiting — {fair_scheduler.slots} concurrent slots shared "
+        "fairly per session (interactive > prefetch > batch)"
+    )
+    queue_rows = fair_scheduler.snapshot()
+    if queue_rows:
+        st.dataframe(queue_rows, use_container_width=True)
+
+    prefetch_block = prefetcher.blocked_reason()
+    st.caption(
+        f"⚡ Prefetch: {prefetcher.budget_used()}/{prefetcher.daily_budget} requests used today — "
+        + (f"paused ({prefetch_block})" if prefetch_block else "active")
+    )
+
+    usage_view = st.radio(
+        "Group token usage by",
+        ["model", "key", "feature", "video_id"],
+        horizontal=True,
+        key="usage_group_by"
+    )
+    usage_rows = token_ledger.totals(group_by=(usage_view,))
+    if usage_rows:
+        st.dataframe(usage_rows, use_container_width=True)
+    else:
+        st.info("💡 No Gemini calls recorded today.")
+
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.download_button("📥 Prometheus Text", metrics.export_prometheus(),
+                           file_name="metrics.prom", mime="text/plain", use_container_width=True)
+    with col2:
+        st.download_button("📥 JSON Lines", metrics.export_json_lines(),
+                           file_name="metrics.jsonl", mime="application/x-ndjson", use_container_width=True)
+    with col3:
+        if st.button("🏠 Back to Home", type="primary", use_container_width=True, key="metrics_home_btn"):
+            st.session_state.page = 'home'
+            st.rerun()
+
+    with st.expander("📄 Raw Prometheus Output", expanded=False):
+        st.code(metrics.export_prometheus(), language="text")
+
 # Footer
 st.markdown("---")
 st.markdown("""
@@ -0,0 +1,172 @@
+"""
+Context Cache Benchmark
+Replays a typical session (notes, one section regeneration, two quizzes) per video
+with the context cache off and on, against a local stand-in for the Gemini client.
+
+The stand-in implements caches.create/delete and generate_content(cached_content=...)
+with usage_metadata, and simulates latency proportional to uncached input tokens,
+so the comparison runs offline. Pass --live to use the real API instead.
+
+Usage:
+    python scripts/bench_context_cache.py --videos 5
+    python scripts/bench_context_cache.py --transcript lecture.txt --live
+"""
+
+import argparse
+import itertools
+import json
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Isolated run: no ledger file, in-memory question bank (so quizzes really call the model), no hedging
+os.environ.setdefault("TOKEN_LEDGER_PATH", "")
+os.environ.setdefault("QUESTION_BANK_PATH", ":memory:")
+os.environ.setdefault("HEDGE_ENABLED", "0")
+
+from services.context_cache import context_cache  # noqa: E402
+from services.notes_generator import NotesGenerator  # noqa: E402
+from services.quiz_generator import QuizGenerator  # noqa: E402
+from utils.metrics import metrics, percentile  # noqa: E402
+from utils.token_ledger import estimate_tokens, token_ledger  # noqa: E402
+
+
+class _Usage:
+    def __init__(self, prompt_tokens: int, cached_tokens: int, output_tokens: int):
+        self.prompt_token_count = prompt_tokens
+        self.cached_content_token_count = cached_tokens
+        self.candidates_token_count = output_tokens
+
+
+class _Response:
+    def __init__(self, text: str, usage: _Usage):
+        self.text = text
+        self.usage_metadata = usage
+        self.candidates = []
+
+
+class _Cached:
+    def __init__(self, name: str):
+        self.name = name
+
+
+class LocalGeminiStandIn:
+    """Just enough of genai.Client for the generators and the context cache"""
+
+    # Simulated time to first byte + prefill cost per 1k uncached input tokens
+    BASE_LATENCY = 0.05
+    PER_1K_INPUT = 0.04
+
+    # Word pool for distinct stand-in questions (so dedup does not trigger top-ups)
+    VOCAB = ("entropy gradient lattice photon enzyme tariff sonnet glacier protocol vector "
+             "neuron mitosis quasar ledger syntax torque isotope fresco sprint cipher").split()
+
+    def __init__(self):
+        self._rng = random.Random(7)
+        self._store = {}
+        self._ids = itertools.count(1)
+        self.caches = self
+        self.models = self
+
+    # caches.*
+    def create(self, model, config):
+        text = "".join(part.text for content in config.contents for part in content.parts)
+        name = f"cachedContents/local-{next(self._ids)}"
+        ttl = float(str(config.ttl).rstrip("s"))
+        self._store[name] = {"model": model, "tokens": estimate_tokens(text),
+                             "expires": time.monotonic() + ttl}
+        return _Cached(name)
+
+    def delete(self, name):
+        self._store.pop(name, None)
+
+    # models.*
+    def generate_content(self, model, contents, config):
+        cached_tokens = 0
+        name = getattr(config, "cached_content", None)
+        if name:
+            entry = self._store.get(name)
+            if not entry or entry["expires"] < time.monotonic() or entry["model"] != model:
+                raise RuntimeError(f"404 NOT_FOUND: cachedContent {name} not found")
+            cached_tokens = entry["tokens"]
+        uncached = estimate_tokens(contents)
+        time.sleep(self.BASE_LATENCY + self.PER_1K_INPUT * uncached / 1000.0)
+
+        if "multiple choice" in contents:
+            count = int(contents.split("Create ", 1)[1].split(" ", 1)[0])
+            questions = []
+            for i in range(count):
+                words = self._rng.sample(self.VOCAB, 10)
+                options = [" ".join(self._rng.sample(self.VOCAB, 3)) for _ in range(4)]
+                questions.append({"id": i + 1, "type": "mcq", "question": " ".join(words) + "?",
+                                  "options": options, "correct_answer": options[0], "explanation": "Stand-in."})
+            text = json.dumps(questions)
+        else:
+            text = "\n\n".join(f"## {heading}\nStand-in body." for heading, _ in NotesGenerator.SECTIONS)
+        return _Response(text, _Usage(uncached + cached_tokens, cached_tokens, estimate_tokens(text)))
+
+
+def synthetic_transcript(words: int = 4000) -> str:
+    vocab = ("gradient descent minimizes the loss by stepping against the slope while the "
+             "learning rate controls how far each update moves the weights").split()
+    return "\n".join(" ".join(vocab[(i + j) % len(vocab)] for j in range(12)) + "."
+                     for i in range(0, words, 12))
+
+
+def run_session(notes_gen: NotesGenerator, quiz_gen: QuizGenerator, transcript: str, video_id: str):
+    notes, _ = notes_gen.generate_notes(transcript, video_id=video_id)
+    if notes:
+        notes_gen.regenerate_section(transcript, notes, NotesGenerator.SECTIONS[1][0], video_id=video_id)
+    quiz_gen.build_quiz(transcript, 5, "Medium", video_id=video_id)
+    quiz_gen.build_quiz(transcript, 10, "Hard", video_id=video_id)
+
+
+def summarize(prefix: str) -> dict:
+    rows = [r for r in token_ledger.totals(group_by=("video_id",)) if r["video_id"].startswith(prefix)]
+    prompt = sum(r["prompt_tokens"] for r in rows)
+    cached = sum(r["cached_tokens"] for r in rows)
+    return {"requests": sum(r["requests"] for r in rows), "prompt": prompt,
+            "cached": cached, "uncached": prompt - cached}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Gemini context caching")
+    parser.add_argument("--transcript", help="Path to a transcript text file (default: synthetic)")
+    parser.add_argument("--videos", type=int, default=3)
+    parser.add_argument("--live", action="store_true", help="Use the real API key instead of the stand-in")
+    args = parser.parse_args()
+
+    if args.transcript:
+        with open(args.transcript, encoding="utf-8") as f:
+            transcript = f.read()
+    else:
+        transcript = synthetic_transcript()
+
+    if not args.live:
+        os.environ.setdefault("GEMINI_API_KEY", "local-stand-in")
+    notes_gen = NotesGenerator(silent=True)
+    quiz_gen = QuizGenerator()
+    if not args.live:
+        notes_gen.client = quiz_gen.client = LocalGeminiStandIn()
+
+    print(f"{'cache':<6} {'requests':>8} {'prompt_tok':>10} {'cached_tok':>10} "
+          f"{'uncached':>9} {'p50_s':>6} {'p95_s':>6}")
+    for enabled in (False, True):
+        context_cache.enabled = enabled
+        metrics.reset()
+        prefix = "cached" if enabled else "inline"
+        for i in range(args.videos):
+            run_session(notes_gen, quiz_gen, transcript, f"{prefix}-{i}")
+        latencies = metrics.samples_matching("gemini_attempt", status="ok")
+        row = summarize(prefix)
+        print(f"{'on' if enabled else 'off':<6} {row['requests']:>8} {row['prompt']:>10} {row['cached']:>10} "
+              f"{row['uncached']:>9} {percentile(latencies, 50):>6.2f} {percentile(latencies, 95):>6.2f}")
+    context_cache.clear()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,305 @@
+"""
+Multi-Session Load Test Harness
+Drives simulated students through the real app.py flows with Streamlit's AppTest
+
+Backends (YouTube, Gemini) are stubbed so only the app's own rerun cost is measured.
+The app's on-disk stores (token ledger, question bank, summary cache, transcript
+index) point at a scratch directory, and prefetch / context caching are stubbed out,
+so a run neither touches data/ nor makes a real API call.
+
+Usage:
+    python scripts/bench_load.py --levels 1 2 4 8 --sessions-per-worker 2
+    python scripts/bench_load.py --levels 4 --backend-latency 0.5 --json
+"""
+
+import argparse
+import json
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+from unittest import mock
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Set before the app modules are imported: their stores are created at import time
+SCRATCH_DIR = tempfile.mkdtemp(prefix="load_test_")
+os.environ.update({
+    "TOKEN_LEDGER_PATH": os.path.join(SCRATCH_DIR, "token_usage.jsonl"),
+    "QUESTION_BANK_PATH": os.path.join(SCRATCH_DIR, "question_bank.db"),
+    "SUMMARY_CACHE_PATH": os.path.join(SCRATCH_DIR, "summaries.db"),
+    "TRANSCRIPT_INDEX_PATH": os.path.join(SCRATCH_DIR, "transcript_index"),
+    "CONTEXT_CACHE": "0",
+    "PREFETCH_ENABLED": "0",
+})
+
+from streamlit.testing.v1 import AppTest  # noqa: E402
+
+from services.context_cache import context_cache  # noqa: E402
+from services.notes_generator import NotesGenerator  # noqa: E402
+from services.prefetcher import prefetcher  # noqa: E402
+from services.quiz_generator import QuizGenerator  # noqa: E402
+from utils.metrics import percentile  # noqa: E402
+from utils.transcript_extractor import TranscriptExtractor  # noqa: E402
+from utils.transcript_index import transcript_index  # noqa: E402
+
+APP_PATH = os.path.join(ROOT, "app.py")
+VIDEO_URL = "https://www.youtube.com/watch?v=dQw4w9WgXcQ"
+NUM_QUESTIONS = 20
+
+
+# ========== STUBBED BACKENDS ==========
+
+def _stub_transcript(words: int = 3000) -> str:
+    sentence = "gradient descent updates the model weights using the loss derivative"
+    tokens = (sentence.split() * (words // len(sentence.split()) + 1))[:words]
+    return "\n".join(" ".join(tokens[i:i + 8]) for i in range(0, len(tokens), 8))
+
+
+def _stub_notes() -> str:
+    return "\n\n".join(
+        f"## {heading}\n" + "\n".join(f"- Point {i} about {heading.lower()}" for i in range(6))
+        for heading in ["🎯 Core Concept", "📚 Key Concepts Explained", "🔍 Important Insights",
+                        "💡 Practical Takeaways", "🎓 Why This Matters"]
+    )
+
+
+def _stub_questions(num_questions: int) -> Dict:
+    return {"questions": [
+        {
+            "id": i + 1,
+            "type": "mcq",
+            "question": f"Stub question {i + 1}?",
+            "options": ["Alpha", "Beta", "Gamma", "Delta"],
+            "correct_answer": "Alpha",
+            "explanation": "Stubbed backend.",
+        }
+        for i in range(num_questions)
+    ]}
+
+
+def build_stubs(backend_latency: float) -> List:
+    """Patch every network-bound call with a deterministic local stand-in"""
+    transcript = _stub_transcript()
+    metadata = {
+        "title": "Load Test Video", "channel": "Stub", "duration": "N/A", "views": "N/A",
+        "upload_date": "Unknown", "thumbnail": "https://img.youtube.com/vi/dQw4w9WgXcQ/maxresdefault.jpg",
+    }
+
+    def fake_transcript(video_id, *args, **kwargs):
+        time.sleep(backend_latency)
+        return transcript, None
+
+    def fake_segments(video_id, *args, **kwargs):
+        time.sleep(backend_latency)
+        return [{"text": line, "start": i * 2.0, "duration": 2.0}
+                for i, line in enumerate(transcript.split("\n"))], None
+
+    def fake_metadata(video_id, *args, **kwargs):
+        return metadata, None
+
+    def fake_notes(self, transcript, *args, **kwargs):
+        time.sleep(backend_latency)
+        return _stub_notes(), None
+
+    def fake_quiz(self, transcript, num_questions=5, difficulty="Medium", *args, **kwargs):
+        time.sleep(backend_latency)
+        return _stub_questions(num_questions)
+
+    def fake_init(self, *args, **kwargs):
+        self.client = None
+        self.key_manager = None
+
+    def fake_index_add(video_id, segments, title=None):
+        return True
+
+    def fake_schedule(transcript, video_id, deadline=None):
+        return None
+
+    return [
+        mock.patch.object(TranscriptExtractor, "get_transcript", staticmethod(fake_transcript)),
+        mock.patch.object(TranscriptExtractor, "get_transcript_segments", staticmethod(fake_segments)),
+        mock.patch.object(TranscriptExtractor, "get_video_metadata", staticmethod(fake_metadata)),
+        mock.patch.object(NotesGenerator, "__init__", fake_init),
+        mock.patch.object(NotesGenerator, "generate_notes", fake_notes),
+        mock.patch.object(QuizGenerator, "__init__", fake_init),
+        mock.patch.object(QuizGenerator, "generate_quiz", fake_quiz),
+        # Side effects of extraction: indexing, speculative generation, cached-content uploads
+        mock.patch.object(transcript_index, "add", fake_index_add),
+        mock.patch.object(prefetcher, "schedule", fake_schedule),
+        mock.patch.object(context_cache, "enabled", False),
+    ]
+
+
+# ========== SIMULATED SESSION ==========
+
+class SessionDriver:
+    """One simulated student walking through extract → notes → quiz → submit"""
+
+    def __init__(self, timeout: float):
+        self.at = AppTest.from_file(APP_PATH, default_timeout=timeout)
+        self.latencies: List[float] = []
+
+    def _run(self):
+        start = time.perf_counter()
+        self.at.run()
+        self.latencies.append(time.perf_counter() - start)
+        if self.at.exception:
+            raise RuntimeError(f"App raised: {self.at.exception[0].value}")
+
+    def _button(self, key: str = None, label_prefix: str = None):
+        if key:
+            return self.at.button(key=key)
+        return next(b for b in self.at.button if b.label.startswith(label_prefix))
+
+    def run_flow(self):
+        self._run()
+
+        # Home: enter URL and extract
+        self.at.text_input(key="url_input").input(VIDEO_URL)
+        self._run()
+        self._button(label_prefix="🔍 Extract").click()
+        self._run()
+
+        # Notes page
+        self._button(key="nav_notes").click()
+        self._run()
+        self._button(key="gen_notes_btn").click()
+        self._run()
+
+        # Quiz setup: 20 questions
+        self._button(key="nav_quiz").click()
+        self._run()
+        self.at.selectbox(key="num_questions_select").select(NUM_QUESTIONS)
+        self._run()
+        self._button(key="generate_quiz_btn").click()
+        self._run()
+
+        # Answer every radio (one rerun each, like a real browser)
+        for radio in list(self.at.radio):
+            radio.set_value(radio.options[0])
+            self._run()
+
+        self._button(label_prefix="✅ Submit").click()
+        self._run()
+
+
+# ========== RESOURCE SAMPLING ==========
+
+def current_rss_mb() -> float:
+    """Resident set size of this process (Linux /proc, falls back to peak RSS)"""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 1024 if sys.platform != "darwin" else peak / (1024 * 1024)
+
+
+class RSSSampler(threading.Thread):
+    def __init__(self, interval: float = 0.1):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.peak = 0.0
+        self._halt = threading.Event()
+
+    def run(self):
+        while not self._halt.is_set():
+            self.peak = max(self.peak, current_rss_mb())
+            self._halt.wait(self.interval)
+
+    def stop(self):
+        self._halt.set()
+        self.join()
+
+
+# ========== LOAD LEVELS ==========
+
+def run_level(concurrency: int, sessions_per_worker: int, timeout: float) -> Dict:
+    latencies: List[float] = []
+    errors: List[str] = []
+    lock = threading.Lock()
+
+    def worker():
+        for _ in range(sessions_per_worker):
+            driver = SessionDriver(timeout)
+            try:
+                driver.run_flow()
+            except Exception as e:  # keep the other sessions going
+                with lock:
+                    errors.append(str(e))
+            with lock:
+                latencies.extend(driver.latencies)
+
+    sampler = RSSSampler()
+    sampler.start()
+    cpu_start, wall_start = time.process_time(), time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for f in [pool.submit(worker) for _ in range(concurrency)]:
+            f.result()
+
+    wall = time.perf_counter() - wall_start
+    cpu = time.process_time() - cpu_start
+    sampler.stop()
+
+    return {
+        "concurrency": concurrency,
+        "sessions": concurrency * sessions_per_worker,
+        "reruns": len(latencies),
+        "errors": len(errors),
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "reruns_per_s": len(latencies) / wall if wall else 0.0,
+        "cpu_pct": 100.0 * cpu / wall if wall else 0.0,
+        "peak_rss_mb": sampler.peak,
+        "first_error": errors[0] if errors else "",
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the Streamlit app with simulated sessions")
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 2, 4, 8],
+                        help="Concurrent session counts to test")
+    parser.add_argument("--sessions-per-worker", type=int, default=1)
+    parser.add_argument("--backend-latency", type=float, default=0.0,
+                        help="Seconds each stubbed backend call sleeps")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Per-rerun timeout")
+    parser.add_argument("--json", action="store_true", help="Print JSON lines instead of a table")
+    args = parser.parse_args()
+
+    patches = build_stubs(args.backend_latency)
+    for p in patches:
+        p.start()
+
+    try:
+        if not args.json:
+            print(f"{'conc':>5} {'sessions':>8} {'reruns':>7} {'p50ms':>8} {'p95ms':>8} "
+                  f"{'p99ms':>8} {'rerun/s':>8} {'cpu%':>6} {'rssMB':>7} {'errors':>6}")
+        for level in args.levels:
+            row = run_level(level, args.sessions_per_worker, args.timeout)
+            if args.json:
+                print(json.dumps(row))
+            else:
+                print(f"{row['concurrency']:>5} {row['sessions']:>8} {row['reruns']:>7} "
+                      f"{row['p50_ms']:>8.1f} {row['p95_ms']:>8.1f} {row['p99_ms']:>8.1f} "
+                      f"{row['reruns_per_s']:>8.1f} {row['cpu_pct']:>6.0f} "
+                      f"{row['peak_rss_mb']:>7.0f} {row['errors']:>6}")
+                if row["first_error"]:
+                    print(f"      first error: {row['first_error']}")
+    finally:
+        for p in patches:
+            p.stop()
+        shutil.rmtree(SCRATCH_DIR, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
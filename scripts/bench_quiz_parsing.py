@@ -0,0 +1,83 @@
+"""
+Quiz Output-Mode Benchmark
+Compares free-text JSON (regex cleanup) against schema-constrained structured output
+
+Reports per mode: retry rate (model attempts per request - 1), parse outcomes,
+valid-question yield and end-to-end latency percentiles. Needs a real API key.
+
+Usage:
+    python scripts/bench_quiz_parsing.py --transcript lecture.txt --runs 10 --questions 10
+"""
+
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from services.quiz_generator import QuizGenerator  # noqa: E402
+from utils.metrics import metrics, percentile  # noqa: E402
+
+
+def counter_value(name: str, **labels) -> float:
+    wanted = {k: str(v) for k, v in labels.items()}
+    return sum(c["value"] for c in metrics.counters()
+               if c["name"] == name and all(c["labels"].get(k) == v for k, v in wanted.items()))
+
+
+def run_mode(generator: QuizGenerator, structured: bool, transcript: str, runs: int,
+             num_questions: int, difficulty: str) -> dict:
+    generator.structured_output = structured
+    mode = generator.output_mode
+    prompt = generator.create_quiz_prompt(transcript, num_questions, difficulty)
+
+    latencies, yields = [], []
+    for _ in range(runs):
+        start = time.perf_counter()
+        questions, _ = generator._request_questions(prompt, num_questions, feature="bench")
+        latencies.append(time.perf_counter() - start)
+        yields.append(len(questions) / num_questions)
+
+    requests = counter_value("quiz_requests", mode=mode)
+    attempts = counter_value("quiz_model_attempts", mode=mode)
+    return {
+        "mode": mode,
+        "runs": runs,
+        "retry_rate": (attempts / requests - 1) if requests else 0.0,
+        "parse_ok": counter_value("quiz_parse", mode=mode, outcome="ok"),
+        "parse_fallback": (counter_value("quiz_parse", mode=mode, outcome="fallback")
+                           + counter_value("quiz_parse", mode=mode, outcome="regex_fallback")),
+        "yield": sum(yields) / len(yields) if yields else 0.0,
+        "p50_s": percentile(latencies, 50),
+        "p95_s": percentile(latencies, 95),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark quiz output modes")
+    parser.add_argument("--transcript", required=True, help="Path to a transcript text file")
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--questions", type=int, default=10)
+    parser.add_argument("--difficulty", default="Medium", choices=["Easy", "Medium", "Hard"])
+    args = parser.parse_args()
+
+    with open(args.transcript, encoding="utf-8") as f:
+        transcript = f.read()
+
+    generator = QuizGenerator()
+    if generator.client is None:
+        sys.exit("No API key configured")
+
+    print(f"{'mode':<11} {'runs':>4} {'retry%':>7} {'parse_ok':>8} {'fallback':>8} "
+          f"{'yield%':>7} {'p50s':>6} {'p95s':>6}")
+    for structured in (False, True):
+        row = run_mode(generator, structured, transcript, args.runs, args.questions, args.difficulty)
+        print(f"{row['mode']:<11} {row['runs']:>4} {row['retry_rate'] * 100:>6.1f}% "
+              f"{row['parse_ok']:>8.0f} {row['parse_fallback']:>8.0f} {row['yield'] * 100:>6.1f}% "
+              f"{row['p50_s']:>6.1f} {row['p95_s']:>6.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Study Pack Benchmark
+Compares the two-call path (NotesGenerator + QuizGenerator) against one
+StudyPackGenerator call on the same transcript.
+
+Reports per path: Gemini requests, prompt/output tokens, end-to-end latency
+percentiles and validity (notes sections present, valid questions / requested).
+Needs a real API key.
+
+Usage:
+    python scripts/bench_study_pack.py --transcript lecture.txt --runs 5 --questions 5
+"""
+
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Isolated run: no ledger file and an in-memory bank so every quiz really calls the model
+os.environ.setdefault("TOKEN_LEDGER_PATH", "")
+os.environ.setdefault("QUESTION_BANK_PATH", ":memory:")
+
+from services.notes_generator import NotesGenerator  # noqa: E402
+from services.quiz_generator import QuizGenerator  # noqa: E402
+from services.study_pack_generator import StudyPackGenerator  # noqa: E402
+from utils.metrics import percentile  # noqa: E402
+from utils.token_ledger import token_ledger  # noqa: E402
+
+
+def two_calls(transcript: str, num_questions: int, difficulty: str, video_id: str):
+    notes, _ = NotesGenerator(silent=True).generate_notes(transcript, video_id=video_id)
+    questions, _ = QuizGenerator().build_quiz(transcript, num_questions, difficulty, video_id=video_id)
+    return notes, questions
+
+
+def one_call(transcript: str, num_questions: int, difficulty: str, video_id: str):
+    notes, quiz_data, _ = StudyPackGenerator().generate(transcript, num_questions, difficulty,
+                                                        video_id=video_id)
+    return notes, (quiz_data or {}).get("questions", [])
+
+
+def sections_present(notes) -> int:
+    if not notes:
+        return 0
+    found = NotesGenerator.split_sections(notes)
+    return sum(1 for heading, _ in NotesGenerator.SECTIONS if found.get(heading))
+
+
+def run_path(name: str, fn, transcript: str, runs: int, num_questions: int, difficulty: str) -> dict:
+    latencies, sections, yields = [], [], []
+    for i in range(runs):
+        start = time.perf_counter()
+        notes, questions = fn(transcript, num_questions, difficulty, f"bench-{name}-{i}")
+        latencies.append(time.perf_counter() - start)
+        sections.append(sections_present(notes) / len(NotesGenerator.SECTIONS))
+        yields.append(min(len(questions), num_questions) / num_questions)
+
+    rows = [r for r in token_ledger.totals(group_by=("video_id",))
+            if r["video_id"].startswith(f"bench-{name}-")]
+    return {
+        "path": name,
+        "requests": sum(r["requests"] for r in rows) / runs,
+        "prompt": sum(r["prompt_tokens"] for r in rows) / runs,
+        "output": sum(r["output_tokens"] for r in rows) / runs,
+        "p50_s": percentile(latencies, 50),
+        "p95_s": percentile(latencies, 95),
+        "sections": sum(sections) / runs,
+        "yield": sum(yields) / runs,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark one-call study pack vs notes + quiz")
+    parser.add_argument("--transcript", required=True, help="Path to a transcript text file")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--questions", type=int, default=5)
+    parser.add_argument("--difficulty", default="Medium", choices=["Easy", "Medium", "Hard"])
+    args = parser.parse_args()
+
+    with open(args.transcript, encoding="utf-8") as f:
+        transcript = f.read()
+
+    if QuizGenerator().client is None:
+        sys.exit("No API key configured")
+
+    print(f"{'path':<10} {'req/run':>7} {'prompt':>7} {'output':>7} {'p50s':>6} {'p95s':>6} "
+          f"{'sections%':>9} {'yield%':>7}")
+    for name, fn in (("two_call", two_calls), ("pack", one_call)):
+        row = run_path(name, fn, transcript, args.runs, args.questions, args.difficulty)
+        print(f"{row['path']:<10} {row['requests']:>7.1f} {row['prompt']:>7.0f} {row['output']:>7.0f} "
+              f"{row['p50_s']:>6.1f} {row['p95_s']:>6.1f} {row['sections'] * 100:>8.0f}% "
+              f"{row['yield'] * 100:>6.0f}%")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Transcript Index Benchmark
+Builds a TranscriptIndex from synthetic caption segments (Zipf vocabulary,
+~1 segment per 3 seconds), then reports incremental add time, on-disk size,
+cold load time and query latency percentiles. No API key or network needed.
+
+Usage:
+    python scripts/bench_transcript_index.py --videos 2000 --words 6000 --queries 200
+"""
+
+import argparse
+import itertools
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from utils.metrics import percentile  # noqa: E402
+from utils.transcript_index import TranscriptIndex  # noqa: E402
+
+
+def synthetic_segments(rng: random.Random, vocab, cum_weights, words: int):
+    drawn = rng.choices(vocab, cum_weights=cum_weights, k=words)
+    return [{"text": " ".join(drawn[i:i + 8]), "start": i * 0.375, "duration": 3.0}
+            for i in range(0, words, 8)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the local transcript search index")
+    parser.add_argument("--videos", type=int, default=2000)
+    parser.add_argument("--words", type=int, default=6000, help="Words per video")
+    parser.add_argument("--vocab", type=int, default=30000)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    vocab = [f"term{i}" for i in range(args.vocab)]
+    cum_weights = list(itertools.accumulate(1.0 / (i + 1) for i in range(args.vocab)))
+    path = tempfile.mkdtemp(prefix="transcript_index_")
+    try:
+        index = TranscriptIndex(path)
+        add_seconds = []
+        for v in range(args.videos):
+            segments = synthetic_segments(rng, vocab, cum_weights, args.words)
+            start = time.perf_counter()
+            index.add(f"video{v:05d}", segments, title=f"Lecture {v}")
+            add_seconds.append(time.perf_counter() - start)
+
+        size = sum(os.path.getsize(os.path.join(path, f)) for f in os.listdir(path))
+        start = time.perf_counter()
+        reloaded = TranscriptIndex(path)
+        load_seconds = time.perf_counter() - start
+
+        query_seconds = []
+        for _ in range(args.queries):
+            words = rng.choices(vocab[:5000], k=rng.randint(1, 3))
+            query = f'"{words[0]} {words[1]}"' if len(words) > 1 and rng.random() < 0.3 else " ".join(words)
+            start = time.perf_counter()
+            reloaded.search(query)
+            query_seconds.append(time.perf_counter() - start)
+
+        print(f"videos={len(reloaded)} segments={len(reloaded._segments)} size={size / 1e6:.1f}MB")
+        print(f"add   p50={percentile(add_seconds, 50) * 1000:.1f}ms p99={percentile(add_seconds, 99) * 1000:.1f}ms")
+        print(f"load  {load_seconds * 1000:.0f}ms")
+        print(f"query p50={percentile(query_seconds, 50) * 1000:.1f}ms "
+              f"p95={percentile(query_seconds, 95) * 1000:.1f}ms p99={percentile(query_seconds, 99) * 1000:.1f}ms")
+    finally:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+"""
+Context Cache - Gemini cached content for transcripts reused across notes and quizzes
+The transcript is uploaded once per (video, model, key); prompts then reference it
+instead of inlining it. Handles expire locally before the server TTL, are evicted
+LRU-first, and any failure falls back to inline prompts.
+"""
+
+import atexit
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Tuple
+
+from google.genai import types
+
+from utils.metrics import metrics
+from utils.token_ledger import estimate_tokens
+
+
+class CacheRef:
+    """What a call needs to use the cache: the source transcript and the prompt that references it"""
+
+    __slots__ = ("video_id", "transcript", "prompt")
+
+    def __init__(self, video_id: str, transcript: str, prompt: str):
+        self.video_id = video_id
+        self.transcript = transcript
+        self.prompt = prompt
+
+
+class ContextCache:
+    """Process-wide registry of cached-content handles"""
+
+    # Line that replaces the inline transcript in prompts when the cache is used
+    REFERENCE = "[The full video transcript is provided above as cached context.]"
+
+    # Gemini rejects cached content below ~1024 tokens; shorter transcripts stay inline
+    MIN_TOKENS = 1024
+    MAX_TRANSCRIPT_CHARS = 400_000
+
+    # Handles are dropped this long before the server-side TTL runs out
+    EXPIRY_MARGIN_SECONDS = 30
+
+    # After a failed create (e.g. caching not offered on this tier), stay inline for a while
+    FAILURE_COOLDOWN_SECONDS = 600
+
+    def __init__(self, enabled: Optional[bool] = None, ttl_seconds: Optional[int] = None,
+                 max_entries: Optional[int] = None, clock: Callable[[], float] = time.monotonic):
+        self.enabled = (os.getenv("CONTEXT_CACHE", "0") == "1") if enabled is None else enabled
+        self.ttl_seconds = ttl_seconds or int(os.getenv("CONTEXT_CACHE_TTL_SECONDS", "900"))
+        self.max_entries = max_entries or int(os.getenv("CONTEXT_CACHE_MAX_ENTRIES", "16"))
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Tuple[str, str, str], Dict]" = OrderedDict()
+        self._create_locks: Dict[Tuple[str, str, str], threading.Lock] = {}
+        self._unsupported: Dict[Tuple[str, str], float] = {}
+
+    # ========== PROMPT SIDE ==========
+
+    @classmethod
+    def reference(cls, part: Optional[Tuple[int, int]] = None) -> str:
+        """Transcript placeholder for prompts; part=(k, n) points a shard at one region"""
+        if part and part[1] > 1:
+            return f"{cls.REFERENCE}\nFocus on part {part[0]} of {part[1]} of the transcript (split into {part[1]} equal parts)."
+        return cls.REFERENCE
+
+    def ref(self, video_id: Optional[str], transcript: str, prompt: str) -> Optional[CacheRef]:
+        """A CacheRef if this transcript is worth caching, else None (inline only)"""
+        if not self.enabled or not video_id or estimate_tokens(transcript) < self.MIN_TOKENS:
+            return None
+        return CacheRef(video_id, transcript[:self.MAX_TRANSCRIPT_CHARS], prompt)
+
+    # ========== HANDLES ==========
+
+    @staticmethod
+    def _digest(transcript: str) -> str:
+        return hashlib.sha1(transcript.encode("utf-8")).hexdigest()
+
+    def acquire(self, client, model: str, key_label: str, ref: CacheRef) -> Optional[str]:
+        """Cached-content name for this transcript on this model/key, creating it if needed"""
+        key = (ref.video_id, model, key_label)
+        digest = self._digest(ref.transcript)
+
+        with self._lock:
+            if self._unsupported.get((model, key_label), 0) > self._clock():
+                return None
+            entry = self._lookup(key, digest)
+            if entry:
+                metrics.incr("context_cache_hits", model=model)
+                return entry["name"]
+            create_lock = self._create_locks.setdefault(key, threading.Lock())
+
+        # One upload per key even when several shards ask at once
+        with create_lock:
+            with self._lock:
+                entry = self._lookup(key, digest)
+                if entry:
+                    metrics.incr("context_cache_hits", model=model)
+                    return entry["name"]
+            name = self._create(client, model, key_label, ref)
+            if not name:
+                return None
+            with self._lock:
+                self._entries[key] = {
+                    "name": name,
+                    "client": client,
+                    "digest": digest,
+                    "expires": self._clock() + self.ttl_seconds - self.EXPIRY_MARGIN_SECONDS,
+                }
+                self._entries.move_to_end(key)
+                evicted = []
+                while len(self._entries) > self.max_entries:
+                    _, old = self._entries.popitem(last=False)
+                    evicted.append(old)
+            for old in evicted:
+                metrics.incr("context_cache_evictions", reason="lru")
+                self._delete(old)
+            return name
+
+    def _lookup(self, key: Tuple[str, str, str], digest: str) -> Optional[Dict]:
+        """Live entry for key, dropping it if expired or built from another transcript (call under lock)"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry["expires"] <= self._clock() or entry["digest"] != digest:
+            del self._entries[key]
+            metrics.incr("context_cache_evictions", reason="expired" if entry["digest"] == digest else "changed")
+            threading.Thread(target=self._delete, args=(entry,), daemon=True).start()
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def _create(self, client, model: str, key_label: str, ref: CacheRef) -> Optional[str]:
+        try:
+            with metrics.span("context_cache_create", model=model):
+                cached = client.caches.create(
+                    model=model,
+                    config=types.CreateCachedContentConfig(
+                        contents=[types.Content(role="user", parts=[
+                            types.Part(text=f"Video transcript:\n{ref.transcript}")
+                        ])],
+                        display_name=f"transcript-{ref.video_id}",
+                        ttl=f"{self.ttl_seconds}s",
+                    ),
+                )
+            metrics.incr("context_cache_creates", model=model)
+            return cached.name
+        except Exception:
+            metrics.incr("context_cache_fallbacks", model=model, reason="create_failed")
+            with self._lock:
+                self._unsupported[(model, key_label)] = self._clock() + self.FAILURE_COOLDOWN_SECONDS
+            return None
+
+    @staticmethod
+    def _delete(entry: Dict):
+        try:
+            entry["client"].caches.delete(name=entry["name"])
+        except Exception:
+            pass  # expires server-side anyway
+
+    def invalidate(self, model: str, key_label: str, video_id: str):
+        """Forget a handle the API no longer accepts (expired or deleted remotely)"""
+        with self._lock:
+            entry = self._entries.pop((video_id, model, key_label), None)
+        if entry:
+            metrics.incr("context_cache_evictions", reason="rejected")
+            self._delete(entry)
+
+    def clear(self):
+        """Delete every handle (called at interpreter exit so storage is not billed)"""
+        with self._lock:
+            entries = list(self._entries.values())
+            self._entries.clear()
+        for entry in entries:
+            self._delete(entry)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+# ✅ Process-wide cache shared by every Streamlit session
+context_cache = ContextCache()
+atexit.register(context_cache.clear)
@@ -0,0 +1,350 @@
+"""
+Course Notes - Hierarchical notes for a playlist / multi-video course
+Videos are summarized in parallel, then each module, then the whole course.
+Every level is cached under the hash of its inputs, so adding or changing one
+video only recomputes that video, its module and the course summary. Transcripts
+and titles are cached per video_id, so a rebuild does not fetch them again.
+"""
+
+import functools
+import hashlib
+import re
+import threading
+from collections import Counter
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+from services.fair_scheduler import FairScheduler, in_current_context
+from services.notes_generator import NotesGenerator
+from utils.deadline import Deadline, DeadlineExceeded
+from utils.metrics import metrics
+from utils.summary_cache import summary_cache
+from utils.transcript_extractor import TranscriptExtractor
+from utils.transcript_index import transcript_index
+from utils.transcript_normalizer import TranscriptNormalizer
+
+
+class CourseNotesGenerator(NotesGenerator):
+    """Video -> module -> course summarization built on NotesGenerator's chunk summaries"""
+
+    # Course summary structure (### so it nests under the export's ## headings)
+    COURSE_SECTIONS = [
+        ("🗺️ Course Roadmap",           "[What each module covers, in order, one line each]"),
+        ("📚 Core Concepts",             "[The ideas the whole course builds on, explained]"),
+        ("🔗 How the Modules Connect",   "[How later modules depend on earlier ones]"),
+        ("💡 Key Takeaways",             "[What a student should be able to do after the course]"),
+    ]
+
+    # Bump a version when its prompt changes so cached results at that level are not reused
+    VIDEO_PROMPT_VERSION = "1"
+    MODULE_PROMPT_VERSION = "1"
+    COURSE_PROMPT_VERSION = "1"
+
+    # Videos per module when the outline has no "# Module" headings
+    MODULE_SIZE = 5
+
+    MAX_VIDEO_WORKERS = 4
+
+    # A 40-video course needs minutes, not the interactive request budget
+    DEADLINE_SECONDS = 900
+
+    def __init__(self, silent: bool = True):
+        super().__init__(silent=silent)
+        self._progress_lock = threading.Lock()
+        self.progress: Counter = Counter()
+
+    # ========== OUTLINE ==========
+
+    @staticmethod
+    def parse_outline(text: str) -> List[Dict]:
+        """
+        Outline text -> [{"title", "items": [("video" | "playlist", id)]}]
+        One URL per line; a line starting with "#" begins a new module with that title
+        """
+        modules: List[Dict] = []
+        for line in (text or "").splitlines():
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith("#"):
+                modules.append({"title": line.lstrip("#").strip() or f"Module {len(modules) + 1}", "items": []})
+                continue
+            if not modules:
+                modules.append({"title": None, "items": []})
+            playlist_id = TranscriptExtractor.extract_playlist_id(line)
+            video_id = TranscriptExtractor.extract_video_id(line)
+            if playlist_id and "watch" not in line:
+                modules[-1]["items"].append(("playlist", playlist_id))
+            elif video_id:
+                modules[-1]["items"].append(("video", video_id))
+        return [m for m in modules if m["items"]]
+
+    def resolve_outline(self, outline: List[Dict]) -> Tuple[List[Dict], List[str]]:
+        """
+        Expand playlists and group ungrouped videos into modules of MODULE_SIZE
+        Returns: ([{"title", "video_ids"}], warnings)
+        """
+        warnings: List[str] = []
+        modules = []
+        for module in outline:
+            video_ids: List[str] = []
+            for kind, item_id in module["items"]:
+                if kind == "playlist":
+                    ids, error = TranscriptExtractor.get_playlist_video_ids(item_id)
+                    if error:
+                        warnings.append(f"Playlist {item_id}: {error}")
+                    video_ids += ids
+                else:
+                    video_ids.append(item_id)
+            video_ids = list(dict.fromkeys(video_ids))
+            if module["title"] is not None:
+                modules.append({"title": module["title"], "video_ids": video_ids})
+            else:
+                # No headings: consecutive videos form modules, so appending a video only touches the last one
+                for start in range(0, len(video_ids), self.MODULE_SIZE):
+                    modules.append({"title": f"Module {len(modules) + 1}",
+                                    "video_ids": video_ids[start:start + self.MODULE_SIZE]})
+        return [m for m in modules if m["video_ids"]], warnings
+
+    # ========== PROMPTS ==========
+
+    def create_video_prompt(self, parts: List[str]) -> str:
+        """Condense a long video's part summaries into one video summary"""
+        joined = "\n\n".join(f"[Part {i + 1}/{len(parts)}]\n{p}" for i, p in enumerate(parts))
+        return f"""You are an expert educational content creator. These are summaries of consecutive parts of ONE lecture video. Combine them into a single summary of the video for a note-taker who will later combine several videos into module notes.
+
+
+**Instructions:**
+- Concise bullets: concepts, definitions, explanations, examples and advice
+- KEEP specific terms, numbers and names; merge repeated points
+- At most 300 words
+
+
+**Part summaries:**
+{joined}
+
+
+After the last bullet, write {self.END_MARKER} on its own line and stop.
+"""
+
+    def create_module_prompt(self, title: str, videos: List[Dict]) -> str:
+        """Module notes: the usual notes prompt over the module's video summaries"""
+        joined = "\n\n".join(f"[Video {i + 1}/{len(videos)}: {v['title']}]\n{v['summary']}"
+                             for i, v in enumerate(videos))
+        return self.create_notes_prompt(
+            "", context=f"(Summaries of the videos in the course module \"{title}\", in order)\n\n{joined}"
+        )
+
+    def create_course_prompt(self, title: str, modules: List[Dict]) -> str:
+        joined = "\n\n".join(
+            f"[Module {i + 1}/{len(modules)}: {m['title']}]\n{self._module_digest(m['notes'])}"
+            for i, m in enumerate(modules)
+        )
+        structure = "\n\n".join(f"### {heading}\n{guide}" for heading, guide in self.COURSE_SECTIONS)
+        return f"""You are an expert educational content creator. Write a course-level summary for the course "{title}" from the notes of its modules.
+
+
+**Instructions:**
+- Give the big picture: how the course progresses and what ties it together
+- DO NOT repeat the module notes; refer to modules by name
+- MAKE the progression clear to a student deciding what to study next
+
+
+**Module notes (in course order):**
+{joined}
+
+
+**Please provide your summary in this structure:**
+
+
+{structure}
+
+
+After the last section, write {self.END_MARKER} on its own line and stop.
+"""
+
+    @classmethod
+    def _module_digest(cls, notes: str) -> str:
+        """Core concept + key concepts of a module's notes (enough for the course level)"""
+        sections = cls.split_sections(notes)
+        keep = [cls.SECTIONS[0][0], cls.SECTIONS[1][0]]
+        return "\n".join(sections.get(heading, "") for heading in keep).strip() or notes
+
+    # ========== CACHED LEVELS ==========
+
+    @staticmethod
+    def level_key(version: str, parts: List[str]) -> str:
+        """Cache key of a level: its prompt version and the exact inputs from the level below"""
+        digest = hashlib.sha1("\x1f".join(parts).encode("utf-8")).hexdigest()
+        return f"v{version}:{digest}"
+
+    def _cached_level(self, kind: str, key: str, prompt_fn: Callable[[], str], sections: int,
+                      feature: str, video_id: Optional[str] = None) -> Tuple[Optional[str], Optional[str]]:
+        """Cached summary for (kind, key), else one model call whose result is stored"""
+        cached = summary_cache.get(kind, key)
+        if cached:
+            self._count(f"{kind}_reused")
+            return cached, None
+        # notify=False: video and module levels run on worker threads (no Streamlit context)
+        text, error = self._generate_with_fallback(prompt_fn(), sections, self.NOTES_STOP,
+                                                   feature=feature, video_id=video_id, notify=False)
+        if text:
+            summary_cache.put(kind, key, text)
+            self._count(f"{kind}_generated")
+        return text, error
+
+    def _count(self, name: str):
+        with self._progress_lock:
+            self.progress[name] += 1
+
+    def fetch_video(self, video_id: str) -> Tuple[Optional[str], str, Optional[str]]:
+        """
+        (transcript, title, error) for one video, fetched and indexed once per video_id
+        A fallback title is not cached, so a later rebuild can still find the real one
+        """
+        transcript, segments = summary_cache.get("transcript", video_id), None
+        if not transcript:
+            segments, error = TranscriptExtractor.get_transcript_segments(video_id)
+            transcript, _ = TranscriptNormalizer.normalize(segments or [])
+            if not transcript:
+                return None, video_id, error or "Transcript is empty after cleanup"
+
+        title = summary_cache.get("title", video_id)
+        if not title:
+            metadata, _ = TranscriptExtractor.get_video_metadata(video_id)
+            title = (metadata or {}).get("title") or video_id
+            if title not in (video_id, TranscriptExtractor.FALLBACK_TITLE.format(video_id=video_id)):
+                summary_cache.put("title", video_id, title)
+
+        if segments is not None:
+            # First fetch: index the captions and keep the transcript for later rebuilds
+            transcript_index.add(video_id, segments, title=title)
+            summary_cache.put("transcript", video_id, transcript)
+        return transcript, title, None
+
+    def summarize_video(self, video_id: str) -> Dict:
+        """Fetch, index and summarize one video -> {"video_id", "title", "transcript_hash", "summary", "error"}"""
+        transcript, title, error = self.fetch_video(video_id)
+        result = {"video_id": video_id, "title": title, "transcript_hash": None, "summary": None, "error": error}
+        if not transcript:
+            self._count("video_failed")
+            return result
+
+        # Keyed on the video and its transcript, not on fetched metadata
+        result["transcript_hash"] = hashlib.sha1(transcript.encode("utf-8")).hexdigest()
+        key = self.level_key(self.VIDEO_PROMPT_VERSION,
+                             [video_id, self.CHUNK_PROMPT_VERSION, result["transcript_hash"]])
+        result["summary"] = summary_cache.get("video", key)
+        if result["summary"]:
+            self._count("video_reused")
+            self._count("video_done")
+            return result
+
+        parts, result["error"] = self.summarize_chunks(transcript, video_id, feature="course")
+        if parts is not None and len(parts) == 1:
+            # A short video's single chunk summary is already its video summary
+            result["summary"] = parts[0]
+        elif parts is not None:
+            result["summary"], result["error"] = self._generate_with_fallback(
+                self.create_video_prompt(parts), 1, self.NOTES_STOP,
+                feature="course_video", video_id=video_id, notify=False
+            )
+        if result["summary"]:
+            summary_cache.put("video", key, result["summary"])
+            self._count("video_generated")
+        self._count("video_done")
+        return result
+
+    def _video_result(self, video_id: str, future: Future) -> Dict:
+        """summarize_video's result, or a failed entry so one broken video doesn't sink the course"""
+        try:
+            return future.result()
+        except Exception as e:
+            self._count("video_failed")
+            metrics.incr("course_video_errors", reason=type(e).__name__)
+            error = f"⏱️ {e}" if isinstance(e, DeadlineExceeded) else str(e) or type(e).__name__
+            return {"video_id": video_id, "title": video_id, "transcript_hash": None, "summary": None, "error": error}
+
+    def summarize_module(self, module: Dict, videos: List[Dict]) -> Dict:
+        done = [v for v in videos if v["summary"]]
+        result = {"title": module["title"], "videos": videos, "notes": None, "error": None}
+        if not done:
+            result["error"] = "No video in this module could be summarized"
+            return result
+        key = self.level_key(self.MODULE_PROMPT_VERSION, [module["title"], self.VIDEO_PROMPT_VERSION]
+                             + [f"{v['video_id']}:{v['transcript_hash']}" for v in done])
+        result["notes"], result["error"] = self._cached_level(
+            "module", key, functools.partial(self.create_module_prompt, module["title"], done),
+            len(self.SECTIONS), "course_module"
+        )
+        return result
+
+    # ========== BUILD ==========
+
+    @metrics.timed("course_notes")
+    def build(self, course_title: str, outline_text: str) -> Dict:
+        """
+        Course notes for an outline (see parse_outline)
+        Returns: {"title", "summary", "modules": [{"title", "notes", "videos", "error"}], "warnings", "error"}
+        """
+        course = {"title": course_title, "summary": None, "modules": [], "warnings": [], "error": None}
+        deadline = Deadline.current()
+        # Batch priority: interactive notes/quiz requests from other sessions go first
+        with FairScheduler.context(priority="batch"):
+            try:
+                modules, course["warnings"] = self.resolve_outline(self.parse_outline(outline_text))
+                if not modules:
+                    course["error"] = "No YouTube videos found in the outline"
+                    return course
+                video_ids = list(dict.fromkeys(v for m in modules for v in m["video_ids"]))
+                with self._progress_lock:
+                    self.progress["video_total"] = len(video_ids)
+
+                with ThreadPoolExecutor(max_workers=min(len(video_ids), self.MAX_VIDEO_WORKERS),
+                                        thread_name_prefix="course-video") as pool:
+                    futures = [pool.submit(in_current_context(functools.partial(self.summarize_video, v)))
+                               for v in video_ids]
+                    videos = {v: self._video_result(v, future) for v, future in zip(video_ids, futures)}
+                deadline.check("course_modules")
+
+                with ThreadPoolExecutor(max_workers=min(len(modules), self.MAX_VIDEO_WORKERS),
+                                        thread_name_prefix="course-module") as pool:
+                    futures = [
+                        pool.submit(in_current_context(functools.partial(
+                            self.summarize_module, m, [videos[v] for v in m["video_ids"]]
+                        )))
+                        for m in modules
+                    ]
+                    course["modules"] = [future.result() for future in futures]
+                deadline.check("course_summary")
+
+                done = [m for m in course["modules"] if m["notes"]]
+                if not done:
+                    course["error"] = next((m["error"] for m in course["modules"] if m["error"]),
+                                           "No module could be summarized")
+                    return course
+                key = self.level_key(self.COURSE_PROMPT_VERSION,
+                                     [course_title] + [f"{m['title']}\n{m['notes']}" for m in done])
+                course["summary"], course["error"] = self._cached_level(
+                    "course", key, functools.partial(self.create_course_prompt, course_title, done),
+                    len(self.COURSE_SECTIONS), "course_summary"
+                )
+            except DeadlineExceeded as e:
+                course["error"] = f"⏱️ {e}"
+
+        metrics.incr("course_notes_built", status="ok" if course["summary"] else "partial")
+        return course
+
+    # ========== EXPORT ==========
+
+    @staticmethod
+    def to_markdown(course: Dict) -> str:
+        """Single document: course summary, then each module's notes (headings nested one level down)"""
+        parts = [f"## 🎓 {course['title']} — Course Overview", course.get("summary") or "_Course summary unavailable._"]
+        for i, module in enumerate(course.get("modules", [])):
+            parts.append(f"## 📦 Module {i + 1}: {module['title']}")
+            videos = ", ".join(v["title"] for v in module["videos"])
+            parts.append(f"_Videos: {videos}_")
+            notes = module.get("notes") or f"_Notes unavailable: {module.get('error')}_"
+            parts.append(re.sub(r"^## ", "### ", notes, flags=re.MULTILINE))
+        return "\n\n".join(parts)
@@ -0,0 +1,192 @@
+"""
+Fair Scheduler - Shares Gemini concurrency between sessions
+Every model call waits for one of a fixed number of slots. Waiting calls are served
+by strict priority (interactive > prefetch > batch) and, within a priority, by
+deficit round-robin over tenants weighted by estimated tokens, so one session
+asking for 20-question quizzes cannot starve everyone else.
+"""
+
+import contextvars
+import functools
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Deque, Dict, Iterator, List, Optional
+
+from utils.deadline import Deadline
+from utils.metrics import metrics
+
+PRIORITIES = ("interactive", "prefetch", "batch")
+
+# Who the current call is for; set per Streamlit run / background job
+_tenant: contextvars.ContextVar = contextvars.ContextVar("gemini_tenant", default=None)
+_priority: contextvars.ContextVar = contextvars.ContextVar("gemini_priority", default=None)
+
+
+def in_current_context(fn: Callable) -> Callable:
+    """Wrap fn so it runs on a worker thread with the caller's tenant/priority"""
+    return functools.partial(contextvars.copy_context().run, fn)
+
+
+class _Ticket:
+    __slots__ = ("tenant", "cost", "granted", "enqueued")
+
+    def __init__(self, tenant: str, cost: int, enqueued: float):
+        self.tenant = tenant
+        self.cost = cost
+        self.granted = False
+        self.enqueued = enqueued
+
+
+class FairScheduler:
+    """Slot-limited admission with per-priority deficit round-robin"""
+
+    # Token credit a tenant earns per round; about one typical quiz or notes call
+    DEFAULT_QUANTUM = 3000
+
+    # Waiters re-check their deadline at least this often
+    WAIT_POLL_SECONDS = 0.5
+
+    def __init__(self, slots: Optional[int] = None, quantum: Optional[int] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        self.slots = slots or int(os.getenv("GEMINI_MAX_CONCURRENCY", "4"))
+        self.quantum = quantum or int(os.getenv("SCHEDULER_QUANTUM_TOKENS", str(self.DEFAULT_QUANTUM)))
+        self._clock = clock
+        self._cond = threading.Condition()
+        self._in_use = 0
+        self._queues: Dict[str, Dict[str, Deque[_Ticket]]] = {p: {} for p in PRIORITIES}
+        self._rings: Dict[str, Deque[str]] = {p: deque() for p in PRIORITIES}
+        self._deficit: Dict[str, Dict[str, int]] = {p: {} for p in PRIORITIES}
+
+    # ========== CALLER CONTEXT ==========
+
+    @staticmethod
+    @contextmanager
+    def context(tenant: Optional[str] = None, priority: Optional[str] = None) -> Iterator[None]:
+        """Attribute every Gemini call in this block to tenant / priority"""
+        tokens = []
+        if tenant is not None:
+            tokens.append((_tenant, _tenant.set(tenant)))
+        if priority is not None:
+            tokens.append((_priority, _priority.set(priority)))
+        try:
+            yield
+        finally:
+            for var, token in reversed(tokens):
+                var.reset(token)
+
+    @staticmethod
+    def set_tenant(tenant: str):
+        """Attribute calls on this thread to tenant (Streamlit sets it once per script run)"""
+        _tenant.set(tenant)
+
+    @staticmethod
+    def priority_for(feature: str) -> str:
+        """Explicit context priority, else prefetch features, else interactive"""
+        explicit = _priority.get()
+        if explicit in PRIORITIES:
+            return explicit
+        return "prefetch" if feature.startswith("prefetch") else "interactive"
+
+    # ========== ADMISSION ==========
+
+    @contextmanager
+    def slot(self, cost: int, feature: str, deadline: Optional[Deadline] = None) -> Iterator[None]:
+        """Hold one concurrency slot for the duration of a Gemini call"""
+        deadline = deadline or Deadline.current()
+        priority = self.priority_for(feature)
+        tenant = _tenant.get() or "anonymous"
+        ticket = _Ticket(tenant, max(int(cost), 1), self._clock())
+
+        with self._cond:
+            queue = self._queues[priority].get(tenant)
+            if queue is None:
+                queue = self._queues[priority][tenant] = deque()
+                self._rings[priority].append(tenant)
+                self._deficit[priority][tenant] = 0
+            queue.append(ticket)
+            self._dispatch()
+            self._publish_depth()
+            while not ticket.granted:
+                if deadline.expired():
+                    # Give up the place in line; nobody is waiting for this call any more
+                    self._withdraw(priority, ticket)
+                    deadline.check("scheduler_queue")
+                self._cond.wait(min(self.WAIT_POLL_SECONDS, deadline.remaining()))
+        waited = self._clock() - ticket.enqueued
+        metrics.observe("gemini_queue_wait", waited, priority=priority)
+        metrics.incr("gemini_scheduled", priority=priority)
+
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._in_use -= 1
+                self._dispatch()
+                self._publish_depth()
+                self._cond.notify_all()
+
+    def _dispatch(self):
+        """Grant free slots: highest priority first, DRR between tenants (call under lock)"""
+        while self._in_use < self.slots:
+            priority = next((p for p in PRIORITIES if self._rings[p]), None)
+            if priority is None:
+                return
+            ring, queues, deficit = self._rings[priority], self._queues[priority], self._deficit[priority]
+            tenant = ring[0]
+            head = queues[tenant][0]
+            if deficit[tenant] < head.cost:
+                # Not enough credit yet: earn a quantum and let the next tenant go
+                deficit[tenant] += self.quantum
+                ring.rotate(-1)
+                continue
+
+            deficit[tenant] -= head.cost
+            queues[tenant].popleft()
+            head.granted = True
+            self._in_use += 1
+            if not queues[tenant]:
+                # Idle tenants keep no credit (classic DRR)
+                ring.popleft()
+                del queues[tenant]
+                del deficit[tenant]
+            self._cond.notify_all()
+
+    def _withdraw(self, priority: str, ticket: _Ticket):
+        """Remove an ungranted ticket from its queue (call under lock)"""
+        queue = self._queues[priority].get(ticket.tenant)
+        if queue is not None and ticket in queue:
+            queue.remove(ticket)
+            if not queue:
+                self._rings[priority].remove(ticket.tenant)
+                del self._queues[priority][ticket.tenant]
+                del self._deficit[priority][ticket.tenant]
+        self._publish_depth()
+
+    def _publish_depth(self):
+        for priority in PRIORITIES:
+            metrics.set_gauge("gemini_queue_depth", self.depth(priority), priority=priority)
+        metrics.set_gauge("gemini_slots_in_use", self._in_use)
+
+    # ========== INTROSPECTION ==========
+
+    def depth(self, priority: Optional[str] = None) -> int:
+        """Calls waiting for a slot (optionally for one priority)"""
+        priorities = [priority] if priority else PRIORITIES
+        return sum(len(q) for p in priorities for q in self._queues[p].values())
+
+    def snapshot(self) -> List[Dict]:
+        """Per priority/tenant queue state for the admin page"""
+        with self._cond:
+            return [
+                {"priority": p, "tenant": tenant[:8], "waiting": len(queue),
+                 "oldest_wait_s": round(self._clock() - queue[0].enqueued, 2),
+                 "deficit": self._deficit[p].get(tenant, 0)}
+                for p in PRIORITIES for tenant, queue in self._queues[p].items()
+            ]
+
+
+# ✅ Process-wide scheduler shared by every Streamlit session
+fair_scheduler = FairScheduler()
@@ -0,0 +1,278 @@
+"""
+Gemini Gateway - Single choke point for generate_content calls
+Adds pre-flight size checks, timing spans and token accounting
+"""
+
+import copy
+import threading
+import time
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+
+from google.genai import types
+
+from services.context_cache import CacheRef, context_cache
+from services.fair_scheduler import fair_scheduler
+from utils.deadline import Deadline, DeadlineExceeded
+from utils.metrics import metrics
+from utils.token_ledger import estimate_tokens, token_ledger
+
+
+class PromptTooLargeError(Exception):
+    """Raised before sending a prompt whose estimated size exceeds the budget"""
+
+
+class GeminiGateway:
+    """Every Gemini request goes through generate()"""
+
+    # Model fallback order with their free-tier daily request limits
+    MODELS = [
+        {"name": "gemini-2.5-flash-lite", "limit": "1000/day", "max_tokens": 8192},
+        {"name": "gemini-2.5-flash",      "limit": "250/day",  "max_tokens": 8192},
+    ]
+
+    # Pre-flight cap on estimated prompt tokens (our prompts are ~1-2k tokens)
+    MAX_PROMPT_TOKENS = 12000
+
+    # Upper bound for one HTTP call; the request deadline usually cuts it shorter
+    CALL_TIMEOUT_SECONDS = 120
+
+    # After a quota error a model/key pair counts as exhausted for this long
+    QUOTA_RETRY_SECONDS = 900
+    _quota_hits: Dict[Tuple[str, str], float] = {}
+    _quota_lock = threading.Lock()
+
+    @staticmethod
+    def preflight(prompt: str, model: str, feature: str) -> int:
+        """Estimate prompt tokens locally; reject oversized prompts before sending"""
+        estimate = estimate_tokens(prompt)
+        if estimate > GeminiGateway.MAX_PROMPT_TOKENS:
+            metrics.incr("gemini_preflight_rejections", model=model, feature=feature)
+            raise PromptTooLargeError(
+                f"Prompt too large ({estimate} est. tokens > {GeminiGateway.MAX_PROMPT_TOKENS})"
+            )
+        return estimate
+
+    @staticmethod
+    def _cost(prompt_estimate: int, config) -> int:
+        """Scheduler cost of a call: prompt tokens plus the output it may produce"""
+        return prompt_estimate + (getattr(config, "max_output_tokens", None) or 0)
+
+    @staticmethod
+    def _with_timeout(config, deadline: Deadline):
+        """Copy of config whose HTTP timeout fits in what is left of the request deadline"""
+        if not deadline.bounded or not hasattr(config, "model_copy"):
+            return config
+        timeout_ms = int(deadline.timeout(GeminiGateway.CALL_TIMEOUT_SECONDS) * 1000)
+        return config.model_copy(update={"http_options": types.HttpOptions(timeout=timeout_ms)})
+
+    @staticmethod
+    def _without_thinking(config):
+        """
+        Copy of a capped config with thinking off: 2.5 models count thought tokens against
+        max_output_tokens, so a budget sized for the answer would truncate or empty it
+        """
+        if not getattr(config, "max_output_tokens", None) or getattr(config, "thinking_config", None) \
+                or not hasattr(config, "model_copy"):
+            return config
+        return config.model_copy(update={"thinking_config": types.ThinkingConfig(thinking_budget=0)})
+
+    @staticmethod
+    def _check_truncation(response, model: str, feature: str):
+        """Count responses cut off by max_output_tokens (budget too tight)"""
+        candidates = getattr(response, "candidates", None) or []
+        reason = getattr(candidates[0], "finish_reason", None) if candidates else None
+        if reason is not None and "MAX_TOKENS" in str(reason):
+            metrics.incr("gemini_truncated_responses", model=model, feature=feature)
+
+    # ========== QUOTA STATE ==========
+
+    @staticmethod
+    def is_quota_error(error: Union[Exception, str]) -> bool:
+        """True for quota / rate-limit failures (an exception or a final error message)"""
+        message = str(error).lower()
+        return "quota" in message or "429" in message or "resource_exhausted" in message
+
+    @staticmethod
+    def _note_outcome(model: str, key_label: str, error: Optional[Exception] = None):
+        """Remember quota errors per model/key; a success clears the mark"""
+        with GeminiGateway._quota_lock:
+            if error is None:
+                GeminiGateway._quota_hits.pop((model, key_label), None)
+            elif GeminiGateway.is_quota_error(error):
+                GeminiGateway._quota_hits[(model, key_label)] = time.monotonic()
+
+    @staticmethod
+    def quota_available(key_labels: List[str]) -> bool:
+        """True if some model/key pair has not hit a quota error recently"""
+        now = time.monotonic()
+        with GeminiGateway._quota_lock:
+            return any(
+                now - GeminiGateway._quota_hits.get((m['name'], key), float("-inf")) > GeminiGateway.QUOTA_RETRY_SECONDS
+                for m in GeminiGateway.MODELS for key in key_labels
+            )
+
+    @staticmethod
+    def _with_cached_content(config, cache_name: str):
+        """Copy of a GenerateContentConfig that references cached content"""
+        if hasattr(config, "model_copy"):
+            return config.model_copy(update={"cached_content": cache_name})
+        config = copy.copy(config)
+        config.cached_content = cache_name
+        return config
+
+    @staticmethod
+    def _is_cache_error(error: Exception) -> bool:
+        """The API rejected the cached-content handle (expired, deleted, wrong model)"""
+        message = str(error).lower()
+        return "cache" in message and "quota" not in message and "429" not in message
+
+    @staticmethod
+    def _cached_call(client, model_info: Dict, config, key_label: str, cache: Optional[CacheRef]):
+        """(prompt, config) to send with the cache, or None to send inline"""
+        if cache is None:
+            return None
+        cache_name = context_cache.acquire(client, model_info['name'], key_label, cache)
+        if not cache_name:
+            return None
+        return cache.prompt, GeminiGateway._with_cached_content(config, cache_name)
+
+    @staticmethod
+    def generate(client, model_info: Dict, prompt: str, config, *, feature: str,
+                 key_label: str, video_id: Optional[str] = None,
+                 unit_kind: Optional[str] = None, units: int = 0,
+                 cache: Optional[CacheRef] = None, **span_labels):
+        """
+        Call client.models.generate_content with pre-flight, span and token accounting
+        unit_kind/units (e.g. "quiz", 5 questions) feed the learned output budgets
+        cache: send cache.prompt against the cached transcript when a handle is available
+        """
+        cached_call = GeminiGateway._cached_call(client, model_info, config, key_label, cache)
+        if cached_call:
+            try:
+                return GeminiGateway._send(client, model_info, cached_call[0], cached_call[1],
+                                           feature=feature, key_label=key_label, video_id=video_id,
+                                           unit_kind=unit_kind, units=units, cached="1", **span_labels)
+            except Exception as e:
+                if not GeminiGateway._is_cache_error(e):
+                    raise
+                context_cache.invalidate(model_info['name'], key_label, cache.video_id)
+                metrics.incr("context_cache_fallbacks", model=model_info['name'], reason="rejected")
+
+        return GeminiGateway._send(client, model_info, prompt, config, feature=feature,
+                                   key_label=key_label, video_id=video_id,
+                                   unit_kind=unit_kind, units=units, **span_labels)
+
+    @staticmethod
+    def _send(client, model_info: Dict, prompt: str, config, *, feature: str, key_label: str,
+              video_id: Optional[str], unit_kind: Optional[str], units: int, **span_labels):
+        model = model_info['name']
+        estimate = GeminiGateway.preflight(prompt, model, feature)
+        deadline = Deadline.current()
+        deadline.check("gemini")
+        config = GeminiGateway._without_thinking(config)
+
+        try:
+            # Wait for a fair share of the shared concurrency before timing the attempt
+            with fair_scheduler.slot(GeminiGateway._cost(estimate, config), feature, deadline), \
+                    metrics.span("gemini_attempt", feature=feature, model=model,
+                                 key=key_label, **span_labels):
+                response = client.models.generate_content(
+                    model=model,
+                    contents=prompt,
+                    config=GeminiGateway._with_timeout(config, deadline)
+                )
+        except DeadlineExceeded:
+            raise
+        except Exception as e:
+            metrics.incr("gemini_failed_requests", model=model, key=key_label, feature=feature)
+            GeminiGateway._note_outcome(model, key_label, e)
+            if deadline.expired():
+                raise DeadlineExceeded(deadline.message(), cancelled=deadline.cancelled) from e
+            raise
+
+        GeminiGateway._note_outcome(model, key_label)
+        GeminiGateway._check_truncation(response, model, feature)
+        token_ledger.record_response(response, model, key_label, feature,
+                                     prompt=prompt, video_id=video_id,
+                                     unit_kind=unit_kind, units=units)
+        return response
+
+    @staticmethod
+    def generate_stream(client, model_info: Dict, prompt: str, config, *, feature: str,
+                        key_label: str, video_id: Optional[str] = None,
+                        unit_kind: Optional[str] = None, units: int = 0,
+                        cache: Optional[CacheRef] = None, **span_labels) -> Iterator[str]:
+        """Streaming variant of generate(): yields text chunks, accounts usage at the end"""
+        cached_call = GeminiGateway._cached_call(client, model_info, config, key_label, cache)
+        if cached_call:
+            started = False
+            try:
+                for text in GeminiGateway._send_stream(client, model_info, cached_call[0], cached_call[1],
+                                                       feature=feature, key_label=key_label,
+                                                       video_id=video_id, unit_kind=unit_kind,
+                                                       units=units, cached="1", **span_labels):
+                    started = True
+                    yield text
+                return
+            except Exception as e:
+                # Once text has been shown we cannot restart the stream inline
+                if started or not GeminiGateway._is_cache_error(e):
+                    raise
+                context_cache.invalidate(model_info['name'], key_label, cache.video_id)
+                metrics.incr("context_cache_fallbacks", model=model_info['name'], reason="rejected")
+
+        yield from GeminiGateway._send_stream(client, model_info, prompt, config, feature=feature,
+                                              key_label=key_label, video_id=video_id,
+                                              unit_kind=unit_kind, units=units, **span_labels)
+
+    @staticmethod
+    def _send_stream(client, model_info: Dict, prompt: str, config, *, feature: str, key_label: str,
+                     video_id: Optional[str], unit_kind: Optional[str], units: int,
+                     **span_labels) -> Iterator[str]:
+        model = model_info['name']
+        estimate = GeminiGateway.preflight(prompt, model, feature)
+        deadline = Deadline.current()
+        deadline.check("gemini_stream")
+        config = GeminiGateway._without_thinking(config)
+
+        last_chunk = None
+        received = []
+        try:
+            with fair_scheduler.slot(GeminiGateway._cost(estimate, config), feature, deadline), \
+                    metrics.span("gemini_attempt", feature=feature, model=model,
+                                 key=key_label, stream="1", **span_labels):
+                for chunk in client.models.generate_content_stream(
+                    model=model,
+                    contents=prompt,
+                    config=GeminiGateway._with_timeout(config, deadline)
+                ):
+                    # Stop reading (and paying for) output nobody is waiting for
+                    deadline.check("gemini_stream")
+                    last_chunk = chunk
+                    text = getattr(chunk, "text", None)
+                    if text:
+                        received.append(text)
+                        yield text
+            GeminiGateway._note_outcome(model, key_label)
+        except DeadlineExceeded:
+            raise
+        except Exception as e:
+            metrics.incr("gemini_failed_requests", model=model, key=key_label, feature=feature)
+            GeminiGateway._note_outcome(model, key_label, e)
+            if deadline.expired():
+                raise DeadlineExceeded(deadline.message(), cancelled=deadline.cancelled) from e
+            raise
+        finally:
+            if last_chunk is not None:
+                GeminiGateway._check_truncation(last_chunk, model, feature)
+                # usage_metadata on the final chunk covers the whole response
+                usage = getattr(last_chunk, "usage_metadata", None)
+                token_ledger.record(
+                    model, key_label, feature,
+                    getattr(usage, "prompt_token_count", None) or estimate_tokens(prompt),
+                    (getattr(usage, "candidates_token_count", None) or estimate_tokens("".join(received)))
+                    + (getattr(usage, "thoughts_token_count", None) or 0),
+                    video_id=video_id,
+                    cached_tokens=getattr(usage, "cached_content_token_count", None) or 0,
+                    unit_kind=unit_kind, units=units,
+                )
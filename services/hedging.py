@@ -0,0 +1,105 @@
+"""
+Hedged Requests - Tail-latency control for Gemini calls
+If an attempt runs past the model's p90 latency, the same request is launched on
+the next model; the first acceptable result wins. Hedges are capped to a share of
+all calls so they cannot blow through quota.
+"""
+
+import functools
+import os
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Optional, TypeVar
+
+from services.fair_scheduler import in_current_context
+from utils.deadline import Deadline
+from utils.metrics import metrics, percentile
+
+T = TypeVar("T")
+
+
+class Hedger:
+    """Run a primary call, adding a backup call when the primary is slow"""
+
+    # Until enough latencies are observed, hedge after this many seconds
+    DEFAULT_THRESHOLD_SECONDS = 15.0
+    MIN_THRESHOLD_SECONDS = 3.0
+    MIN_SAMPLES = 20
+    PERCENTILE = 90
+
+    # Extra hedges allowed on top of the percentage budget (lets a cold process hedge)
+    BURST = 2
+
+    def __init__(self):
+        self.enabled = os.getenv("HEDGE_ENABLED", "1") != "0"
+        self.budget_pct = float(os.getenv("HEDGE_BUDGET_PCT", "10"))
+        self._lock = threading.Lock()
+        self._calls = 0
+        self._hedges = 0
+        # Shared by every session; primaries and backups both run here
+        self._executor = ThreadPoolExecutor(max_workers=32, thread_name_prefix="gemini-hedge")
+
+    def threshold(self, model: str) -> float:
+        """p90 of recent successful attempt latencies for this model"""
+        samples = metrics.samples_matching("gemini_attempt", model=model, status="ok")
+        if len(samples) < self.MIN_SAMPLES:
+            return self.DEFAULT_THRESHOLD_SECONDS
+        return max(self.MIN_THRESHOLD_SECONDS, percentile(samples, self.PERCENTILE))
+
+    def _take_hedge_token(self) -> bool:
+        """Allow a hedge only while hedges stay within budget_pct of calls (+ burst)"""
+        with self._lock:
+            if self._hedges >= self._calls * self.budget_pct / 100.0 + self.BURST:
+                return False
+            self._hedges += 1
+            return True
+
+    @staticmethod
+    def _leg(fn: Callable[[], T], deadline: Deadline) -> T:
+        with deadline.activate():
+            return fn()
+
+    def call(self, primary: Callable[[], T], backup: Optional[Callable[[], T]],
+             accept: Callable[[T], bool], model: str, feature: str) -> T:
+        """
+        Run primary(); if it outlives the threshold, also run backup()
+        Returns the first accepted result, else the primary's outcome (result or exception)
+        Each leg runs under its own child deadline; the loser's is cancelled, so it leaves
+        the scheduler queue or stops at its next checkpoint instead of spending quota
+        """
+        with self._lock:
+            self._calls += 1
+        if not self.enabled or backup is None:
+            return primary()
+
+        # Worker threads keep the caller's tenant/priority for the fair scheduler
+        parent = Deadline.current()
+        first_deadline, second_deadline = parent.child(), parent.child()
+        first = self._executor.submit(in_current_context(functools.partial(self._leg, primary, first_deadline)))
+        done, _ = wait([first], timeout=self.threshold(model))
+        if done or not self._take_hedge_token():
+            if not done:
+                metrics.incr("gemini_hedges_skipped", feature=feature, reason="budget")
+            return first.result()
+
+        metrics.incr("gemini_hedges", feature=feature, model=model)
+        second = self._executor.submit(in_current_context(functools.partial(self._leg, backup, second_deadline)))
+        leg_deadlines = {first: first_deadline, second: second_deadline}
+        pending = {first, second}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None and accept(future.result()):
+                    for loser in pending:
+                        if not loser.cancel():
+                            # Already running: its slot wait, stream or retry stops at the next check
+                            leg_deadlines[loser].cancel("Superseded")
+                            metrics.incr("gemini_hedge_losers_cancelled", feature=feature)
+                    metrics.incr("gemini_hedge_wins", feature=feature,
+                                 winner="backup" if future is second else "primary")
+                    return future.result()
+        return first.result()
+
+
+# ✅ Process-wide hedger (budget is shared across sessions)
+hedger = Hedger()
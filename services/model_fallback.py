@@ -0,0 +1,134 @@
+"""
+Model Fallback - API key rotation and the model-fallback loop shared by the generators
+Key rotation is safe when several worker threads hit quota errors at once, and the
+loop drives any attempt function through the model list with hedging.
+"""
+
+import functools
+import os
+import threading
+from typing import Callable, List, Optional, Tuple, TypeVar
+
+from google import genai
+
+from services.gemini_gateway import GeminiGateway, PromptTooLargeError
+from services.hedging import hedger
+from utils.deadline import Deadline, DeadlineExceeded
+from utils.metrics import metrics
+
+T = TypeVar("T")
+
+
+class ModelFallback:
+    """
+    Base for generators holding self.models, self.key_manager and self.client
+    _connect() sets them up; subclasses with their own setup must also set self._client_lock
+    """
+
+    def _connect(self) -> bool:
+        """Model list, key manager and client for the current key. Returns False without a key"""
+        self.models = [dict(m) for m in GeminiGateway.MODELS]
+        self._client_lock = threading.Lock()
+        try:
+            from utils.api_key_manager import APIKeyManager
+            self.key_manager = APIKeyManager()
+            api_key = self.key_manager.get_current_key()
+        except Exception:
+            api_key = os.getenv("GEMINI_API_KEY") or os.getenv("GEMINI_API_KEY_1")
+            self.key_manager = None
+        self.client = genai.Client(api_key=api_key) if api_key else None
+        return self.client is not None
+
+    def _key_label(self) -> str:
+        """Non-secret label for the active API key (for metrics)"""
+        if self.key_manager is None:
+            return "env"
+        return f"key{self.key_manager.current_index + 1}"
+
+    def _key_index(self) -> Optional[int]:
+        return self.key_manager.current_index if self.key_manager else None
+
+    def _rotate_key(self, failed_index: Optional[int], feature: str) -> bool:
+        """
+        Switch to the next key after a quota error on key failed_index (thread-safe)
+        If another worker already rotated past the failed key, just reuse the new one
+        """
+        if self.key_manager is None:
+            return False
+        with self._client_lock:
+            if self.key_manager.current_index != failed_index:
+                return True
+            if not self.key_manager.rotate_key():
+                return False
+            self.client = genai.Client(api_key=self.key_manager.get_current_key())
+            metrics.incr("gemini_key_rotations", feature=feature)
+            return True
+
+    def _run_model_fallback(self, attempt: Callable[..., T], feature: str, stage: str,
+                            accept: Callable[[T], bool] = bool, reject_reason: str = "rejected",
+                            on_attempt: Optional[Callable[[], None]] = None,
+                            on_error: Optional[Callable[[Exception], None]] = None) -> Tuple[Optional[T], List[str]]:
+        """
+        Try each model (hedged on the next one), retrying once with a new key on quota errors
+        attempt(model_info, **span_labels) makes one call; the first accepted result wins
+        on_error sees every failed call (not deadline expiry), so callers can tell quota from other failures
+        No Streamlit calls here, so it can run on worker threads
+        Returns: (result or None, warnings)
+        """
+        warnings: List[str] = []
+        deadline = Deadline.current()
+
+        for i, model_info in enumerate(self.models):
+            next_model = self.models[i + 1] if i + 1 < len(self.models) else None
+            retried_with_new_key = False
+            while True:
+                key_index = self._key_index()
+                deadline.check(stage)
+                if on_attempt:
+                    on_attempt()
+                try:
+                    # ✅ Slow attempts are hedged on the next model; first accepted result wins
+                    result = hedger.call(
+                        functools.partial(attempt, model_info,
+                                          **({"retry": "key_rotation"} if retried_with_new_key else {})),
+                        functools.partial(attempt, next_model, hedge="1") if next_model else None,
+                        accept=accept, model=model_info['name'], feature=feature
+                    )
+                    if accept(result):
+                        return result, warnings
+                    metrics.incr("gemini_fallbacks", feature=feature, model=model_info['name'], reason=reject_reason)
+                    break
+
+                except PromptTooLargeError as e:
+                    if on_error:
+                        on_error(e)
+                    warnings.append(f"❌ {e}")
+                    return None, warnings
+
+                except DeadlineExceeded:
+                    raise
+
+                except Exception as e:
+                    error_msg = str(e)
+                    if on_error:
+                        on_error(e)
+
+                    # Handle quota errors - try rotating API key first
+                    if GeminiGateway.is_quota_error(e):
+                        metrics.incr("gemini_fallbacks", feature=feature, model=model_info['name'], reason="quota")
+                        # Retry same model with new key (don't continue to next model yet)
+                        if not retried_with_new_key and self._rotate_key(key_index, feature):
+                            warnings.append("🔑 Quota exceeded, switched to backup API key...")
+                            retried_with_new_key = True
+                            continue
+                        warnings.append("⚠️ Quota exceeded, trying next model...")
+                    elif "api" in error_msg.lower() or "404" in error_msg:
+                        warnings.append(f"⚠️ API error with {model_info['name']}, trying next model...")
+                        metrics.incr("gemini_fallbacks", feature=feature, model=model_info['name'], reason="api")
+                    else:
+                        warnings.append(f"⚠️ Error with {model_info['name']}, trying next model...")
+                        metrics.incr("gemini_fallbacks", feature=feature, model=model_info['name'], reason="error")
+                    deadline.sleep(1)
+                    break
+
+        return None, warnings
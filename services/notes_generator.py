@@ -3,30 +3,71 @@ AI Notes Generator Service
 Updated to use google.genai (new SDK)
 """
 
-from google import genai
 from google.genai import types
 import streamlit as st
-import time
-from typing import Tuple, Optional
+import functools
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Tuple, Optional
 
+from services.context_cache import CacheRef, context_cache
+from services.fair_scheduler import in_current_context
+from services.gemini_gateway import GeminiGateway, PromptTooLargeError
+from services.model_fallback import ModelFallback
+from utils.chunk_selector import ChunkSelector
+from utils.content_chunker import ContentChunk, ContentChunker
+from utils.deadline import DeadlineExceeded
+from utils.metrics import metrics
+from utils.notes_sections import SECTIONS, join_sections, split_sections
+from utils.output_budget import OutputBudget
+from utils.summary_cache import summary_cache
 
-class NotesGenerator:
+
+class NotesGenerator(ModelFallback):
     """Smart Gemini AI service with automatic model fallback"""
-    
-    def __init__(self):
-        from utils.api_key_manager import APIKeyManager
-        self.key_manager = APIKeyManager()
-        self.client = genai.Client(api_key=self.key_manager.get_current_key())
-        
-        self.models = [
-            {"name": "gemini-2.5-flash-lite", "limit": "1000/day", "max_tokens": 8192},
-            {"name": "gemini-2.5-flash",      "limit": "250/day",  "max_tokens": 8192},
-        ]
-
-
-    
-    def create_notes_prompt(self, transcript: str) -> str:
-        """Create structured prompt for notes generation"""
+
+    # Fixed notes structure, shared with the offline notes (utils.notes_sections)
+    SECTIONS = SECTIONS
+
+    # Max transcript characters sent per prompt
+    TRANSCRIPT_BUDGET = 4000
+
+    # Stop conditions: the model ends full notes with END_MARKER; a rewritten
+    # section must not run on into the next "## " heading
+    END_MARKER = "<<END_OF_NOTES>>"
+    NOTES_STOP = [END_MARKER]
+    SECTION_STOP = ["\n## "]
+
+    # OutputBudget / token ledger unit for one response section
+    UNIT_KIND = "notes"
+
+    # ... and for one part summary (map step), which is shorter than a notes section
+    CHUNK_UNIT_KIND = "notes_chunk"
+
+    # Longer transcripts are summarized per content-defined chunk (cached by hash), then merged
+    CHUNKED_MIN_CHARS = 12000
+
+    # Bump when create_chunk_prompt changes so cached chunk summaries are not reused
+    CHUNK_PROMPT_VERSION = "1"
+
+    # Final errors when no model could answer
+    QUOTA_ERROR = "Daily AI quota exhausted. Please try again tomorrow or reduce content length."
+    NO_KEY_ERROR = "No Gemini API key configured"
+
+    # Chunk summaries requested in parallel (the fair scheduler still caps global concurrency)
+    MAX_CHUNK_WORKERS = 4
+
+    def __init__(self, silent: bool = False):
+        # Silent generators skip Streamlit messages (used from background threads)
+        self.silent = silent
+        self._connect()
+
+    def create_notes_prompt(self, transcript: str, context: Optional[str] = None) -> str:
+        """Create structured prompt for notes generation (context overrides the transcript excerpt)"""
+        if context is None:
+            context = ChunkSelector.select(transcript, self.TRANSCRIPT_BUDGET)
+        structure = "\n\n\n".join(f"## {heading}\n{guide}" for heading, guide in self.SECTIONS)
         return f"""You are an expert educational content creator. Generate comprehensive, well-structured study notes from this video transcript.
 
 
@@ -40,97 +81,254 @@ class NotesGenerator:
 
 
 **Transcript:**
-{transcript[:4000]}
+{context}
 
 
 **Please provide your analysis in this structure:**
 
 
-## 🎯 Core Concept
-[Main idea/theme in 1-2 sentences]
+{structure}
+
+
+After the last section, write {self.END_MARKER} on its own line and stop.
+"""
+
+    def create_chunk_prompt(self, chunk: str) -> str:
+        """Map step: compact bullet summary of one part of the transcript"""
+        return f"""You are an expert educational content creator. Summarize this PART of a longer video transcript for a note-taker who will combine all parts later.
 
 
-## 📚 Key Concepts Explained
-[Detailed explanation of main concepts - not summary]
+**Instructions:**
+- List the concepts, definitions, explanations, examples and advice it contains as concise bullets
+- KEEP specific terms, numbers and names
+- No introduction or conclusion; at most 200 words
+
 
+**Transcript part:**
+{chunk}
+
+
+After the last bullet, write {self.END_MARKER} on its own line and stop.
+"""
 
-## 🔍 Important Insights
-[Key insights and deeper understanding points]
+    def create_merge_prompt(self, transcript: str, summaries: List[str]) -> str:
+        """Reduce step: the usual notes prompt over the ordered part summaries"""
+        parts = "\n\n".join(f"[Part {i + 1}/{len(summaries)}]\n{s}" for i, s in enumerate(summaries))
+        return self.create_notes_prompt(
+            transcript, context=f"(Summaries of consecutive parts of the video, in order)\n\n{parts}"
+        )
 
+    def create_section_prompt(self, transcript: str, heading: str, sections: Dict[str, str],
+                              context: Optional[str] = None) -> str:
+        """Smaller prompt that rewrites one section, keeping the rest as context"""
+        guide = dict(self.SECTIONS).get(heading, "")
+        if context is None:
+            context = ChunkSelector.select(transcript, self.TRANSCRIPT_BUDGET)
+        core = sections.get(self.SECTIONS[0][0], "").strip()
+        current = sections.get(heading, "").strip() or "(missing)"
+        core_line = f"\n**Core concept of these notes (keep consistent):**\n{core}\n" if core and heading != self.SECTIONS[0][0] else ""
+        return f"""You are an expert educational content creator. Rewrite ONE section of existing study notes so it is clearer, more specific and more useful.
 
-## 💡 Practical Takeaways
-[What viewers should remember/apply]
+**Section to rewrite:** {heading}
+**What it must contain:** {guide}
+{core_line}
+**Current version (weak, improve it):**
+{current}
 
+**Transcript:**
+{context}
 
-## 🎓 Why This Matters
-[Broader significance and relevance]
+Return ONLY the new body of this section in Markdown — no "## " heading line and no other sections.
 """
-    
-    def generate_notes(self, transcript: str) -> Tuple[Optional[str], Optional[str]]:
+
+    # ========== SECTION HELPERS ==========
+
+    split_sections = staticmethod(split_sections)
+    join_sections = staticmethod(join_sections)
+
+    # ========== GENERATION ==========
+
+    @classmethod
+    def _strip_marker(cls, text: str) -> str:
+        """Drop the end marker if the API returned it (stop sequences normally swallow it)"""
+        return text.split(cls.END_MARKER)[0].strip()
+
+    def _notify(self, level: str, message: str):
+        """st.info / st.warning unless running silently"""
+        if not self.silent:
+            getattr(st, level)(message)
+
+    def notes_config(self, model_info: Dict, sections: int, stop_sequences: List[str],
+                     unit_kind: Optional[str] = None) -> types.GenerateContentConfig:
+        """Generation config with an output budget sized to the number of sections"""
+        return types.GenerateContentConfig(
+            temperature=0.7,
+            top_p=0.8,
+            top_k=40,
+            max_output_tokens=OutputBudget.tokens(unit_kind or self.UNIT_KIND, sections,
+                                                  model_info['max_tokens']),
+            stop_sequences=stop_sequences,
+        )
+
+    def _attempt(self, model_info: Dict, prompt: str, sections: int, stop_sequences: List[str],
+                 feature: str, video_id: Optional[str], cache: Optional[CacheRef] = None,
+                 unit_kind: Optional[str] = None, **span_labels) -> Optional[str]:
+        """One model call -> notes text (no Streamlit calls; may run on a hedge thread)"""
+        unit_kind = unit_kind or self.UNIT_KIND
+        # ✅ All calls go through the gateway (pre-flight, context cache, token accounting)
+        response = GeminiGateway.generate(
+            self.client, model_info, prompt,
+            self.notes_config(model_info, sections, stop_sequences, unit_kind),
+            feature=feature, key_label=self._key_label(), video_id=video_id,
+            unit_kind=unit_kind, units=sections, cache=cache, **span_labels
+        )
+        if response and response.text:
+            return self._strip_marker(response.text)
+        return None
+
+    def _generate_with_fallback(self, prompt: str, sections: int, stop_sequences: List[str],
+                                feature: str = "notes", video_id: Optional[str] = None,
+                                cache: Optional[CacheRef] = None, unit_kind: Optional[str] = None,
+                                notify: bool = True) -> Tuple[Optional[str], Optional[str]]:
+        """
+        Run one prompt through the shared model fallback (hedging, thread-safe key rotation)
+        cache: transcript-referencing variant of the prompt (see ContextCache)
+        notify=False keeps Streamlit calls out of worker threads (no script run context there)
+        Returns: (text, error_message)
+        """
+        if self.client is None:
+            return None, self.NO_KEY_ERROR
+        if notify:
+            self._notify("info", "🤖 AI Engine processing your content...")
+
+        errors: List[Exception] = []
+        try:
+            text, warnings = self._run_model_fallback(
+                functools.partial(self._attempt, prompt=prompt, sections=sections, stop_sequences=stop_sequences,
+                                  feature=feature, video_id=video_id, cache=cache, unit_kind=unit_kind),
+                feature, stage="notes", reject_reason="empty", on_error=errors.append
+            )
+        except DeadlineExceeded as e:
+            return None, f"⏱️ {e}"
+
+        if notify:
+            for warning in warnings:
+                self._notify("warning", warning)
+        if text:
+            return text, None
+        if errors and all(GeminiGateway.is_quota_error(e) for e in errors):
+            return None, self.QUOTA_ERROR
+        if errors:
+            error = errors[-1]
+            return None, str(error) if isinstance(error, PromptTooLargeError) else f"AI request failed: {error}"
+        return None, "The AI returned empty notes. Please try again."
+
+    # ========== CHUNKED NOTES ==========
+
+    @classmethod
+    def chunked(cls, transcript: str) -> bool:
+        """Use per-chunk summaries + merge for long transcripts (NOTES_CHUNKED=0 disables)"""
+        return os.getenv("NOTES_CHUNKED", "1") != "0" and len(transcript) >= cls.CHUNKED_MIN_CHARS
+
+    @classmethod
+    def chunk_key(cls, chunk: ContentChunk) -> str:
+        return f"v{cls.CHUNK_PROMPT_VERSION}:{chunk.digest}"
+
+    def summarize_chunks(self, transcript: str, video_id: Optional[str] = None,
+                         feature: str = "notes") -> Tuple[Optional[List[str]], Optional[str]]:
+        """
+        Summary per content-defined chunk; only chunks whose hash is not cached call the model
+        Returns: (summaries in transcript order, error_message)
+        """
+        chunks = ContentChunker.split(transcript)
+        keys = [self.chunk_key(c) for c in chunks]
+        summaries = summary_cache.get_many("chunk", keys)
+        missing = list({k: c for k, c in zip(keys, chunks) if k not in summaries}.items())
+        metrics.incr("notes_chunks_reused", len(chunks) - len(missing))
+        metrics.incr("notes_chunks_summarized", len(missing))
+
+        if missing:
+            # Streamlit messages only from this (script) thread; workers run with notify=False
+            self._notify("info", f"🤖 AI Engine summarizing {len(missing)} of {len(chunks)} parts...")
+            with ThreadPoolExecutor(max_workers=min(len(missing), self.MAX_CHUNK_WORKERS),
+                                    thread_name_prefix="notes-chunk") as pool:
+                futures = [
+                    pool.submit(in_current_context(functools.partial(
+                        self._generate_with_fallback, self.create_chunk_prompt(chunk.text), 1,
+                        self.NOTES_STOP, feature=f"{feature}_chunk", video_id=video_id,
+                        unit_kind=self.CHUNK_UNIT_KIND, notify=False
+                    )))
+                    for _, chunk in missing
+                ]
+                results = [future.result() for future in futures]
+
+            errors = []
+            for (key, _), (text, error) in zip(missing, results):
+                if text:
+                    # Kept even if another chunk failed, so a retry only redoes the failures
+                    summary_cache.put("chunk", key, text)
+                    summaries[key] = text
+                else:
+                    errors.append(error)
+            if errors:
+                return None, errors[0]
+        return [summaries[k] for k in keys], None
+
+    def generate_notes_chunked(self, transcript: str, video_id: Optional[str] = None,
+                               feature: str = "notes") -> Tuple[Optional[str], Optional[str]]:
+        """Map (cached per chunk) then one merge call over the part summaries"""
+        summaries, error = self.summarize_chunks(transcript, video_id, feature)
+        if summaries is None:
+            return None, error
+        return self._generate_with_fallback(self.create_merge_prompt(transcript, summaries),
+                                            len(self.SECTIONS), self.NOTES_STOP,
+                                            feature=f"{feature}_merge", video_id=video_id)
+
+    @metrics.timed("generate_notes")
+    def generate_notes(self, transcript: str, video_id: Optional[str] = None,
+                       feature: str = "notes") -> Tuple[Optional[str], Optional[str]]:
         """
         Generate AI notes with automatic model fallback
         Returns: (notes_content, error_message)
         """
         if len(transcript) < 50:
             return None, "Transcript too short for meaningful analysis"
-        
+
+        if self.chunked(transcript):
+            return self.generate_notes_chunked(transcript, video_id, feature)
+
         prompt = self.create_notes_prompt(transcript)
-        
-        # Try each model with fallback
-        for i, model_info in enumerate(self.models):
-            try:
-                st.info(f"🤖 AI Engine processing your content...")
-                
-                # ✅ NEW: Use client.models.generate_content()
-                response = self.client.models.generate_content(
-                    model=model_info['name'],
-                    contents=prompt,
-                    config=types.GenerateContentConfig(
-                        temperature=0.7,
-                        top_p=0.8,
-                        top_k=40,
-                        max_output_tokens=1500,
-                    )
-                )
-                
-                if response and response.text:
-                    return response.text.strip(), None
-                    
-            except Exception as e:
-                error_msg = str(e)
-                
-                # Handle quota errors - try rotating API key first
-                if "quota" in error_msg.lower() or "429" in error_msg or "resource_exhausted" in error_msg.lower():
-                    st.warning(f"⚠️ Quota exceeded, switching API key...")
-                    if self.key_manager.rotate_key():
-                        # ✅ Switched to next key — rebuild client
-                        self.client = genai.Client(api_key=self.key_manager.get_current_key())
-                        st.info(f"🔑 Switched to backup API key, retrying...")
-                        # Retry same model with new key (don't continue to next model yet)
-                        try:
-                            response = self.client.models.generate_content(
-                                model=model_info['name'],
-                                contents=prompt,
-                                config=types.GenerateContentConfig(
-                                    temperature=0.7,
-                                    top_p=0.8,
-                                    top_k=40,
-                                    max_output_tokens=1500,
-                                )
-                            )
-                            if response and response.text:
-                                return response.text.strip(), None
-                        except:
-                            pass
-                    time.sleep(1)
-                    continue
-                elif "api" in error_msg.lower() or "404" in error_msg:
-                    st.warning(f"⚠️ API error with {model_info['name']}, trying next model...")
-                    time.sleep(1)
-                    continue
-                else:
-                    st.warning(f"⚠️ Error with {model_info['name']}, trying next model...")
-                    time.sleep(1)
-                    continue
+        cache = context_cache.ref(video_id, transcript,
+                                  self.create_notes_prompt(transcript, context=context_cache.reference()))
+        return self._generate_with_fallback(prompt, len(self.SECTIONS), self.NOTES_STOP,
+                                            feature=feature, video_id=video_id, cache=cache)
+
+    @metrics.timed("regenerate_section")
+    def regenerate_section(self, transcript: str, notes: str, heading: str,
+                           video_id: Optional[str] = None) -> Tuple[Optional[str], Optional[str]]:
+        """
+        Regenerate a single section; all other sections are kept as-is
+        Returns: (updated_notes, error_message)
+        """
+        if heading not in dict(self.SECTIONS):
+            return None, f"Unknown section: {heading}"
+        if len(transcript) < 50:
+            return None, "Transcript too short for meaningful analysis"
+
+        sections = self.split_sections(notes)
+        prompt = self.create_section_prompt(transcript, heading, sections)
+        cache = context_cache.ref(video_id, transcript, self.create_section_prompt(
+            transcript, heading, sections, context=context_cache.reference()
+        ))
+        body, error = self._generate_with_fallback(prompt, 1, self.SECTION_STOP, feature="notes_section",
+                                                   video_id=video_id, cache=cache)
+        if not body:
+            return None, error
+
+        # Drop a stray heading line if the model added one anyway
+        body_lines = body.split("\n")
+        if body_lines and body_lines[0].startswith("#"):
+            body = "\n".join(body_lines[1:]).strip()
 
-        return None, "Daily AI quota exhausted. Please try again tomorrow or reduce content length."
+        sections[heading] = body
+        return self.join_sections(sections), None
@@ -0,0 +1,189 @@
+"""
+Speculative Prefetcher - Generates notes and a default quiz right after extraction
+Runs on a single low-priority worker within a daily request budget and switches
+itself off when the Gemini key quota runs low.
+"""
+
+import functools
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, wait as wait_futures
+from typing import Dict, Optional, Tuple
+
+from services.fair_scheduler import FairScheduler, in_current_context
+from services.gemini_gateway import GeminiGateway
+from utils.deadline import Deadline
+from utils.metrics import metrics
+from utils.question_bank import question_bank
+from utils.token_ledger import token_ledger
+
+
+class Prefetcher:
+    """Background notes/quiz generation keyed by video_id"""
+
+    # Default quiz shape prefetched into the question bank
+    QUIZ_QUESTIONS = 5
+    QUIZ_DIFFICULTY = "Medium"
+
+    # Prefetched notes kept for this many videos (oldest evicted first)
+    MAX_CACHED_NOTES = 32
+
+    # A prefetch job that has not finished by then is abandoned
+    JOB_DEADLINE_SECONDS = 180
+
+    # wait() re-checks the caller's deadline this often, so a cancelled page stops waiting
+    WAIT_POLL_SECONDS = 0.25
+
+    def __init__(self):
+        self.daily_budget = int(os.getenv("PREFETCH_DAILY_BUDGET", "100"))
+        self.min_quota_pct = float(os.getenv("PREFETCH_MIN_QUOTA_PCT", "20"))
+        # One worker: prefetch never competes with itself for quota or CPU
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="prefetch")
+        self._lock = threading.Lock()
+        self._jobs: Dict[Tuple[str, str], Future] = {}
+        self._notes: "OrderedDict[str, str]" = OrderedDict()
+
+    @staticmethod
+    def enabled_by_default() -> bool:
+        return os.getenv("PREFETCH_ENABLED", "0") == "1"
+
+    # ========== BUDGET ==========
+
+    @staticmethod
+    def _key_labels():
+        from utils.api_key_manager import APIKeyManager
+        return [f"key{i + 1}" for i in range(APIKeyManager().total_keys())]
+
+    def budget_used(self) -> int:
+        """Gemini requests made by prefetch jobs today"""
+        return sum(row["requests"] for row in token_ledger.totals(group_by=("feature",))
+                   if row["feature"].startswith("prefetch"))
+
+    def quota_remaining_pct(self) -> Optional[float]:
+        """Share of today's declared request limit still unused across all models and keys"""
+        report = token_ledger.quota_report(GeminiGateway.MODELS, self._key_labels())
+        limits = [r for r in report if r["limit"]]
+        if not limits:
+            return None
+        total = sum(r["limit"] for r in limits)
+        remaining = sum(max(r["remaining"], 0) for r in limits)
+        return 100.0 * remaining / total
+
+    def _block(self) -> Optional[Tuple[str, str]]:
+        """(metric label, message) explaining why prefetching is off, or None"""
+        if not self._key_labels():
+            return "no_key", "no API key"
+        if self.budget_used() >= self.daily_budget:
+            return "budget", f"daily prefetch budget of {self.daily_budget} requests used"
+        remaining = self.quota_remaining_pct()
+        if remaining is not None and remaining < self.min_quota_pct:
+            return "quota_low", f"key quota low ({remaining:.0f}% left)"
+        return None
+
+    def blocked_reason(self) -> Optional[str]:
+        """Why prefetching is currently off, or None if it may run"""
+        block = self._block()
+        return block[1] if block else None
+
+    # ========== JOBS ==========
+
+    def schedule(self, transcript: str, video_id: str, deadline: Optional[Deadline] = None) -> Optional[str]:
+        """
+        Queue notes + default quiz for this video
+        deadline: cancelling it (e.g. Clear All) stops the jobs at their next checkpoint
+        Returns the reason nothing was queued, or None
+        """
+        deadline = deadline or Deadline(self.JOB_DEADLINE_SECONDS)
+        block = self._block()
+        if block:
+            metrics.incr("prefetch_skipped", reason=block[0])
+            return block[1]
+
+        with self._lock:
+            if video_id not in self._notes:
+                self._submit("notes", video_id, self._run_notes, transcript, deadline)
+            if question_bank.count(video_id, self.QUIZ_DIFFICULTY) < self.QUIZ_QUESTIONS:
+                self._submit("quiz", video_id, self._run_quiz, transcript, deadline)
+        return None
+
+    def _submit(self, kind: str, video_id: str, fn, transcript: str, deadline: Deadline):
+        """Queue a job unless one is already pending (call under lock)"""
+        job = self._jobs.get((kind, video_id))
+        if job is not None and not job.done():
+            return
+        # Keep the requesting session as tenant so its prefetches count against its fair share
+        self._jobs[(kind, video_id)] = self._executor.submit(
+            in_current_context(functools.partial(self._run, kind, fn, transcript, video_id, deadline))
+        )
+
+    def _run(self, kind: str, fn, transcript: str, video_id: str, deadline: Deadline):
+        # Quota may have dropped (or the user cleared everything) while the job was queued
+        if self._block() or deadline.expired():
+            metrics.incr("prefetch_jobs", kind=kind, outcome="skipped")
+            return
+        with metrics.span("prefetch_job", kind=kind) as span, FairScheduler.context(priority="prefetch"), \
+                deadline.activate():
+            ok = fn(transcript, video_id)
+            span["outcome"] = "ok" if ok else "failed"
+        metrics.incr("prefetch_jobs", kind=kind, outcome="ok" if ok else "failed")
+        metrics.set_gauge("prefetch_budget_used", self.budget_used())
+
+    def _run_notes(self, transcript: str, video_id: str) -> bool:
+        from services.notes_generator import NotesGenerator
+        notes, _ = NotesGenerator(silent=True).generate_notes(
+            transcript, video_id=video_id, feature="prefetch_notes"
+        )
+        if not notes:
+            return False
+        with self._lock:
+            self._notes[video_id] = notes
+            self._notes.move_to_end(video_id)
+            while len(self._notes) > self.MAX_CACHED_NOTES:
+                self._notes.popitem(last=False)
+        return True
+
+    def _run_quiz(self, transcript: str, video_id: str) -> bool:
+        """Fill the question bank; the quiz page then draws from it without an LLM call"""
+        from services.quiz_generator import QuizGenerator
+        questions, _ = QuizGenerator().build_quiz(
+            transcript, self.QUIZ_QUESTIONS, self.QUIZ_DIFFICULTY,
+            video_id=video_id, feature="prefetch_quiz", offline_fallback=False
+        )
+        return bool(questions)
+
+    # ========== CONSUMERS ==========
+
+    def pending(self, kind: str, video_id: Optional[str]) -> bool:
+        job = self._jobs.get((kind, video_id))
+        return job is not None and not job.done()
+
+    def wait(self, kind: str, video_id: Optional[str], timeout: float = 90) -> bool:
+        """
+        Block until a pending job finishes, timeout passes or the current Deadline ends
+        Returns True if it finished (the job itself keeps running either way)
+        """
+        job = self._jobs.get((kind, video_id))
+        if job is None:
+            return True
+        deadline = Deadline.current()
+        give_up = time.monotonic() + timeout
+        while not job.done():
+            left = min(give_up - time.monotonic(), deadline.remaining())
+            if left <= 0:
+                break
+            wait_futures([job], timeout=min(left, self.WAIT_POLL_SECONDS))
+        return job.done()
+
+    def take_notes(self, video_id: Optional[str]) -> Optional[str]:
+        """Pop prefetched notes for a video (a later regenerate must hit the model)"""
+        with self._lock:
+            notes = self._notes.pop(video_id, None)
+        if notes:
+            metrics.incr("prefetch_hits", kind="notes")
+        return notes
+
+
+# ✅ Process-wide prefetcher shared by every Streamlit session
+prefetcher = Prefetcher()
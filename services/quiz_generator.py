@@ -3,61 +3,126 @@ AI Quiz Generator Service - MCQ Only Version
 Production version without debug messages
 """
 
-from google import genai
 from google.genai import types
 import streamlit as st
+import functools
+import os
 import time
 import json
 import re
-from typing import Optional, Dict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Dict, Iterator, List, Tuple
 
+from services.context_cache import CacheRef, context_cache
+from services.fair_scheduler import in_current_context
+from services.gemini_gateway import GeminiGateway, PromptTooLargeError
+from services.model_fallback import ModelFallback
+from utils.chunk_selector import ChunkSelector
+from utils.cloze_quiz import ClozeQuiz
+from utils.deadline import Deadline, DeadlineExceeded
+from utils.json_stream import IncrementalArrayDecoder
+from utils.metrics import metrics
+from utils.near_duplicates import NearDuplicateIndex
+from utils.output_budget import OutputBudget
+from utils.question_bank import question_bank
 
-class QuizGenerator:
+
+class QuizGenerator(ModelFallback):
     """Smart quiz generator - MCQ only"""
-    
+
+    # Max transcript characters sent per prompt
+    TRANSCRIPT_BUDGET = 4000
+
+    # Questions per parallel shard (a 20-question quiz runs as 4 concurrent calls)
+    SHARD_SIZE = 5
+    MAX_SHARDS = 4
+
+    # JSON schema for structured output (matches the question format in the prompt)
+    QUESTION_SCHEMA = {
+        "type": "OBJECT",
+        "properties": {
+            "id": {"type": "INTEGER"},
+            "type": {"type": "STRING", "enum": ["mcq"]},
+            "question": {"type": "STRING"},
+            "options": {"type": "ARRAY", "items": {"type": "STRING"}, "minItems": 4, "maxItems": 4},
+            "correct_answer": {"type": "STRING"},
+            "explanation": {"type": "STRING"},
+        },
+        "required": ["id", "type", "question", "options", "correct_answer", "explanation"],
+        "propertyOrdering": ["id", "type", "question", "options", "correct_answer", "explanation"],
+    }
+    QUIZ_RESPONSE_SCHEMA = {"type": "ARRAY", "items": QUESTION_SCHEMA}
+
+    # Top-up: extra calls for questions the validator dropped, bounded in time and rounds
+    TOPUP_DEADLINE_SECONDS = 25
+    MAX_TOPUP_ROUNDS = 2
+
+    OFFLINE_WARNING = "⚡ AI unavailable — using offline fill-in-the-blank questions from the transcript."
+
+    # "A) text", "(b) text", "C. text", "Option D: text"
+    OPTION_PREFIX = re.compile(r"^\s*(?:option\s+)?\(?([A-Da-d])[\).:\-]\s+", re.IGNORECASE)
+    LETTER_ONLY = re.compile(r"^\s*(?:option\s+)?\(?([A-Da-d])\)?\.?\s*$", re.IGNORECASE)
+
     def __init__(self):
         """Initialize AI client"""
-        # ✅ Always define models FIRST — before anything else
-        self.models = [
-            {"name": "gemini-2.5-flash-lite", "limit": "1000/day", "max_tokens": 8192},
-            {"name": "gemini-2.5-flash",      "limit": "250/day",  "max_tokens": 8192},
-        ]
-        
-        # Load API key manager
-        try:
-            from utils.api_key_manager import APIKeyManager
-            self.key_manager = APIKeyManager()
-            api_key = self.key_manager.get_current_key()
-        except Exception:
-            import os
-            api_key = os.getenv("GEMINI_API_KEY") or os.getenv("GEMINI_API_KEY_1")
-            self.key_manager = None
-
-        if not api_key:
+        # Schema-constrained JSON output (set QUIZ_STRUCTURED_OUTPUT=0 for the free-text path)
+        self.structured_output = os.getenv("QUIZ_STRUCTURED_OUTPUT", "1") != "0"
+
+        # ✅ Models, key manager and client (shared setup with key rotation)
+        if not self._connect():
             st.error("❌ No API key found! Please set GEMINI_API_KEY in your .env file.")
-            self.client = None
-            return
 
-        self.client = genai.Client(api_key=api_key)
+    @property
+    def output_mode(self) -> str:
+        return "structured" if self.structured_output else "freeform"
+
+    def quiz_config(self, model_info: Dict, num_questions: int) -> types.GenerateContentConfig:
+        """
+        Generation config for quiz calls (JSON mode + schema when structured)
+        Output budget scales with the question count; the schema caps the array length
+        """
+        max_output_tokens = OutputBudget.tokens("quiz", num_questions, model_info['max_tokens'])
+        if self.structured_output:
+            return types.GenerateContentConfig(
+                temperature=0.7,
+                top_p=0.95,
+                max_output_tokens=max_output_tokens,
+                response_mime_type="application/json",
+                response_schema={**self.QUIZ_RESPONSE_SCHEMA, "maxItems": num_questions},
+            )
+        return types.GenerateContentConfig(
+            temperature=0.7,
+            top_p=0.95,
+            max_output_tokens=max_output_tokens,
+        )
+
+    def create_quiz_prompt(self, transcript: str, num_questions: int, difficulty: str,
+                           exclude: Optional[List[str]] = None, context: Optional[str] = None) -> str:
+        """
+        Create MCQ-only quiz prompt
+        exclude: questions already accepted; context: overrides the transcript excerpt
+        """
 
-    def create_quiz_prompt(self, transcript: str, num_questions: int, difficulty: str) -> str:
-        """Create MCQ-only quiz prompt"""
-        
         difficulty_guide = {
             "Easy": "straightforward questions",
             "Medium": "moderate difficulty",
             "Hard": "challenging questions"
         }
-        
+
         guide = difficulty_guide.get(difficulty, "moderate difficulty")
-        transcript_limit = min(4000, len(transcript))
-        
+        if context is None:
+            context = ChunkSelector.select(transcript, self.TRANSCRIPT_BUDGET)
+        avoid = ""
+        if exclude:
+            listed = "\n".join(f"- {q}" for q in exclude)
+            avoid = f"\n\nDo NOT repeat or paraphrase these questions (already asked):\n{listed}\n"
+
         return f"""Create {num_questions} multiple choice questions from this transcript.
 
 
 Transcript:
-{transcript[:transcript_limit]}
-
+{context}
+{avoid}
 
 Return ONLY a JSON array. Format each question EXACTLY like this:
 [
@@ -74,150 +139,494 @@ Requirements:
 - Keep {guide}
 - Return ONLY the JSON array, no other text
 """
-    
+
+    def _cache_ref(self, transcript: str, video_id: Optional[str], num_questions: int, difficulty: str,
+                   exclude: Optional[List[str]] = None,
+                   part: Optional[Tuple[int, int]] = None) -> Optional[CacheRef]:
+        """Prompt variant that points at the cached full transcript (None when caching is off)"""
+        if not context_cache.enabled:
+            return None
+        return context_cache.ref(video_id, transcript, self.create_quiz_prompt(
+            transcript, num_questions, difficulty, exclude=exclude, context=context_cache.reference(part)
+        ))
+
+    # ========== PARSING & VALIDATION ==========
+
+    @metrics.timed("clean_json_response")
     def clean_json_response(self, text: str) -> str:
         """Clean and extract JSON from response"""
         # Remove markdown
         text = re.sub(r'```json\s*', '', text)
         text = re.sub(r'```\s*', '', text)
         text = text.strip()
-        
+
         # Extract array
         match = re.search(r'\[[\s\S]*\]', text, re.DOTALL)
         if match:
             json_text = match.group(0)
         else:
             json_text = text
-        
+
         # Fix common issues
         json_text = re.sub(r',(\s*[\]\}])', r'\1', json_text)
-        
+
         return json_text
-    
+
+    def parse_questions(self, response_text: str) -> List[Dict]:
+        """Parse a model response into raw question dicts (may be empty)"""
+        if self.structured_output:
+            # Schema-constrained output is plain JSON — one deterministic pass
+            try:
+                quiz_array = json.loads(response_text)
+                metrics.incr("quiz_parse", mode="structured", outcome="ok")
+                return quiz_array if isinstance(quiz_array, list) else []
+            except json.JSONDecodeError:
+                # Usually truncation at max_output_tokens — salvage what we can below
+                metrics.incr("quiz_parse", mode="structured", outcome="fallback")
+
+        clean_text = self.clean_json_response(response_text)
+
+        # Parse JSON
+        try:
+            quiz_array = json.loads(clean_text)
+            if not self.structured_output:
+                metrics.incr("quiz_parse", mode="freeform", outcome="ok")
+        except json.JSONDecodeError:
+            metrics.incr("quiz_parse", mode=self.output_mode, outcome="regex_fallback")
+            # Try to extract individual questions
+            pattern = r'\{[^{}]*"type"\s*:\s*"mcq"[^{}]*\}'
+            quiz_array = []
+            for match in re.findall(pattern, clean_text, re.DOTALL):
+                try:
+                    quiz_array.append(json.loads(match))
+                except:
+                    continue
+
+        return quiz_array if isinstance(quiz_array, list) else []
+
+    @classmethod
+    def labelled_options(cls, opts: List) -> bool:
+        """True when the options are labelled A, B, C, D in order ("A) ...", "B) ..." ...)"""
+        labels = [cls.OPTION_PREFIX.match(str(o)) for o in opts]
+        return len(opts) == 4 and all(labels) and "".join(m.group(1).lower() for m in labels) == "abcd"
+
+    @classmethod
+    def normalize_question(cls, q) -> Dict:
+        """
+        Repair near-miss questions before validation
+        Strips "A)" style prefixes (only when all four options carry them in order, so
+        "C. elegans" survives) and whitespace, maps letter answers ("B") to options,
+        and matches correct_answer case/whitespace-insensitively to the option text
+        """
+        if not isinstance(q, dict):
+            return q
+
+        opts = q.get('options')
+        if isinstance(opts, dict):
+            opts = [opts[k] for k in sorted(opts)]
+        if not isinstance(opts, list):
+            return q
+        labelled = cls.labelled_options(opts)
+        if labelled:
+            opts = [cls.OPTION_PREFIX.sub("", str(o)).strip() for o in opts]
+        else:
+            opts = [str(o).strip() for o in opts]
+        q['options'] = opts
+
+        if 'type' not in q:
+            q['type'] = 'mcq'
+        q['type'] = str(q['type']).strip().lower()
+        if 'explanation' not in q and 'question' in q:
+            q['explanation'] = ""
+
+        answer = q.get('correct_answer')
+        if answer is None or answer in opts:
+            return q
+
+        answer = str(answer)
+        letter = cls.LETTER_ONLY.match(answer)
+        if letter and len(opts) == 4:
+            q['correct_answer'] = opts["abcd".index(letter.group(1).lower())]
+            metrics.incr("quiz_questions_repaired", kind="letter")
+            return q
+
+        def squash(text: str) -> str:
+            return " ".join(text.split()).lower().rstrip(".")
+
+        target = squash(cls.OPTION_PREFIX.sub("", answer) if labelled else answer)
+        matches = [o for o in opts if squash(o) == target]
+        if len(matches) == 1:
+            q['correct_answer'] = matches[0]
+            metrics.incr("quiz_questions_repaired", kind="text")
+        return q
+
+    @classmethod
+    def validate_questions(cls, quiz_array: List) -> List[Dict]:
+        """Keep only well-formed MCQs whose correct_answer is one of the 4 options"""
+        valid_questions = []
+
+        with metrics.span("quiz_validation") as span:
+            for q in quiz_array:
+                q = cls.normalize_question(q)
+                if isinstance(q, dict):
+                    has_all = all(k in q for k in ['question', 'options', 'correct_answer', 'explanation'])
+
+                    if has_all and q.get('type') == 'mcq':
+                        opts = q.get('options', [])
+                        if isinstance(opts, list) and len(opts) == 4:
+                            if q['correct_answer'] in opts:
+                                q['id'] = len(valid_questions) + 1
+                                valid_questions.append(q)
+            span["outcome"] = "accepted" if valid_questions else "rejected"
+        metrics.incr("quiz_questions_dropped", len(quiz_array) - len(valid_questions))
+
+        return valid_questions
+
+    # ========== GENERATION ==========
+
+    def _request_questions(self, prompt: str, num_questions: int, feature: str = "quiz",
+                           video_id: Optional[str] = None,
+                           cache: Optional[CacheRef] = None) -> Tuple[List[Dict], List[str]]:
+        """
+        Run one quiz prompt through the model list with key rotation
+        No Streamlit calls here, so shards can run on worker threads
+        Returns: (valid_questions, warnings)
+        """
+        # End-to-end latency per output mode, retries included
+        with metrics.span("quiz_request", mode=self.output_mode) as span:
+            try:
+                questions, warnings = self._run_quiz_fallback(prompt, num_questions, feature, video_id, cache)
+            except DeadlineExceeded as e:
+                questions, warnings = [], [f"⏱️ {e}"]
+            span["outcome"] = "ok" if questions else "failed"
+        return questions, warnings
+
+    def _attempt(self, model_info: Dict, prompt: str, num_questions: int, feature: str,
+                 video_id: Optional[str], cache: Optional[CacheRef] = None, **span_labels) -> List[Dict]:
+        """One model call -> validated questions (empty if nothing usable came back)"""
+        response = GeminiGateway.generate(
+            self.client, model_info, prompt, self.quiz_config(model_info, num_questions),
+            feature=feature, key_label=self._key_label(), video_id=video_id,
+            unit_kind="quiz", units=num_questions, cache=cache, **span_labels
+        )
+        if response and getattr(response, 'text', None):
+            return self.validate_questions(self.parse_questions(f"{response.text}"))
+        return []
+
+    def _run_quiz_fallback(self, prompt: str, num_questions: int, feature: str, video_id: Optional[str],
+                           cache: Optional[CacheRef] = None) -> Tuple[List[Dict], List[str]]:
+        mode = self.output_mode
+        metrics.incr("quiz_requests", mode=mode)
+        questions, warnings = self._run_model_fallback(
+            functools.partial(self._attempt, prompt=prompt, num_questions=num_questions, feature=feature,
+                              video_id=video_id, cache=cache),
+            feature, stage="quiz", reject_reason="no_valid_questions",
+            on_attempt=lambda: metrics.incr("quiz_model_attempts", mode=mode)
+        )
+        return questions or [], warnings
+
+    def plan_shards(self, transcript: str, num_questions: int) -> List[Tuple[str, int]]:
+        """
+        Split the request into (transcript_region, question_count) shards
+        Each shard draws from a different contiguous region of the transcript
+        """
+        shard_count = min(self.MAX_SHARDS, max(1, -(-num_questions // self.SHARD_SIZE)))
+        if shard_count == 1:
+            return [(transcript, num_questions)]
+
+        lines = transcript.split("\n")
+        if len(lines) < shard_count * 4:
+            # Too few lines to split by line — fall back to character regions
+            step = -(-len(transcript) // shard_count)
+            regions = [transcript[i:i + step] for i in range(0, len(transcript), step)]
+        else:
+            step = -(-len(lines) // shard_count)
+            regions = ["\n".join(lines[i:i + step]) for i in range(0, len(lines), step)]
+
+        base, extra = divmod(num_questions, len(regions))
+        return [(region, base + (1 if i < extra else 0)) for i, region in enumerate(regions)]
+
+    @staticmethod
+    def merge_shards(shard_results: List[List[Dict]]) -> List[Dict]:
+        """Concatenate shard outputs, drop near-duplicate questions (MinHash/LSH) and renumber"""
+        merged: List[Dict] = []
+        index = NearDuplicateIndex()
+        for questions in shard_results:
+            for q in questions:
+                if not index.add_if_new(len(merged), q):
+                    metrics.incr("quiz_near_duplicates_dropped", stage="merge")
+                    continue
+                q['id'] = len(merged) + 1
+                merged.append(q)
+        return merged
+
+    def _top_up(self, questions: List[Dict], transcript: str, num_questions: int,
+                difficulty: str, video_id: Optional[str], started: float,
+                feature: str = "quiz_topup") -> Tuple[List[Dict], List[str]]:
+        """Request missing questions until the count is met, rounds run out or the deadline passes"""
+        warnings: List[str] = []
+        if not questions:
+            return questions, warnings  # every model already failed the full request
+
+        deadline = Deadline.current()
+        for _ in range(self.MAX_TOPUP_ROUNDS):
+            missing = num_questions - len(questions)
+            if missing <= 0 or time.monotonic() - started > self.TOPUP_DEADLINE_SECONDS or deadline.expired():
+                break
+
+            metrics.incr("quiz_topup_rounds")
+            exclude = [q['question'] for q in questions]
+            prompt = self.create_quiz_prompt(transcript, missing, difficulty, exclude=exclude)
+            cache = self._cache_ref(transcript, video_id, missing, difficulty, exclude=exclude)
+            extra, extra_warnings = self._request_questions(prompt, missing, feature=feature,
+                                                            video_id=video_id, cache=cache)
+            warnings += extra_warnings
+            before = len(questions)
+            questions = self.merge_shards([questions, extra[:missing]])
+            metrics.incr("quiz_topup_questions", len(questions) - before)
+            if len(questions) == before:
+                break  # model keeps repeating itself — stop spending quota
+        return questions, warnings
+
+    @staticmethod
+    def _remember(video_id: Optional[str], difficulty: str, user_id: Optional[str],
+                  banked: List[Dict], generated: List[Dict]):
+        """Store new questions in the bank and mark everything served as seen by this user"""
+        if not video_id:
+            return
+        if generated:
+            question_bank.add_questions(video_id, difficulty, generated)
+        if user_id:
+            question_bank.mark_seen(
+                user_id,
+                [q.get('bank_id') for q in banked] + question_bank.bank_ids(video_id, generated)
+            )
+
+    def build_quiz(self, transcript: str, num_questions: int = 5, difficulty: str = "Medium",
+                   video_id: Optional[str] = None, user_id: Optional[str] = None,
+                   feature: str = "quiz", offline_fallback: bool = True) -> Tuple[List[Dict], List[str]]:
+        """
+        Assemble a quiz without any Streamlit calls (safe on background threads)
+        Unseen questions from the per-video bank are used first; the model (in parallel
+        shards) is only called for the shortfall. With no key or no quota, the
+        shortfall is filled with offline cloze questions (offline_fallback)
+        Returns: (questions, warnings)
+        """
+        num_questions = min(num_questions, 20)
+
+        # ✅ Serve from the question bank first — zero latency, zero quota
+        banked = question_bank.draw(video_id, difficulty, num_questions, user_id) if video_id else []
+        if len(banked) >= num_questions:
+            metrics.incr("quiz_served_from_bank", feature=feature)
+            self._remember(video_id, difficulty, user_id, banked, [])
+            return self.merge_shards([banked]), []
+
+        if self.client is None:
+            warnings = ["❌ No API key found! Please set GEMINI_API_KEY in your .env file."]
+            if offline_fallback:
+                warnings.append(self.OFFLINE_WARNING)
+                return self._offline_fill(banked, transcript, num_questions, difficulty), warnings
+            return self.merge_shards([banked]), warnings
+
+        missing = num_questions - len(banked)
+        exclude = [q['question'] for q in banked] or None
+        shards = self.plan_shards(transcript, missing)
+        prompts = [self.create_quiz_prompt(region, count, difficulty, exclude=exclude)
+                   for region, count in shards]
+        # With the context cache, every shard references the same cached transcript by part number
+        caches = [self._cache_ref(transcript, video_id, count, difficulty, exclude=exclude,
+                                  part=(i + 1, len(shards)))
+                  for i, (_, count) in enumerate(shards)]
+
+        started = time.monotonic()
+        if len(prompts) == 1:
+            results = [self._request_questions(prompts[0], shards[0][1], feature=feature,
+                                               video_id=video_id, cache=caches[0])]
+        else:
+            with ThreadPoolExecutor(max_workers=len(prompts), thread_name_prefix="quiz-shard") as pool:
+                futures = [
+                    pool.submit(in_current_context(functools.partial(
+                        self._request_questions, p, count, feature=f"{feature}_shard",
+                        video_id=video_id, cache=c
+                    )))
+                    for p, (_, count), c in zip(prompts, shards, caches)
+                ]
+                results = [future.result() for future in futures]
+
+        failed_shards = sum(1 for questions, _ in results if not questions)
+        if failed_shards:
+            metrics.incr("quiz_failed_shards", failed_shards)
+
+        # Banked questions go first so generated paraphrases of them are the ones dropped
+        valid_questions = self.merge_shards([banked] + [questions for questions, _ in results])
+        warnings = [w for _, shard_warnings in results for w in shard_warnings]
+
+        # Top-up: ask only for the missing count, excluding what we already have
+        if len(valid_questions) > len(banked):
+            valid_questions, topup_warnings = self._top_up(
+                valid_questions, transcript, num_questions, difficulty, video_id, started,
+                feature=f"{feature}_topup"
+            )
+            warnings += topup_warnings
+
+        if offline_fallback and len(valid_questions) == len(banked) and not Deadline.current().cancelled:
+            warnings.append(self.OFFLINE_WARNING)
+            valid_questions = self._offline_fill(banked, transcript, num_questions, difficulty)
+
+        generated = [q for q in valid_questions if 'bank_id' not in q and q.get('source') != 'offline']
+        self._remember(video_id, difficulty, user_id, banked, generated)
+        return valid_questions, warnings
+
+    def _offline_fill(self, banked: List[Dict], transcript: str, num_questions: int,
+                      difficulty: str) -> List[Dict]:
+        """Banked questions topped up with local cloze MCQs (never stored in the bank)"""
+        offline = ClozeQuiz.generate(transcript, num_questions - len(banked), difficulty,
+                                     exclude=[q['question'] for q in banked])
+        metrics.incr("quiz_offline_fallbacks")
+        return self.merge_shards([banked, self.validate_questions(offline)])
+
+    @metrics.timed("generate_quiz")
     def generate_quiz(self, transcript: str, num_questions: int = 5,
-                     difficulty: str = "Medium") -> Optional[Dict]:
-        """Generate MCQ-only quiz"""
-        
+                     difficulty: str = "Medium", video_id: Optional[str] = None,
+                     user_id: Optional[str] = None, deadline: Optional[Deadline] = None) -> Optional[Dict]:
+        """
+        Generate MCQ-only quiz (bank first, then parallel shards)
+        Generation runs under deadline; a Streamlit rerun while waiting cancels it
+        """
+
         if len(transcript) < 100:
             st.error("❌ Transcript too short")
             return None
-            # ✅ ADD THIS
-        if self.client is None:
-            st.error("❌ No API key found! Please set GEMINI_API_KEY in your .env file.")
-            return None
 
+        deadline = deadline or Deadline.for_request()
+        with st.spinner(f"🤖 Generating {min(num_questions, 20)} questions..."):
+            ticker = st.empty()
+            valid_questions, warnings = deadline.run(
+                functools.partial(self.build_quiz, transcript, num_questions, difficulty,
+                                  video_id=video_id, user_id=user_id),
+                on_tick=lambda d: ticker.caption(f"⏳ {d.remaining():.0f}s left")
+            )
+            ticker.empty()
 
-        if num_questions > 20:
-            num_questions = 20
-        
-        prompt = self.create_quiz_prompt(transcript, num_questions, difficulty)
-        
-        # Try each model
-        for model_info in self.models:
-            try:
-                with st.spinner(f"🤖 Generating {num_questions} questions..."):
-                    
-                    # ✅ NEW: Use client.models.generate_content()
-                    response = self.client.models.generate_content(
-                        model=model_info['name'],
-                        contents=prompt,
-                        config=types.GenerateContentConfig(
-                            temperature=0.7,
-                            top_p=0.95,
-                            max_output_tokens=model_info['max_tokens'],
-                        )
-                    )
-                    
-                    if response and hasattr(response, 'text'):
-                        response_text = f"{response.text}"
-                        clean_text = self.clean_json_response(response_text)
-                        
-                        # Parse JSON
-                        try:
-                            quiz_array = json.loads(clean_text)
-                        except json.JSONDecodeError:
-                            # Try to extract individual questions
-                            pattern = r'\{[^{}]*"type"\s*:\s*"mcq"[^{}]*\}'
-                            matches = re.findall(pattern, clean_text, re.DOTALL)
-                            
-                            if matches:
-                                quiz_array = []
-                                for match in matches:
-                                    try:
-                                        q = json.loads(match)
-                                        quiz_array.append(q)
-                                    except:
-                                        continue
-                                
-                                if not quiz_array:
-                                    continue
-                            else:
-                                continue
-                        
-                        # Validate questions
-                        if isinstance(quiz_array, list) and len(quiz_array) > 0:
-                            valid_questions = []
-                            
-                            for q in quiz_array:
-                                if isinstance(q, dict):
-                                    has_all = all(k in q for k in ['question', 'options', 'correct_answer', 'explanation'])
-                                    
-                                    if has_all and q.get('type') == 'mcq':
-                                        opts = q.get('options', [])
-                                        if isinstance(opts, list) and len(opts) == 4:
-                                            if q['correct_answer'] in opts:
-                                                q['id'] = len(valid_questions) + 1
-                                                valid_questions.append(q)
-                            
-                            if len(valid_questions) > 0:
-                                st.success(f"✅ Generated {len(valid_questions)} questions successfully!")
-                                return {"questions": valid_questions}
-                            else:
-                                continue
-                        else:
-                            continue
-                        
-            except Exception as e:
-                error_msg = str(e)
-                
-                # Handle quota errors - try rotating API key first
-                if "quota" in error_msg.lower() or "429" in error_msg or "resource_exhausted" in error_msg.lower():
-                    st.warning(f"⚠️ Quota exceeded, switching API key...")
-                    if self.key_manager.rotate_key():
-                        # ✅ Switched to next key — rebuild client
-                        self.client = genai.Client(api_key=self.key_manager.get_current_key())
-                        st.info(f"🔑 Switched to backup API key, retrying...")
-                        # Retry same model with new key (don't continue to next model yet)
-                        try:
-                            response = self.client.models.generate_content(
-                                model=model_info['name'],
-                                contents=prompt,
-                                config=types.GenerateContentConfig(
-                                    temperature=0.7,
-                                    top_p=0.8,
-                                    top_k=40,
-                                    max_output_tokens=1500,
-                                )
-                            )
-                            if response and response.text:
-                                return response.text.strip(), None
-                        except:
-                            pass
-                    time.sleep(1)
-                    continue
-                elif "api" in error_msg.lower() or "404" in error_msg:
-                    st.warning(f"⚠️ API error with {model_info['name']}, trying next model...")
-                    time.sleep(1)
-                    continue
-                else:
-                    st.warning(f"⚠️ Error with {model_info['name']}, trying next model...")
-                    time.sleep(1)
-                    continue
+        for warning in dict.fromkeys(warnings):
+            st.warning(warning)
+
+        if valid_questions:
+            st.success(f"✅ Generated {len(valid_questions)} questions successfully!")
+            return {"questions": valid_questions}
 
-        
         st.error("❌ Failed to generate quiz. Please try again with fewer questions.")
         return None
-    
+
+    def stream_quiz(self, transcript: str, num_questions: int = 5, difficulty: str = "Medium",
+                    video_id: Optional[str] = None, user_id: Optional[str] = None) -> Iterator[Dict]:
+        """
+        Yield validated questions one at a time as the model streams them
+        Banked questions the user hasn't seen come out first, instantly
+        No Streamlit calls, so the quiz page can run this on a background thread
+        """
+        if len(transcript) < 100:
+            return
+        num_questions = min(num_questions, 20)
+
+        started = time.monotonic()
+        banked = question_bank.draw(video_id, difficulty, num_questions, user_id) if video_id else []
+        generated: List[Dict] = []
+        index = NearDuplicateIndex()
+        try:
+            for accepted, q in enumerate(banked, start=1):
+                index.add(q['bank_id'], q)
+                q['id'] = accepted
+                yield q
+            if len(banked) >= num_questions:
+                return
+
+            if self.client is not None:
+                for q in self._stream_generated(transcript, num_questions - len(banked), difficulty,
+                                                video_id, exclude=[b['question'] for b in banked]):
+                    if not index.add_if_new(-len(generated) - 1, q):
+                        metrics.incr("quiz_near_duplicates_dropped", stage="stream")
+                        continue
+                    generated.append(q)
+                    q['id'] = len(banked) + len(generated)
+                    yield q
+
+                # ✅ Questions dropped as near-duplicates or invalid are topped up in one more call
+                served = banked + generated
+                if generated and len(served) < num_questions:
+                    topped, _ = self._top_up(served, transcript, num_questions, difficulty, video_id,
+                                             started, feature="quiz_stream_topup")
+                    for q in topped[len(served):]:
+                        generated.append(q)
+                        yield q
+
+            # ✅ No key or no quota — offline cloze questions instead of an empty quiz
+            if not generated and not Deadline.current().cancelled:
+                offline = self._offline_fill([], transcript, num_questions - len(banked), difficulty)
+                for accepted, q in enumerate(offline, start=len(banked) + 1):
+                    q['id'] = accepted
+                    yield q
+        finally:
+            self._remember(video_id, difficulty, user_id, banked, generated)
+
+    def _stream_generated(self, transcript: str, num_questions: int, difficulty: str,
+                          video_id: Optional[str], exclude: Optional[List[str]] = None) -> Iterator[Dict]:
+        """Model streaming with fallback; yields validated questions"""
+        prompt = self.create_quiz_prompt(transcript, num_questions, difficulty, exclude=exclude or None)
+        cache = self._cache_ref(transcript, video_id, num_questions, difficulty, exclude=exclude or None)
+        accepted = 0
+
+        deadline = Deadline.current()
+
+        # Try each model until one streams at least one valid question
+        for model_info in self.models:
+            config = self.quiz_config(model_info, num_questions)
+            retried_with_new_key = False
+            while True:
+                if deadline.expired():
+                    return
+                key_index = self._key_index()
+                decoder = IncrementalArrayDecoder()
+                start = time.perf_counter()
+                try:
+                    for text in GeminiGateway.generate_stream(
+                        self.client, model_info, prompt, config,
+                        feature="quiz_stream", key_label=self._key_label(), video_id=video_id,
+                        unit_kind="quiz", units=num_questions, cache=cache
+                    ):
+                        for raw_question in decoder.feed(text):
+                            valid = self.validate_questions([raw_question])
+                            if not valid:
+                                continue
+                            if accepted == 0:
+                                metrics.observe("quiz_stream_first_question",
+                                                time.perf_counter() - start, model=model_info['name'])
+                            accepted += 1
+                            valid[0]['id'] = accepted
+                            yield valid[0]
+                            if accepted >= num_questions:
+                                return
+
+                except (PromptTooLargeError, DeadlineExceeded):
+                    return
+
+                except Exception as e:
+                    error_msg = str(e)
+                    is_quota = "quota" in error_msg.lower() or "429" in error_msg or "resource_exhausted" in error_msg.lower()
+                    metrics.incr("gemini_fallbacks", feature="quiz_stream", model=model_info['name'],
+                                 reason="quota" if is_quota else "error")
+                    # A stream that broke midway keeps the questions already shown
+                    if accepted:
+                        return
+                    if is_quota and not retried_with_new_key and self._rotate_key(key_index, "quiz_stream"):
+                        retried_with_new_key = True
+                        continue
+                    deadline.sleep(1)
+                break
+
+            if accepted:
+                return
+
     @staticmethod
     def evaluate_answer(user_answer: str, correct_answer: str, question_type: str) -> bool:
         """Evaluate MCQ answer"""
@@ -0,0 +1,179 @@
+"""
+Study Pack Generator - Notes and a quiz from a single structured Gemini call
+The transcript is sent once; the response is split into notes markdown and quiz data.
+"""
+
+import functools
+import json
+import re
+from typing import Dict, List, Optional, Tuple
+
+from google.genai import types
+
+from services.context_cache import CacheRef, context_cache
+from services.gemini_gateway import GeminiGateway
+from services.model_fallback import ModelFallback
+from services.notes_generator import NotesGenerator
+from services.quiz_generator import QuizGenerator
+from utils.chunk_selector import ChunkSelector
+from utils.deadline import DeadlineExceeded
+from utils.metrics import metrics
+from utils.output_budget import OutputBudget
+
+
+class StudyPackGenerator(ModelFallback):
+    """
+    One-call notes + quiz
+    Shares the model fallback, key rotation and hedging loop with the other generators
+    and QuizGenerator's question validation; only the prompt, schema and parsing differ
+    """
+
+    # Schema field per notes section, in NotesGenerator.SECTIONS order
+    NOTE_FIELDS = ["core_concept", "key_concepts", "insights", "takeaways", "why_it_matters"]
+
+    # A pack is accepted only if at least this many sections have content
+    MIN_SECTIONS = 4
+
+    def __init__(self):
+        self._connect()
+
+    def pack_schema(self, num_questions: int) -> Dict:
+        note_properties = {field: {"type": "STRING"} for field in self.NOTE_FIELDS}
+        return {
+            "type": "OBJECT",
+            "properties": {
+                "notes": {
+                    "type": "OBJECT",
+                    "properties": note_properties,
+                    "required": self.NOTE_FIELDS,
+                    "propertyOrdering": self.NOTE_FIELDS,
+                },
+                "questions": {**QuizGenerator.QUIZ_RESPONSE_SCHEMA, "maxItems": num_questions},
+            },
+            "required": ["notes", "questions"],
+            "propertyOrdering": ["notes", "questions"],
+        }
+
+    def pack_config(self, model_info: Dict, num_questions: int) -> types.GenerateContentConfig:
+        """Output budget = notes budget + quiz budget for this question count"""
+        budget = (OutputBudget.tokens("notes", len(NotesGenerator.SECTIONS), model_info['max_tokens'])
+                  + OutputBudget.tokens("quiz", num_questions, model_info['max_tokens']))
+        return types.GenerateContentConfig(
+            temperature=0.7,
+            top_p=0.9,
+            max_output_tokens=min(budget, model_info['max_tokens']),
+            response_mime_type="application/json",
+            response_schema=self.pack_schema(num_questions),
+        )
+
+    def create_pack_prompt(self, transcript: str, num_questions: int, difficulty: str,
+                           context: Optional[str] = None) -> str:
+        """Combined prompt: the notes instructions and the quiz requirements share one transcript"""
+        if context is None:
+            context = ChunkSelector.select(transcript, QuizGenerator.TRANSCRIPT_BUDGET)
+        sections = "\n".join(
+            f'- "{field}" ({heading}): {guide}'
+            for field, (heading, guide) in zip(self.NOTE_FIELDS, NotesGenerator.SECTIONS)
+        )
+        level = {"Easy": "straightforward", "Hard": "challenging"}.get(difficulty, "moderate difficulty")
+        return f"""You are an expert educational content creator. From this video transcript, produce study notes AND a multiple choice quiz.
+
+
+**Transcript:**
+{context}
+
+
+**Notes** — fill each field with Markdown (no "## " headings inside fields):
+{sections}
+- EXPLAIN concepts, the "why" and "how" — do not just summarize the transcript
+
+
+**Quiz** — "questions" must contain exactly {num_questions} questions:
+- Each "type" must be "mcq"
+- Each "options" must be an array of 4 strings
+- "correct_answer" must match one option EXACTLY
+- Keep questions {level}
+- Questions should test the concepts explained in the notes
+"""
+
+    # ========== PARSING ==========
+
+    def notes_markdown(self, notes: Dict) -> str:
+        """Render the notes object with the standard section headings"""
+        sections = {
+            heading: str(notes.get(field) or "").strip()
+            for field, (heading, _) in zip(self.NOTE_FIELDS, NotesGenerator.SECTIONS)
+        }
+        return NotesGenerator.join_sections({h: body for h, body in sections.items() if body})
+
+    def parse_pack(self, response_text: str, num_questions: int) -> Optional[Dict]:
+        """{"notes": markdown, "questions": [...]} or None if either half is unusable"""
+        try:
+            payload = json.loads(response_text)
+        except json.JSONDecodeError:
+            match = re.search(r"\{[\s\S]*\}", response_text)
+            try:
+                payload = json.loads(match.group(0)) if match else None
+            except json.JSONDecodeError:
+                payload = None
+        if not isinstance(payload, dict):
+            metrics.incr("study_pack_parse", outcome="invalid_json")
+            return None
+
+        notes = payload.get("notes") if isinstance(payload.get("notes"), dict) else {}
+        filled = sum(1 for field in self.NOTE_FIELDS if str(notes.get(field) or "").strip())
+        questions = QuizGenerator.validate_questions(payload.get("questions") or [])[:num_questions]
+        if filled < self.MIN_SECTIONS or not questions:
+            metrics.incr("study_pack_parse", outcome="incomplete")
+            return None
+
+        metrics.incr("study_pack_parse", outcome="ok")
+        return {"notes": self.notes_markdown(notes), "questions": questions}
+
+    def _attempt(self, model_info: Dict, prompt: str, num_questions: int, feature: str,
+                 video_id: Optional[str], cache: Optional[CacheRef] = None, **span_labels) -> Optional[Dict]:
+        """One model call -> parsed pack (None if unusable)"""
+        response = GeminiGateway.generate(
+            self.client, model_info, prompt, self.pack_config(model_info, num_questions),
+            feature=feature, key_label=self._key_label(), video_id=video_id, cache=cache, **span_labels
+        )
+        if response and getattr(response, 'text', None):
+            return self.parse_pack(response.text, num_questions)
+        return None
+
+    # ========== GENERATION ==========
+
+    @metrics.timed("generate_study_pack")
+    def generate(self, transcript: str, num_questions: int = 5, difficulty: str = "Medium",
+                 video_id: Optional[str] = None,
+                 user_id: Optional[str] = None) -> Tuple[Optional[str], Optional[Dict], List[str]]:
+        """
+        Notes + quiz in one call (no Streamlit calls)
+        Returns: (notes_markdown, quiz_data, warnings)
+        """
+        if len(transcript) < 100:
+            return None, None, ["❌ Transcript too short"]
+        if self.client is None:
+            return None, None, ["❌ No API key found! Please set GEMINI_API_KEY in your .env file."]
+
+        num_questions = min(num_questions, 20)
+        prompt = self.create_pack_prompt(transcript, num_questions, difficulty)
+        cache = context_cache.ref(video_id, transcript, self.create_pack_prompt(
+            transcript, num_questions, difficulty, context=context_cache.reference()
+        )) if context_cache.enabled else None
+
+        try:
+            pack, warnings = self._run_model_fallback(
+                functools.partial(self._attempt, prompt=prompt, num_questions=num_questions,
+                                  feature="study_pack", video_id=video_id, cache=cache),
+                "study_pack", stage="study_pack", reject_reason="incomplete",
+                on_attempt=lambda: metrics.incr("study_pack_model_attempts")
+            )
+        except DeadlineExceeded as e:
+            return None, None, [f"⏱️ {e}"]
+        if not pack:
+            return None, None, warnings or ["❌ Failed to generate the study pack."]
+
+        questions = QuizGenerator.merge_shards([pack["questions"]])
+        QuizGenerator._remember(video_id, difficulty, user_id, [], questions)
+        return pack["notes"], {"questions": questions}, warnings
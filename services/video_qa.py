@@ -0,0 +1,94 @@
+"""
+Video Q&A - Follow-up questions answered from retrieved transcript chunks
+Only the top-k chunks for each question are sent (plus the last couple of turns),
+so prompt size stays flat however long the video is.
+"""
+
+import time
+from typing import Dict, List, Optional, Tuple
+
+from services.notes_generator import NotesGenerator
+from utils.chunk_vectors import ChunkVectorIndex
+from utils.metrics import metrics
+from utils.token_ledger import estimate_tokens
+
+
+class VideoQA(NotesGenerator):
+    """
+    Ask-the-video answers
+    Reuses NotesGenerator's model fallback, key rotation and hedging; only retrieval
+    and the prompt differ
+    """
+
+    UNIT_KIND = "qa"
+
+    # Chunks retrieved per question (~600 chars each)
+    TOP_K = 4
+
+    # Earlier Q&A turns included so "what about the second one?" makes sense
+    HISTORY_TURNS = 2
+    HISTORY_ANSWER_CHARS = 600
+
+    def create_qa_prompt(self, question: str, chunks: List[str],
+                         history: Optional[List[Dict]] = None) -> str:
+        excerpts = "\n\n".join(f"[Excerpt {i + 1}]\n{chunk}" for i, chunk in enumerate(chunks))
+        turns = "".join(
+            f"Q: {turn['question']}\nA: {turn['answer'][:self.HISTORY_ANSWER_CHARS]}\n\n"
+            for turn in (history or [])[-self.HISTORY_TURNS:]
+        )
+        earlier = f"\n**Earlier in this conversation:**\n{turns}" if turns else ""
+        return f"""You are a helpful tutor answering a student's question about a video they watched.
+
+Answer ONLY from the transcript excerpts below. If they do not contain the answer, say that the video does not cover it.
+Be concise (at most a few short paragraphs or bullets) and mention which excerpt you used, e.g. (Excerpt 2).
+{earlier}
+**Transcript excerpts (in video order):**
+{excerpts}
+
+**Question:** {question}
+"""
+
+    @metrics.timed("qa_answer")
+    def answer(self, transcript: str, question: str, video_id: Optional[str] = None,
+               history: Optional[List[Dict]] = None) -> Tuple[Optional[str], Dict, Optional[str]]:
+        """
+        Answer one question from the top-k retrieved chunks
+        Returns: (answer, info, error_message) — info has the sources, retrieval time and prompt size
+        """
+        question = question.strip()
+        if not question:
+            return None, {}, "Please type a question"
+        if len(transcript) < 50:
+            return None, {}, "Transcript too short for meaningful analysis"
+
+        start = time.perf_counter()
+        index = ChunkVectorIndex.for_transcript(transcript)
+        # Retrieve on the question plus the previous one so short follow-ups still find their context
+        previous = (history or [])[-1:]
+        query = " ".join([t['question'] for t in previous] + [question])
+        hits = dict(index.search(query, self.TOP_K))
+        if not hits:
+            # "Summarize this", "what is the main point?": no shared terms, so give the
+            # model excerpts spread across the whole video instead of refusing
+            metrics.incr("qa_overview_fallbacks")
+            hits = {i: 0.0 for i in index.overview(self.TOP_K)}
+        retrieval_seconds = time.perf_counter() - start
+        metrics.observe("qa_retrieval", retrieval_seconds)
+
+        ordered = sorted(hits)
+        prompt = self.create_qa_prompt(question, [index.chunks[i] for i in ordered], history)
+        info = {
+            "sources": [{"chunk": i, "score": round(hits[i], 3), "text": index.chunks[i]} for i in ordered],
+            "retrieval_ms": round(retrieval_seconds * 1000, 2),
+            "prompt_chars": len(prompt),
+            "prompt_tokens": estimate_tokens(prompt),
+            "chunks_total": len(index.chunks),
+        }
+        # ✅ One event per question in the metrics log: how big the prompt was and how much was cut
+        metrics.incr("qa_questions")
+        metrics.incr("qa_prompt_tokens", info["prompt_tokens"])
+        metrics.set_gauge("qa_prompt_tokens_last", info["prompt_tokens"])
+        metrics.set_gauge("qa_retrieval_ms_last", info["retrieval_ms"])
+
+        text, error = self._generate_with_fallback(prompt, 1, self.NOTES_STOP, feature="qa", video_id=video_id)
+        return text, info, error
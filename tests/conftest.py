@@ -0,0 +1,20 @@
+"""
+Shared pytest setup: import the app's modules from the repository root and keep
+every on-disk store out of data/
+"""
+
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Set before any app module is imported: their stores are created at import time
+SCRATCH_DIR = tempfile.mkdtemp(prefix="tests_")
+os.environ.update({
+    "TOKEN_LEDGER_PATH": os.path.join(SCRATCH_DIR, "token_usage.jsonl"),
+    "QUESTION_BANK_PATH": os.path.join(SCRATCH_DIR, "question_bank.db"),
+    "SUMMARY_CACHE_PATH": os.path.join(SCRATCH_DIR, "summaries.db"),
+    "TRANSCRIPT_INDEX_PATH": os.path.join(SCRATCH_DIR, "transcript_index"),
+})
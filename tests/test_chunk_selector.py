@@ -0,0 +1,40 @@
+from utils.chunk_selector import ChunkSelector
+
+FILLER = "okay so yeah we are going to get to that in a moment, you know how it is with these things."
+TOPIC = ("Gradient descent updates the weights against the gradient of the loss; "
+         "the learning rate scales each gradient step on the loss surface.")
+OTHER = ("Regularization adds a penalty on large weights to the loss, "
+         "which reduces overfitting when the training set is small.")
+
+
+def test_short_transcripts_pass_through():
+    assert ChunkSelector.select("short transcript", budget_chars=100) == "short transcript"
+
+
+def test_selection_fits_the_budget_and_keeps_order():
+    sentences = [f"Sentence {i} explains concept{i} and concept{i + 1} with example{i}." for i in range(200)]
+    transcript = " ".join(sentences)
+    selected = ChunkSelector.select(transcript, budget_chars=1500, target_chunk_chars=200)
+    assert len(selected) <= 1500
+    positions = [transcript.index(chunk) for chunk in selected.split("\n")]
+    assert positions == sorted(positions)
+
+
+def test_informative_chunks_beat_filler():
+    transcript = "\n".join([FILLER] * 20 + [TOPIC, TOPIC.replace("weights", "parameters"), OTHER])
+    selected = ChunkSelector.select(transcript, budget_chars=420, target_chunk_chars=100)
+    assert selected.count("Gradient descent") == 2 and "Regularization" in selected
+    assert FILLER not in selected
+
+
+def test_near_duplicate_chunks_are_penalized():
+    transcript = "\n".join([TOPIC, TOPIC.replace("weights", "parameters")] + [FILLER] * 8)
+    relevance_only = ChunkSelector.select(transcript, budget_chars=300, target_chunk_chars=80, mmr_lambda=1.0)
+    diverse = ChunkSelector.select(transcript, budget_chars=300, target_chunk_chars=80, mmr_lambda=0.3)
+    assert relevance_only.count("Gradient descent") == 2
+    assert diverse.count("Gradient descent") == 1
+
+
+def test_long_unpunctuated_captions_are_wrapped():
+    chunks = ChunkSelector.split_chunks(" ".join(["word"] * 2000), target_chars=400)
+    assert len(chunks) > 5 and all(len(c) <= 800 for c in chunks)
@@ -0,0 +1,40 @@
+from utils.chunk_vectors import ChunkVectorIndex
+
+TOPICS = [
+    "Gradient descent updates the weights by stepping against the gradient of the loss.",
+    "Dropout randomly disables neurons during training to reduce overfitting.",
+    "Convolution layers slide small filters over the image to detect edges.",
+    "Attention lets a transformer weigh every token against every other token.",
+]
+
+
+def transcript(repeats: int = 6) -> str:
+    return "\n".join(topic for topic in TOPICS for _ in range(repeats))
+
+
+def test_search_finds_the_chunk_about_the_question():
+    index = ChunkVectorIndex(transcript())
+    hits = index.search("how does dropout reduce overfitting?", k=2)
+    assert hits and "Dropout" in index.chunks[hits[0][0]]
+    assert hits == sorted(hits, key=lambda hit: -hit[1])
+    assert all(0 < score <= 1.0001 for _, score in hits)
+
+
+def test_unrelated_question_has_no_hits():
+    index = ChunkVectorIndex(transcript())
+    assert index.search("zebra migration patterns", k=4) == []
+
+
+def test_index_stays_small_on_long_transcripts():
+    index = ChunkVectorIndex(transcript(repeats=400))
+    assert len(index.chunks) > 100
+    # Sparse rows: bytes per stored feature, not N_FEATURES floats per chunk
+    assert index.nbytes < len(index.chunks) * ChunkVectorIndex.N_FEATURES * 4 / 20
+
+
+def test_overview_spreads_chunks_across_the_video():
+    index = ChunkVectorIndex(transcript(repeats=100))
+    picks = index.overview(4)
+    assert picks[0] == 0 and len(picks) == 4
+    assert picks[-1] >= len(index.chunks) // 2
+    assert ChunkVectorIndex("").overview(4) == []
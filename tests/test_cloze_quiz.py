@@ -0,0 +1,45 @@
+import random
+
+from utils.cloze_quiz import ClozeQuiz
+
+VOCAB = ("gradient descent optimization learning rate momentum regularization dropout network layer "
+         "activation function convolution pooling transformer attention embedding tokenization "
+         "backpropagation parameter weight bias overfitting generalization validation dataset batch "
+         "normalization sigmoid softmax").split()
+
+
+def transcript(sentences: int, seed: int = 0) -> str:
+    rng = random.Random(seed)
+    return " ".join(
+        "The " + " ".join(rng.choice(VOCAB) for _ in range(rng.randint(8, 16))) + " matters because it helps training."
+        for _ in range(sentences)
+    )
+
+
+def test_questions_follow_the_quiz_schema():
+    questions = ClozeQuiz.generate(transcript(200), 5)
+    assert len(questions) == 5
+    for i, q in enumerate(questions, start=1):
+        assert q["id"] == i and q["type"] == "mcq" and q["source"] == "offline"
+        assert ClozeQuiz.BLANK in q["question"]
+        assert len(q["options"]) == 4 and len(set(q["options"])) == 4
+        assert q["correct_answer"] in q["options"]
+        assert q["correct_answer"].lower() not in q["question"].lower().replace(ClozeQuiz.BLANK, "")
+
+
+def test_long_transcripts_still_fill_the_quiz():
+    # ~780k characters: far more sentences than the TF-IDF matrix is allowed to hold
+    questions = ClozeQuiz.generate(transcript(5000), 20)
+    assert len(questions) == 20
+    assert all(len(q["question"]) <= ClozeQuiz.MAX_SENTENCE_CHARS + 40 for q in questions)
+
+
+def test_excluded_questions_are_not_repeated():
+    text = transcript(200)
+    first = ClozeQuiz.generate(text, 5)
+    again = ClozeQuiz.generate(text, 5, exclude=[q["question"] for q in first])
+    assert not {q["question"] for q in first} & {q["question"] for q in again}
+
+
+def test_too_little_text_gives_no_questions():
+    assert ClozeQuiz.generate("Short.", 5) == []
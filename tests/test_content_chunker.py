@@ -0,0 +1,48 @@
+import random
+
+from utils.content_chunker import ContentChunker
+
+VOCABULARY = [f"term{i}" for i in range(3000)]
+
+
+def lecture(lines=1500, seed=7):
+    rng = random.Random(seed)
+    return [" ".join(rng.choices(VOCABULARY, k=12)) + "." for _ in range(lines)]
+
+
+def digests(lines):
+    return [c.digest for c in ContentChunker.split("\n".join(lines))]
+
+
+def test_chunks_cover_every_line_in_order():
+    lines = lecture()
+    chunks = ContentChunker.split("\n\n".join(lines))
+    assert "\n".join(c.text for c in chunks) == "\n".join(lines)
+    assert len(chunks) > 3
+
+
+def test_chunk_sizes_stay_in_bounds():
+    chunks = ContentChunker.split("\n".join(lecture()))
+    for chunk in chunks[:-1]:
+        assert ContentChunker.MIN_WORDS <= chunk.words < ContentChunker.MAX_WORDS + 12
+
+
+def test_case_and_punctuation_do_not_change_digests():
+    lines = lecture()
+    shouted = [line.upper().replace(".", "!") for line in lines]
+    assert digests(shouted) == digests(lines)
+
+
+def test_corrected_line_only_changes_its_own_chunk():
+    lines = lecture()
+    before = digests(lines)
+    lines[700] = "corrected caption about momentum and nesterov acceleration."
+    after = digests(lines)
+    assert len(set(before) - set(after)) == 1
+
+
+def test_new_intro_keeps_the_later_chunks():
+    lines = lecture()
+    before = digests(lines)
+    after = digests(["welcome back to the re-uploaded lecture."] * 30 + lines)
+    assert set(before[1:]) <= set(after)
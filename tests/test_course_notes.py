@@ -0,0 +1,64 @@
+import pytest
+
+for module in ("streamlit", "google.genai", "youtube_transcript_api", "requests"):
+    pytest.importorskip(module)
+
+from services import course_notes  # noqa: E402
+from services.course_notes import CourseNotesGenerator  # noqa: E402
+from utils.summary_cache import SummaryCache, summary_cache  # noqa: E402
+from utils.transcript_extractor import TranscriptExtractor  # noqa: E402
+
+OUTLINE = "\n".join(f"https://youtu.be/video{i:06d}" for i in range(3))
+
+
+@pytest.fixture
+def generator(monkeypatch):
+    def summarize_video(self, video_id):
+        if video_id == "video000001":
+            raise RuntimeError("caption track vanished")
+        self._count("video_done")
+        return {"video_id": video_id, "title": video_id, "transcript_hash": "h",
+                "summary": f"summary of {video_id}", "error": None}
+
+    monkeypatch.setattr(CourseNotesGenerator, "summarize_video", summarize_video)
+    monkeypatch.setattr(CourseNotesGenerator, "_generate_with_fallback",
+                        lambda self, prompt, *args, **kwargs: ("## notes", None))
+    monkeypatch.setattr(summary_cache, "get", lambda kind, key: None)
+    monkeypatch.setattr(summary_cache, "put", lambda kind, key, text: None)
+    return CourseNotesGenerator()
+
+
+def test_a_failing_video_does_not_sink_the_course(generator):
+    course = generator.build("Course", OUTLINE)
+    videos = {v["video_id"]: v for v in course["modules"][0]["videos"]}
+    assert videos["video000001"]["error"] == "caption track vanished"
+    assert videos["video000000"]["summary"] and videos["video000002"]["summary"]
+    assert course["summary"] == "## notes" and course["error"] is None
+    assert generator.progress["video_total"] == 3
+    assert generator.progress["video_done"] == 2 and generator.progress["video_failed"] == 1
+
+
+def test_rebuild_reuses_transcripts_titles_and_summaries(monkeypatch):
+    fetched = []
+
+    def segments(video_id):
+        fetched.append(video_id)
+        return [{"text": f"Lecture {video_id} explains gradient descent step by step.", "start": 0.0}], None
+
+    monkeypatch.setattr(course_notes, "summary_cache", SummaryCache(":memory:"))
+    monkeypatch.setattr(course_notes.transcript_index, "add", lambda *args, **kwargs: True)
+    monkeypatch.setattr(TranscriptExtractor, "get_transcript_segments", segments)
+    monkeypatch.setattr(TranscriptExtractor, "get_video_metadata",
+                        lambda video_id: ({"title": f"Title {video_id}"}, None))
+    monkeypatch.setattr(CourseNotesGenerator, "summarize_chunks",
+                        lambda self, transcript, video_id, feature: ([f"summary of {video_id}"], None))
+    monkeypatch.setattr(CourseNotesGenerator, "_generate_with_fallback",
+                        lambda self, prompt, *args, **kwargs: ("## notes", None))
+
+    CourseNotesGenerator().build("Course", OUTLINE)
+    generator = CourseNotesGenerator()
+    course = generator.build("Course", OUTLINE)
+    assert sorted(fetched) == [f"video{i:06d}" for i in range(3)]
+    assert [v["title"] for v in course["modules"][0]["videos"]] == [f"Title video{i:06d}" for i in range(3)]
+    assert generator.progress["video_reused"] == 3 and generator.progress["module_reused"] == 1
+    assert generator.progress["course_reused"] == 1 and not generator.progress["video_generated"]
@@ -0,0 +1,83 @@
+import threading
+
+import pytest
+
+from utils.deadline import Deadline, DeadlineExceeded
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_remaining_counts_down_and_check_raises():
+    clock = FakeClock()
+    deadline = Deadline(10, clock=clock)
+    assert deadline.remaining() == 10
+    clock.now = 4
+    assert deadline.timeout(120) == 6
+    clock.now = 11
+    with pytest.raises(DeadlineExceeded) as raised:
+        deadline.check("test")
+    assert not raised.value.cancelled
+
+
+def test_unbounded_deadline_never_expires():
+    deadline = Deadline()
+    assert not deadline.bounded
+    assert deadline.timeout(30) == 30
+    deadline.check("test")
+
+
+def test_cancel_wakes_sleep_and_reports_reason():
+    deadline = Deadline(60)
+    threading.Timer(0.05, deadline.cancel, args=("Stopped",)).start()
+    deadline.sleep(5)
+    assert deadline.cancelled and deadline.expired()
+    assert deadline.message() == "Stopped by user"
+
+
+def test_current_follows_activate():
+    deadline = Deadline(30)
+    assert Deadline.current() is not deadline
+    with deadline.activate():
+        assert Deadline.current() is deadline
+
+
+def test_child_ends_with_parent_but_cancels_alone():
+    clock = FakeClock()
+    parent = Deadline(10, clock=clock)
+    a, b = parent.child(), parent.child()
+    a.cancel("Superseded")
+    assert a.expired() and not b.expired() and not parent.expired()
+
+    parent.cancel("Cleared")
+    assert b.cancelled
+    with pytest.raises(DeadlineExceeded) as raised:
+        b.check("test")
+    assert str(raised.value) == "Cleared by user"
+
+    other = Deadline(10, clock=clock).child()
+    clock.now = 10
+    assert other.expired() and not other.cancelled
+
+
+def test_run_cancels_work_when_the_wait_is_interrupted():
+    deadline = Deadline(30)
+    started = threading.Event()
+
+    def work():
+        started.set()
+        Deadline.current().sleep(5)
+        Deadline.current().check("test")
+
+    def interrupt(_):
+        if started.is_set():
+            raise KeyboardInterrupt
+
+    with pytest.raises(KeyboardInterrupt):
+        deadline.run(work, on_tick=interrupt, poll_seconds=0.01)
+    assert deadline.cancelled
@@ -0,0 +1,84 @@
+import threading
+import time
+
+import pytest
+
+from services.fair_scheduler import FairScheduler, in_current_context
+from utils.deadline import Deadline, DeadlineExceeded
+
+
+def wait_for(condition, timeout=2.0):
+    end = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < end, "timed out"
+        time.sleep(0.001)
+
+
+def grant_order(scheduler, calls):
+    """
+    Queue calls = [(tenant, priority, cost)] in order behind a held slot, then release it
+    Returns the (tenant, priority) order in which the scheduler granted them
+    """
+    order, threads = [], []
+
+    def call(tenant, priority, cost):
+        with FairScheduler.context(tenant=tenant, priority=priority):
+            with scheduler.slot(cost, "quiz"):
+                order.append((tenant, priority))
+
+    with FairScheduler.context(tenant="holder"):
+        with scheduler.slot(1, "quiz"):
+            for i, args in enumerate(calls):
+                thread = threading.Thread(target=call, args=args)
+                thread.start()
+                threads.append(thread)
+                wait_for(lambda: scheduler.depth() == i + 1)
+    for thread in threads:
+        thread.join(2)
+    return order
+
+
+def test_priorities_are_served_strictly_in_order():
+    calls = [("a", "batch", 100), ("b", "prefetch", 100), ("c", "interactive", 100), ("d", "batch", 100)]
+    order = grant_order(FairScheduler(slots=1, quantum=1000), calls)
+    assert [p for _, p in order] == ["interactive", "prefetch", "batch", "batch"]
+
+
+def test_equal_cost_tenants_alternate():
+    calls = [("a", "interactive", 1000)] * 3 + [("b", "interactive", 1000)] * 3
+    order = grant_order(FairScheduler(slots=1, quantum=1000), calls)
+    assert [t for t, _ in order] == ["a", "b", "a", "b", "a", "b"]
+
+
+def test_expensive_calls_wait_for_enough_credit():
+    # a asks for 3 quanta per call; b's cheap calls get through in between
+    calls = [("a", "interactive", 3000)] * 2 + [("b", "interactive", 1000)] * 4
+    order = [t for t, _ in grant_order(FairScheduler(slots=1, quantum=1000), calls)]
+    assert order.index("a") > order.index("b")
+    assert order[-1] == "a" and order.count("b") == 4
+
+
+def test_expired_waiter_gives_up_its_place():
+    scheduler = FairScheduler(slots=1, quantum=1000)
+    with scheduler.slot(1, "quiz"):
+        with pytest.raises(DeadlineExceeded), Deadline(0.05).activate():
+            with scheduler.slot(1, "quiz"):
+                pass
+        assert scheduler.depth() == 0
+    with scheduler.slot(1, "quiz"):
+        pass
+
+
+def test_worker_threads_keep_the_callers_tenant_and_priority():
+    seen = []
+
+    def work():
+        seen.append((FairScheduler.priority_for("quiz"), FairScheduler.priority_for("prefetch_notes")))
+
+    with FairScheduler.context(priority="batch"):
+        thread = threading.Thread(target=in_current_context(work))
+    thread.start()
+    thread.join()
+    threading.Thread(target=work).start()
+    wait_for(lambda: len(seen) == 2)
+    assert seen == [("batch", "batch"), ("interactive", "prefetch")]
@@ -0,0 +1,52 @@
+import threading
+import time
+
+from services.hedging import Hedger
+from utils.deadline import Deadline, DeadlineExceeded
+
+
+def hedger():
+    h = Hedger()
+    h.enabled = True
+    h.threshold = lambda model: 0.05
+    return h
+
+
+def test_fast_primary_is_not_hedged():
+    calls = []
+    result = hedger().call(lambda: "primary", lambda: calls.append("backup") or "backup",
+                           accept=bool, model="m", feature="test")
+    assert result == "primary" and calls == []
+
+
+def test_slow_primary_loses_and_its_deadline_is_cancelled():
+    stopped = threading.Event()
+
+    def slow_primary():
+        deadline = Deadline.current()
+        while not deadline.expired():
+            time.sleep(0.01)
+        stopped.set()
+        deadline.check("test")
+
+    result = hedger().call(slow_primary, lambda: "backup", accept=bool, model="m", feature="test")
+    assert result == "backup"
+    assert stopped.wait(1)
+
+
+def test_parent_cancellation_reaches_both_legs():
+    parent = Deadline(30)
+    h = hedger()
+
+    def leg():
+        Deadline.current().sleep(5)
+        Deadline.current().check("test")
+
+    threading.Timer(0.2, parent.cancel, args=("Stopped",)).start()
+    with parent.activate():
+        start = time.monotonic()
+        try:
+            h.call(leg, leg, accept=bool, model="m", feature="test")
+        except DeadlineExceeded as e:
+            assert e.cancelled
+    assert time.monotonic() - start < 2
@@ -0,0 +1,57 @@
+import json
+
+from utils.json_stream import IncrementalArrayDecoder
+
+ELEMENTS = [
+    {"question": "What does {x} mean?", "options": ["[a]", "b}", "c\\\"", "d"]},
+    {"question": "Say \"hi\"", "nested": {"list": [1, [2, 3]]}},
+    {"question": "Last", "options": []},
+]
+TEXT = "```json\n" + json.dumps(ELEMENTS, indent=2) + "\n```"
+
+
+def decode_in_pieces(text, size):
+    decoder = IncrementalArrayDecoder()
+    out = []
+    for start in range(0, len(text), size):
+        out += decoder.feed(text[start:start + size])
+    return decoder, out
+
+
+def test_any_chunking_yields_the_same_elements():
+    for size in (1, 2, 7, 64, len(TEXT)):
+        decoder, out = decode_in_pieces(TEXT, size)
+        assert out == ELEMENTS and decoder.finished and decoder.errors == 0
+
+
+def test_element_is_yielded_as_soon_as_it_closes():
+    decoder = IncrementalArrayDecoder()
+    assert decoder.feed('[{"a": 1}, {"b"') == [{"a": 1}]
+    assert decoder.feed(': 2}') == [{"b": 2}]
+    assert not decoder.finished
+    assert decoder.feed(']') == [] and decoder.finished
+
+
+def test_nothing_is_read_after_the_array_closes():
+    decoder = IncrementalArrayDecoder()
+    decoder.feed('[{"a": 1}] trailing prose {"b": 2}')
+    assert decoder.feed('{"c": 3}') == []
+
+
+def test_trailing_commas_are_repaired():
+    decoder = IncrementalArrayDecoder()
+    assert decoder.feed('[{"options": ["a", "b",], "q": "x",}]') == [{"options": ["a", "b"], "q": "x"}]
+    assert decoder.errors == 0
+
+
+def test_broken_element_is_counted_and_skipped():
+    decoder = IncrementalArrayDecoder()
+    assert decoder.feed('[{"a": oops}, {"b": 2}]') == [{"b": 2}]
+    assert decoder.errors == 1
+
+
+def test_buffer_only_keeps_the_element_in_progress():
+    decoder = IncrementalArrayDecoder()
+    decoder.feed("[" + ", ".join(json.dumps({"i": i}) for i in range(500)) + ', {"partial"')
+    assert len(decoder._buffer) < 20
+    assert decoder.feed(": true}]") == [{"partial": True}]
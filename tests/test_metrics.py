@@ -0,0 +1,42 @@
+import pytest
+
+from utils.metrics import MetricsRegistry, percentile
+
+
+def test_nearest_rank_percentile():
+    values = list(range(100, 0, -1))
+    assert (percentile(values, 50), percentile(values, 99), percentile(values, 100)) == (50, 99, 100)
+    assert percentile([], 95) == 0.0
+
+
+def test_span_labels_outcome_and_status():
+    registry = MetricsRegistry()
+    with registry.span("quiz") as span:
+        span["questions"] = 5
+    with pytest.raises(ValueError), registry.span("quiz"):
+        raise ValueError("boom")
+    assert [row["labels"] for row in registry.summary()] == [
+        {"questions": "5", "status": "ok"}, {"status": "error"},
+    ]
+
+
+def test_sample_window_is_bounded_but_totals_are_not():
+    registry = MetricsRegistry()
+    for _ in range(registry.MAX_SAMPLES + 10):
+        registry.observe("call", 1.0)
+    row = registry.summary()[0]
+    assert row["count"] == registry.MAX_SAMPLES + 10 and row["sum"] == registry.MAX_SAMPLES + 10
+    assert len(registry.samples_matching("call")) == registry.MAX_SAMPLES
+
+
+def test_prometheus_export():
+    registry = MetricsRegistry()
+    registry.observe("notes", 0.5, model="flash")
+    registry.incr("gemini_fallbacks", reason="quota")
+    registry.incr("gemini_fallbacks", reason="quota")
+    registry.set_gauge("queue_depth", 3, priority='in"ter')
+    text = registry.export_prometheus()
+    assert 'notes_seconds{model="flash",quantile="0.5"} 0.500000' in text
+    assert 'notes_seconds_count{model="flash"} 1' in text
+    assert 'gemini_fallbacks_total{reason="quota"} 2' in text
+    assert 'queue_depth{priority="in\\"ter"} 3' in text
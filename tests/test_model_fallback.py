@@ -0,0 +1,94 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+pytest.importorskip("google.genai")
+
+import services.model_fallback as model_fallback  # noqa: E402
+from services.gemini_gateway import PromptTooLargeError  # noqa: E402
+from services.model_fallback import ModelFallback  # noqa: E402
+
+MODELS = [{"name": "model-a", "max_tokens": 100}, {"name": "model-b", "max_tokens": 100}]
+
+
+class Keys:
+    def __init__(self, count):
+        self.keys = [f"k{i}" for i in range(count)]
+        self.current_index = 0
+
+    def get_current_key(self):
+        return self.keys[self.current_index]
+
+    def rotate_key(self):
+        if self.current_index < len(self.keys) - 1:
+            self.current_index += 1
+            return True
+        return False
+
+
+class Generator(ModelFallback):
+    def __init__(self, keys=3):
+        self.models = [dict(m) for m in MODELS]
+        self.key_manager = Keys(keys)
+        self.client = None
+        self._client_lock = threading.Lock()
+
+
+@pytest.fixture(autouse=True)
+def no_hedging_or_clients(monkeypatch):
+    monkeypatch.setattr(model_fallback.hedger, "enabled", False)
+    monkeypatch.setattr(model_fallback.genai, "Client", lambda api_key: api_key)
+    monkeypatch.setattr(model_fallback.Deadline, "sleep", lambda self, seconds: None)
+
+
+def test_first_accepted_result_wins():
+    calls = []
+
+    def attempt(model_info, **labels):
+        calls.append(model_info["name"])
+        return [] if model_info["name"] == "model-a" else ["question"]
+
+    result, warnings = Generator()._run_model_fallback(attempt, "quiz", stage="quiz")
+    assert result == ["question"] and calls == ["model-a", "model-b"] and warnings == []
+
+
+def test_quota_error_retries_the_same_model_with_the_next_key():
+    generator = Generator()
+    calls = []
+
+    def attempt(model_info, **labels):
+        calls.append((model_info["name"], generator.client, labels))
+        if generator.key_manager.current_index == 0:
+            raise RuntimeError("429 RESOURCE_EXHAUSTED")
+        return "ok"
+
+    result, warnings = generator._run_model_fallback(attempt, "quiz", stage="quiz")
+    assert result == "ok"
+    assert calls[-1] == ("model-a", "k1", {"retry": "key_rotation"})
+    assert generator._key_label() == "key2"
+
+
+def test_oversized_prompt_stops_immediately():
+    def attempt(model_info, **labels):
+        raise PromptTooLargeError("Prompt too large")
+
+    result, warnings = Generator()._run_model_fallback(attempt, "quiz", stage="quiz")
+    assert result is None and warnings == ["❌ Prompt too large"]
+
+
+def test_concurrent_quota_errors_rotate_past_one_key_only():
+    generator = Generator(keys=3)
+    failed_index = generator.key_manager.current_index
+    barrier = threading.Barrier(8)
+
+    def worker():
+        barrier.wait()
+        return generator._rotate_key(failed_index, "test")
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(lambda _: worker(), range(8)))
+
+    assert all(results)
+    assert generator.key_manager.current_index == 1
+    assert generator.client == "k1"
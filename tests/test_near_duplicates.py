@@ -0,0 +1,46 @@
+from utils.near_duplicates import NearDuplicateIndex
+
+OPTIONS = ["An optimizer", "A loss function", "A dataset", "An activation"]
+
+
+def question(text, options=OPTIONS):
+    return {"question": text, "options": list(options)}
+
+
+def similarity(index, a, b):
+    return index.similarity(index.signature(a), index.signature(b))
+
+
+def test_paraphrases_are_duplicates():
+    index = NearDuplicateIndex()
+    assert index.add_if_new(1, question("What is gradient descent used for?"))
+    assert not index.add_if_new(2, question("Gradient descent is used for what?"))
+    assert not index.add_if_new(3, question("What is gradient descent used for?", reversed(OPTIONS)))
+    assert len(index) == 1
+
+
+def test_different_stems_with_shared_options_are_kept():
+    index = NearDuplicateIndex()
+    assert index.add_if_new(1, question("Which of the following best describes gradient descent?"))
+    assert index.add_if_new(2, question("Which of the following best describes backpropagation?"))
+    assert index.add_if_new(3, question("What is the role of the activation function?"))
+    assert index.add_if_new(4, question("What is the role of the loss function?"))
+    assert index.add_if_new(5, question("Why is a validation set used?"))
+    assert len(index) == 5
+
+
+def test_similarity_weights_the_stem():
+    index = NearDuplicateIndex()
+    same_stem = similarity(index, question("What does the learning rate control?"),
+                           question("What does the learning rate control?", ["W", "X", "Y", "Z"]))
+    same_options = similarity(index, question("What does the learning rate control?"),
+                              question("Why is a validation set used?"))
+    assert same_stem > 0.6
+    assert same_options < 0.4
+
+
+def test_bands_put_the_lsh_midpoint_below_the_threshold():
+    for threshold in (0.5, 0.75, 0.9):
+        bands, rows = NearDuplicateIndex.choose_bands(128, threshold)
+        assert bands * rows == 128
+        assert (1 / bands) ** (1 / rows) <= threshold
@@ -0,0 +1,100 @@
+import threading
+import time
+
+import pytest
+
+st = pytest.importorskip("streamlit")
+pytest.importorskip("google.genai")
+
+import services.model_fallback as model_fallback  # noqa: E402
+import services.notes_generator as notes_generator  # noqa: E402
+from services.notes_generator import NotesGenerator  # noqa: E402
+from utils.summary_cache import summary_cache  # noqa: E402
+
+PART = " ".join(f"word{i}" for i in range(40)) + ".\n"
+
+
+class Keys:
+    def __init__(self):
+        self.keys = ["k0", "k1", "k2"]
+        self.current_index = 0
+
+    def get_current_key(self):
+        return self.keys[self.current_index]
+
+    def rotate_key(self):
+        if self.current_index + 1 < len(self.keys):
+            self.current_index += 1
+            return True
+        return False
+
+
+class Response:
+    text = "- point"
+    usage_metadata = None
+
+
+class Client:
+    """First key is out of quota; slow enough that every chunk worker hits it"""
+
+    def __init__(self, key):
+        self.key = key
+        self.models = self
+
+    def generate_content(self, model, contents, config):
+        time.sleep(0.02)
+        if self.key == "k0":
+            raise Exception("429 RESOURCE_EXHAUSTED: quota exceeded")
+        if self.key == "broken":
+            raise ValueError("bad response")
+        return Response()
+
+
+@pytest.fixture
+def generator(monkeypatch):
+    monkeypatch.setattr(model_fallback.hedger, "enabled", False)
+    monkeypatch.setattr(model_fallback.genai, "Client", lambda api_key: Client(api_key))
+    monkeypatch.setattr(model_fallback.Deadline, "sleep", lambda self, seconds: None)
+    monkeypatch.setattr(summary_cache, "get_many", lambda kind, keys: {})
+    monkeypatch.setattr(summary_cache, "put", lambda kind, key, text: None)
+    generator = NotesGenerator()
+    generator.key_manager = Keys()
+    generator.client = Client("k0")
+    return generator
+
+
+def test_parallel_quota_errors_rotate_the_shared_key_once(generator):
+    summaries, error = generator.summarize_chunks(PART * 400, video_id="v")
+    assert error is None and len(summaries) > 1
+    assert generator.key_manager.current_index == 1
+
+
+def test_chunk_workers_do_not_call_streamlit(generator, monkeypatch):
+    threads = []
+    record = lambda *args, **kwargs: threads.append(threading.current_thread())  # noqa: E731
+    monkeypatch.setattr(st, "info", record)
+    monkeypatch.setattr(st, "warning", record)
+    generator.summarize_chunks(PART * 400, video_id="v")
+    assert threads and set(threads) == {threading.current_thread()}
+
+
+def test_chunk_summaries_use_their_own_unit_kind(generator, monkeypatch):
+    kinds = []
+    monkeypatch.setattr(notes_generator.GeminiGateway, "generate",
+                        lambda *args, unit_kind, **kwargs: kinds.append(unit_kind) or Response())
+    generator.summarize_chunks(PART * 400, video_id="v")
+    assert kinds and set(kinds) == {"notes_chunk"}
+
+
+def test_only_quota_failures_report_exhausted_quota(generator):
+    generator.key_manager.keys = ["k0"]
+    assert generator.generate_notes("word " * 100) == (None, NotesGenerator.QUOTA_ERROR)
+
+    generator.client = Client("broken")
+    text, error = generator.generate_notes("word " * 100)
+    assert text is None and error == "AI request failed: bad response"
+
+
+def test_missing_key_is_reported(generator):
+    generator.client = None
+    assert generator.generate_notes("word " * 100) == (None, NotesGenerator.NO_KEY_ERROR)
@@ -0,0 +1,45 @@
+from types import SimpleNamespace
+
+import pytest
+
+import utils.output_budget as output_budget
+from utils.output_budget import OutputBudget
+from utils.token_ledger import TokenLedger
+
+
+@pytest.fixture
+def ledger(monkeypatch):
+    ledger = TokenLedger(path="")
+    monkeypatch.setattr(output_budget, "token_ledger", ledger)
+    return ledger
+
+
+def response(candidates, thoughts=None):
+    usage = SimpleNamespace(prompt_token_count=1000, candidates_token_count=candidates,
+                            cached_content_token_count=0, thoughts_token_count=thoughts)
+    return SimpleNamespace(usage_metadata=usage, text="")
+
+
+def test_default_budget_scales_with_units(ledger):
+    five = OutputBudget.tokens("quiz", 5, 8192)
+    twenty = OutputBudget.tokens("quiz", 20, 8192)
+    assert five == OutputBudget.OVERHEAD + 5 * 170 * OutputBudget.HEADROOM
+    assert 3.5 * five < twenty <= 8192
+
+
+def test_budget_is_clamped(ledger):
+    assert OutputBudget.tokens("quiz", 1000, 8192) == 8192
+    assert OutputBudget.tokens("qa", 0, 8192) >= OutputBudget.MIN_TOKENS
+
+
+def test_learned_budget_follows_the_ledger(ledger):
+    for _ in range(OutputBudget.MIN_SAMPLES):
+        ledger.record("m", "key1", "quiz", 1000, 500, unit_kind="quiz", units=5)
+    assert OutputBudget.per_unit("quiz") == pytest.approx(100)
+
+
+def test_thought_tokens_count_as_output(ledger):
+    for _ in range(OutputBudget.MIN_SAMPLES):
+        ledger.record_response(response(500, thoughts=1500), "m", "key1", "quiz", unit_kind="quiz", units=5)
+    assert OutputBudget.per_unit("quiz") == pytest.approx(400)
+    assert ledger.totals()[0]["output_tokens"] == 2000 * OutputBudget.MIN_SAMPLES
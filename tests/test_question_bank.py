@@ -0,0 +1,51 @@
+from utils.question_bank import QuestionBank
+
+QUESTIONS = [
+    ("Where does photosynthesis take place in a plant cell?", ["Chloroplast", "Nucleus", "Vacuole", "Cell wall"]),
+    ("Which organelle produces most of the cell's ATP?", ["Mitochondrion", "Golgi body", "Lysosome", "Ribosome"]),
+    ("What moves across a membrane during osmosis?", ["Water", "Glucose", "Protein", "DNA"]),
+    ("How do enzymes speed up reactions?", ["Lower activation energy", "Raise heat", "Add reactants", "Use light"]),
+    ("Ribosomes are the site of which process?", ["Protein synthesis", "Lipid storage", "Mitosis", "Respiration"]),
+    ("Which pigment absorbs light for plants?", ["Chlorophyll", "Melanin", "Haemoglobin", "Keratin"]),
+]
+
+
+def questions(indexes=range(len(QUESTIONS))):
+    return [{"type": "mcq", "question": QUESTIONS[i][0], "options": QUESTIONS[i][1],
+             "correct_answer": QUESTIONS[i][1][0], "explanation": ""} for i in indexes]
+
+
+def test_duplicates_are_not_stored():
+    bank = QuestionBank(":memory:")
+    assert bank.add_questions("v", "Medium", questions()) == len(QUESTIONS)
+    again = questions([2])
+    again.append({**again[0], "question": "what moves across a membrane during osmosis"})
+    assert bank.add_questions("v", "Medium", again) == 0
+    assert bank.count("v") == len(QUESTIONS)
+
+
+def test_draw_skips_questions_the_user_has_seen():
+    bank = QuestionBank(":memory:")
+    bank.add_questions("v", "Medium", questions())
+    first = bank.draw("v", "Medium", 4, user_id="u1")
+    bank.mark_seen("u1", [q["bank_id"] for q in first])
+    rest = bank.draw("v", "Medium", 10, user_id="u1")
+    assert len(first) == 4 and len(rest) == 2
+    assert not {q["question"] for q in first} & {q["question"] for q in rest}
+    assert len(bank.draw("v", "Medium", 10, user_id="u2")) == len(QUESTIONS)
+
+
+def test_draw_is_per_video_and_difficulty():
+    bank = QuestionBank(":memory:")
+    bank.add_questions("v", "Easy", questions([2]))
+    bank.add_questions("w", "Medium", questions([3]))
+    assert bank.draw("v", "Medium", 5) == []
+    assert [q["question"] for q in bank.draw("v", "Easy", 5)] == [QUESTIONS[2][0]]
+    assert bank.count("v", "Easy") == 1 and bank.count("w") == 1
+
+
+def test_bank_ids_find_stored_questions_by_text():
+    bank = QuestionBank(":memory:")
+    bank.add_questions("v", "Medium", questions())
+    served = bank.draw("v", "Medium", 3)
+    assert sorted(bank.bank_ids("v", served)) == sorted(q["bank_id"] for q in served)
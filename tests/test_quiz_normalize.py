@@ -0,0 +1,41 @@
+import pytest
+
+pytest.importorskip("streamlit")
+pytest.importorskip("google.genai")
+
+from services.quiz_generator import QuizGenerator  # noqa: E402
+
+
+def question(options, answer):
+    return {"type": "mcq", "question": "Who?", "options": options, "correct_answer": answer,
+            "explanation": ""}
+
+
+def test_sequential_labels_are_stripped():
+    q = QuizGenerator.normalize_question(question(["A) One", "B) Two", "(c) Three", "D. Four"], "B) Two"))
+    assert q["options"] == ["One", "Two", "Three", "Four"]
+    assert q["correct_answer"] == "Two"
+
+
+def test_answers_that_start_like_a_label_are_kept():
+    options = ["A. Lincoln", "G. Washington", "T. Jefferson", "J. Adams"]
+    q = QuizGenerator.normalize_question(question(list(options), "A. Lincoln"))
+    assert q["options"] == options
+    assert q["correct_answer"] == "A. Lincoln"
+
+    q = QuizGenerator.normalize_question(question(["E. coli", "C. elegans", "Yeast", "Zebrafish"], "c. Elegans"))
+    assert q["options"][1] == "C. elegans"
+    assert q["correct_answer"] == "C. elegans"
+
+
+def test_letter_answer_maps_to_option():
+    q = QuizGenerator.normalize_question(question(["One", "Two", "Three", "Four"], "c"))
+    assert q["correct_answer"] == "Three"
+
+
+def test_validate_drops_answers_not_in_options():
+    valid = QuizGenerator.validate_questions([
+        question(["One", "Two", "Three", "Four"], "Five"),
+        question(["One", "Two", "Three", "Four"], " two "),
+    ])
+    assert len(valid) == 1 and valid[0]["correct_answer"] == "Two" and valid[0]["id"] == 1
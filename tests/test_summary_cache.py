@@ -0,0 +1,24 @@
+from utils.summary_cache import SummaryCache
+
+
+def test_put_then_get_by_kind_and_key(tmp_path):
+    cache = SummaryCache(str(tmp_path / "summaries.db"))
+    cache.put("chunk", "v1:abc", "- bullet")
+    assert cache.get("chunk", "v1:abc") == "- bullet"
+    assert cache.get("video", "v1:abc") is None
+    cache.put("chunk", "v1:abc", "- newer bullet")
+    assert cache.get("chunk", "v1:abc") == "- newer bullet"
+
+
+def test_get_many_returns_only_hits():
+    cache = SummaryCache(":memory:")
+    cache.put("chunk", "a", "A")
+    cache.put("chunk", "c", "C")
+    assert cache.get_many("chunk", ["a", "b", "c", "a"]) == {"a": "A", "c": "C"}
+    assert cache.get_many("chunk", []) == {}
+
+
+def test_summaries_survive_a_restart(tmp_path):
+    path = str(tmp_path / "summaries.db")
+    SummaryCache(path).put("course", "k", "overview")
+    assert SummaryCache(path).get("course", "k") == "overview"
@@ -0,0 +1,70 @@
+import json
+from types import SimpleNamespace
+
+from utils.token_ledger import TokenLedger, estimate_tokens, parse_daily_limit
+
+
+def test_totals_group_calls(tmp_path):
+    ledger = TokenLedger(str(tmp_path / "usage.jsonl"))
+    ledger.record("flash", "key1", "quiz", 1000, 200, video_id="v")
+    ledger.record("flash", "key1", "notes", 500, 300, video_id="v")
+    ledger.record("pro", "key2", "quiz", 100, 10)
+    assert ledger.totals(("model",)) == [
+        {"model": "flash", "requests": 2, "prompt_tokens": 1500, "output_tokens": 500, "cached_tokens": 0},
+        {"model": "pro", "requests": 1, "prompt_tokens": 100, "output_tokens": 10, "cached_tokens": 0},
+    ]
+    assert ledger.requests_today("flash", "key1") == 2 and ledger.requests_today("flash", "key2") == 0
+
+
+def test_restart_keeps_todays_totals(tmp_path):
+    path = tmp_path / "usage.jsonl"
+    ledger = TokenLedger(str(path))
+    for _ in range(5):
+        ledger.record("flash", "key1", "quiz", 1000, 1000)
+    with open(path, "a", encoding="utf-8") as f:
+        f.write("not json\n")
+        f.write(json.dumps({"day": "2000-01-01", "model": "flash", "key": "key1", "feature": "quiz",
+                            "requests": 1}) + "\n")
+    assert TokenLedger(str(path)).requests_today("flash") == 5
+
+
+def test_response_usage_counts_thoughts_as_output():
+    ledger = TokenLedger("")
+    usage = SimpleNamespace(prompt_token_count=100, candidates_token_count=50,
+                            cached_content_token_count=40, thoughts_token_count=25)
+    ledger.record_response(SimpleNamespace(usage_metadata=usage, text="x"), "flash", "key1", "qa")
+    row = ledger.rows()[0]
+    assert (row["prompt_tokens"], row["output_tokens"], row["cached_tokens"]) == (100, 75, 40)
+
+
+def test_missing_usage_is_estimated_locally():
+    ledger = TokenLedger("")
+    ledger.record_response(SimpleNamespace(text="y" * 40), "flash", "key1", "qa", prompt="x" * 400)
+    row = ledger.rows()[0]
+    assert (row["prompt_tokens"], row["output_tokens"]) == (estimate_tokens("x" * 400), 10)
+
+
+def test_quota_report_against_declared_limits():
+    ledger = TokenLedger("")
+    for _ in range(3):
+        ledger.record("flash", "key1", "quiz", 10, 10)
+    models = [{"name": "flash", "limit": "10/day"}, {"name": "pro", "limit": "unlimited"}]
+    report = {(r["model"], r["key"]): r for r in ledger.quota_report(models, ["key1"])}
+    assert report[("flash", "key1")]["remaining"] == 7 and report[("flash", "key1")]["used_pct"] == 30.0
+    assert report[("pro", "key1")]["limit"] is None
+    assert parse_daily_limit(" 250 / day") == 250
+
+
+def test_unit_samples_survive_a_restart(tmp_path):
+    path = tmp_path / "usage.jsonl"
+    ledger = TokenLedger(str(path))
+    for _ in range(5):
+        ledger.record("flash", "key1", "quiz", 1000, 1000, unit_kind="quiz", units=5)
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps({"day": "2000-01-01", "model": "flash", "key": "key1", "feature": "quiz",
+                            "output_tokens": 600, "unit_kind": "quiz", "units": 2}) + "\n")
+
+    reloaded = TokenLedger(str(path))
+    assert reloaded.output_per_unit("quiz", pct=100) == 300
+    assert reloaded.output_per_unit("quiz", pct=50) == 200
+    assert reloaded.output_per_unit("notes") is None
@@ -0,0 +1,100 @@
+import os
+
+import numpy as np
+
+from utils.metrics import metrics
+from utils.transcript_index import IndexSegment, TranscriptIndex, index_term
+
+TOPICS = ["gradient descent", "neural network", "decision tree", "linear regression", "random forest"]
+
+
+def captions(i, lines=40):
+    """Caption segments mentioning TOPICS[i] at 12 s and a filler word elsewhere"""
+    segments = [{"text": f"filler sentence number {n} about video{i} content.", "start": n * 3.0}
+                for n in range(lines)]
+    segments[4] = {"text": f"today we explain {TOPICS[i]} step by step.", "start": 12.0}
+    return segments
+
+
+def postings_by_video(segment):
+    out = {}
+    for term in segment.terms:
+        docs, pairs = segment.postings(term)
+        for doc, pair in zip(docs.tolist(), pairs.tolist()):
+            out[(term, segment.videos[doc])] = segment.positions_of(pair).tolist()
+    return out
+
+
+def test_index_term_folds_plurals_and_hyphens():
+    assert index_term("back-propagation") == "backpropagation"
+    assert index_term("layers") == "layer"
+    assert index_term("loss") == "loss"
+    assert index_term("bias") == "bias"
+
+
+def test_merge_keeps_every_posting_and_caption():
+    parts = [IndexSegment.build(f"vid{i}", f"Video {i}", captions(i)) for i in range(3)]
+    merged = IndexSegment.merge([IndexSegment.merge(parts[:2]), parts[2]])
+
+    expected = {}
+    for part in parts:
+        expected.update(postings_by_video(part))
+    assert postings_by_video(merged) == expected
+    assert merged.videos == ["vid0", "vid1", "vid2"] and merged.titles == ["Video 0", "Video 1", "Video 2"]
+    for doc, part in enumerate(parts):
+        assert merged.captions(doc) == part.captions(0)
+        assert merged.time_at(doc, merged.caption_at(doc, 30)) == part.time_at(0, part.caption_at(0, 30))
+
+
+def test_save_and_load_round_trip(tmp_path):
+    segment = IndexSegment.merge([IndexSegment.build(f"vid{i}", "", captions(i)) for i in range(2)])
+    path = str(tmp_path / "segment.tix")
+    segment.save(path)
+    loaded = IndexSegment.load(path)
+    for name in IndexSegment.ARRAYS:
+        assert np.array_equal(getattr(loaded, name), getattr(segment, name))
+    assert loaded.videos == segment.videos and loaded.terms == segment.terms
+
+
+def test_segments_merge_like_a_binary_counter(tmp_path):
+    index = TranscriptIndex(str(tmp_path))
+    for i in range(5):
+        assert index.add(f"vid{i}", captions(i), title=f"Video {i}")
+    assert not index.add("vid0", captions(0))
+    # 5 videos = 4 + 1; retired segment files are deleted
+    assert [len(s) for _, s in index._segments] == [4, 1]
+    assert sorted(os.listdir(tmp_path)) == sorted([name for name, _ in index._segments] + ["manifest.json"])
+
+
+def test_reloaded_index_answers_the_same(tmp_path):
+    index = TranscriptIndex(str(tmp_path))
+    for i in range(5):
+        index.add(f"vid{i}", captions(i), title=f"Video {i}")
+    reloaded = TranscriptIndex(str(tmp_path))
+    assert len(reloaded) == 5 and "vid3" in reloaded
+    assert reloaded.search("linear regression") == index.search("linear regression")
+
+
+def test_search_finds_the_moment():
+    index = TranscriptIndex("")
+    for i in range(5):
+        index.add(f"vid{i}", captions(i), title=f"Video {i}")
+    results = index.search("decision trees")
+    assert results[0]["video_id"] == "vid2"
+    assert results[0]["hits"][0]["time"] == 12.0
+    assert "**decision**" in results[0]["hits"][0]["snippet"]
+
+
+def test_quoted_phrase_must_appear_in_order():
+    index = TranscriptIndex("")
+    index.add("a", [{"text": "the random forest is an ensemble.", "start": 0.0}])
+    index.add("b", [{"text": "a forest that grows at random.", "start": 0.0}])
+    assert {r["video_id"] for r in index.search("random forest")} == {"a", "b"}
+    assert [r["video_id"] for r in index.search('"random forest"')] == ["a"]
+
+
+def test_unreadable_index_starts_empty(tmp_path):
+    (tmp_path / "manifest.json").write_text('{"segments": ["missing.tix"]}')
+    index = TranscriptIndex(str(tmp_path))
+    assert len(index) == 0 and index.search("anything") == []
+    assert any(c["name"] == "transcript_index_load_errors" for c in metrics.counters())
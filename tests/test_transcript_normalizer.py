@@ -0,0 +1,41 @@
+from utils.transcript_normalizer import TranscriptNormalizer
+
+
+def normalize(*segments):
+    return TranscriptNormalizer.normalize(list(segments))[0]
+
+
+def test_caption_cues_and_fillers_are_removed():
+    assert normalize("[Music] so um we start [Applause] here (laughs)") == "so we start here"
+    assert normalize("♪ la la la ♪ >> welcome back") == "welcome back"
+
+
+def test_content_that_looks_like_noise_is_kept():
+    assert normalize("The screw is 5 mm wide.") == "The screw is 5 mm wide."
+    assert normalize("Do you know, the answer?") == "Do you know, the answer?"
+    assert normalize("I mean, it works.") == "I mean, it works."
+    assert normalize("x[i] is the input") == "x[i] is the input"
+
+
+def test_rolling_caption_overlap_is_dropped():
+    text, stats = TranscriptNormalizer.normalize([
+        "today we cover gradient",
+        "cover gradient descent and",
+        "descent and momentum",
+    ])
+    assert text == "today we cover gradient descent and momentum"
+    assert stats["duplicate_words"] == 4
+
+
+def test_single_word_overlap_is_dropped():
+    assert normalize("we use gradient", "gradient descent here") == "we use gradient descent here"
+
+
+def test_repeated_word_across_a_sentence_end_is_kept():
+    assert normalize("this is the end.", "End users want it") == "this is the end.\nEnd users want it"
+
+
+def test_unpunctuated_captions_are_wrapped_into_lines():
+    words = [f"w{i}" for i in range(60)]
+    lines = normalize(*(" ".join(words[i:i + 5]) for i in range(0, 60, 5))).split("\n")
+    assert [len(line.split()) for line in lines] == [25, 25, 10]
@@ -0,0 +1,164 @@
+"""
+Chunk Selector - Relevance-based transcript context for prompts
+Picks the most informative, non-redundant chunks within a character budget
+instead of blindly taking the first N characters.
+"""
+
+import re
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from utils.metrics import metrics
+
+
+class ChunkSelector:
+    """BM25 chunk scoring + MMR de-duplication, vectorized with NumPy over sparse term weights"""
+
+    # BM25 parameters (standard defaults)
+    K1 = 1.5
+    B = 0.75
+
+    # Trade-off between informativeness and novelty in MMR (1.0 = no redundancy penalty)
+    MMR_LAMBDA = 0.7
+
+    TOKEN_PATTERN = re.compile(r"[a-z0-9][a-z0-9'\-]*[a-z0-9]|[a-z0-9]")
+    SPLIT_PATTERN = re.compile(r"(?<=[.!?])\s+|\n+")
+
+    STOPWORDS = frozenset("""
+        a about above after again all also am an and any are as at be because been before being
+        below between both but by can could did do does doing down during each few for from further
+        get got had has have having he her here hers him his how i if in into is it its itself just
+        know like me more most my no nor not now of off on once only or other our out over own really
+        right same she so some such than that the their them then there these they this those through
+        to too um uh under until up very was we were what when where which while who whom why will
+        with would yeah you your okay ok going gonna thing things lot one two
+    """.split())
+
+    @staticmethod
+    def split_chunks(text: str, target_chars: int = 400) -> List[str]:
+        """Group caption lines / sentences into chunks of roughly target_chars"""
+        pieces = []
+        for piece in ChunkSelector.SPLIT_PATTERN.split(text):
+            piece = piece.strip() if piece else ""
+            # Unpunctuated captions can arrive as one huge line — hard-wrap on words
+            while len(piece) > target_chars * 2:
+                cut = piece.rfind(" ", 0, target_chars)
+                cut = cut if cut > 0 else target_chars
+                pieces.append(piece[:cut])
+                piece = piece[cut:].strip()
+            if piece:
+                pieces.append(piece)
+
+        chunks: List[str] = []
+        current: List[str] = []
+        size = 0
+        for piece in pieces:
+            current.append(piece)
+            size += len(piece) + 1
+            if size >= target_chars:
+                chunks.append(" ".join(current))
+                current, size = [], 0
+        if current:
+            chunks.append(" ".join(current))
+        return chunks
+
+    @staticmethod
+    def tokenize(text: str) -> List[str]:
+        return [t for t in ChunkSelector.TOKEN_PATTERN.findall(text.lower())
+                if t not in ChunkSelector.STOPWORDS and len(t) > 2]
+
+    @staticmethod
+    def bm25_weights(chunks: List[str]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Chunk × term BM25 weights in coordinate form: (chunk, term, weight) per non-zero entry
+        Sorted by chunk; a dense matrix would be chunks × vocabulary, almost all zeros
+        """
+        vocab = {}
+        rows, cols = [], []
+        for i, chunk in enumerate(chunks):
+            for token in ChunkSelector.tokenize(chunk):
+                rows.append(i)
+                cols.append(vocab.setdefault(token, len(vocab)))
+        if not rows:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+
+        # One entry per (chunk, term) pair, with its term frequency
+        n_terms = len(vocab)
+        pairs, tf = np.unique(np.array(rows, dtype=np.int64) * n_terms + np.array(cols), return_counts=True)
+        rows, cols = pairs // n_terms, pairs % n_terms
+
+        n = len(chunks)
+        df = np.bincount(cols, minlength=n_terms)
+        idf = np.log((n - df + 0.5) / (df + 0.5) + 1.0)
+
+        lengths = np.bincount(rows, weights=tf, minlength=n)
+        avg_len = max(float(lengths.mean()), 1.0)
+        norm = ChunkSelector.K1 * (1 - ChunkSelector.B + ChunkSelector.B * lengths[rows] / avg_len)
+        values = idf[cols] * (tf * (ChunkSelector.K1 + 1)) / (tf + norm)
+        return rows, cols, values.astype(np.float32)
+
+    @staticmethod
+    def score_chunks(rows: np.ndarray, cols: np.ndarray, values: np.ndarray, n_chunks: int) -> np.ndarray:
+        """
+        Informativeness of each chunk against the document's own topic profile
+        (the video has no explicit query, so its aggregate term weights act as one)
+        """
+        topic = np.log1p(np.bincount(cols, weights=values))
+        scores = np.bincount(rows, weights=values * topic[cols], minlength=n_chunks)
+        peak = scores.max() if scores.size else 0.0
+        return scores / peak if peak > 0 else scores
+
+    @staticmethod
+    def select(transcript: str, budget_chars: int = 4000,
+               target_chunk_chars: int = 400, mmr_lambda: Optional[float] = None) -> str:
+        """
+        Return the best chunks (in original order) that fit within budget_chars
+        Short transcripts are returned unchanged
+        """
+        if len(transcript) <= budget_chars:
+            return transcript
+
+        with metrics.span("chunk_selection"):
+            chunks = ChunkSelector.split_chunks(transcript, target_chunk_chars)
+            if len(chunks) <= 1:
+                return transcript[:budget_chars]
+
+            n = len(chunks)
+            rows, cols, values = ChunkSelector.bm25_weights(chunks)
+            scores = ChunkSelector.score_chunks(rows, cols, values, n)
+
+            # Unit-length rows: cosine similarity for the redundancy penalty is then a dot product,
+            # computed only against the chunks actually picked
+            row_norms = np.sqrt(np.bincount(rows, weights=values * values, minlength=n))
+            unit = values / np.where(row_norms > 0, row_norms, 1.0)[rows]
+            starts = np.searchsorted(rows, np.arange(n + 1))
+            picked_terms = np.zeros(int(cols.max()) + 1 if cols.size else 1, dtype=np.float32)
+
+            lam = ChunkSelector.MMR_LAMBDA if mmr_lambda is None else mmr_lambda
+            lengths = np.array([len(c) + 1 for c in chunks])
+            available = np.ones(n, dtype=bool)
+            max_sim = np.zeros(n, dtype=np.float32)
+            selected: List[int] = []
+            used = 0
+
+            while True:
+                fits = available & (lengths <= budget_chars - used)
+                if not fits.any():
+                    break
+                mmr = lam * scores - (1 - lam) * max_sim
+                best = int(np.argmax(np.where(fits, mmr, -np.inf)))
+                selected.append(best)
+                used += lengths[best]
+                available[best] = False
+
+                span = slice(starts[best], starts[best + 1])
+                picked_terms[cols[span]] = unit[span]
+                similarity = np.bincount(rows, weights=unit * picked_terms[cols], minlength=n)
+                picked_terms[cols[span]] = 0.0
+                max_sim = np.maximum(max_sim, similarity)
+
+            if not selected:
+                return transcript[:budget_chars]
+            selected.sort()
+            return "\n".join(chunks[i] for i in selected)
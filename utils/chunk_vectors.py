@@ -0,0 +1,100 @@
+"""
+Chunk Vectors - Local vector index over one transcript's chunks
+Signed feature hashing of unigrams + bigrams (no vocabulary to fit or store),
+sublinear TF x per-video IDF, L2-normalized. Rows are kept sparse (only the
+features a chunk uses), so an index costs about as much memory as its text.
+"""
+
+import functools
+import zlib
+from typing import List, Tuple
+
+import numpy as np
+
+from utils.chunk_selector import ChunkSelector
+from utils.metrics import metrics
+
+
+class ChunkVectorIndex:
+    """Top-k cosine retrieval over ~600-char transcript chunks"""
+
+    # 2^15 hashed features keep collisions rare for a single video's vocabulary
+    N_FEATURES = 1 << 15
+
+    CHUNK_CHARS = 600
+
+    # Recently asked-about transcripts kept vectorized (per process)
+    CACHE_SIZE = 8
+
+    def __init__(self, transcript: str):
+        self.chunks = ChunkSelector.split_chunks(transcript, self.CHUNK_CHARS)
+        # Coordinate form: (row, feature, value) per non-zero entry
+        rows, features, values = [], [], []
+        for i, chunk in enumerate(self.chunks):
+            f, v = self.hash_counts(chunk)
+            rows.append(np.full(len(f), i, dtype=np.int32))
+            features.append(f)
+            values.append(v)
+        self.rows = np.concatenate(rows) if rows else np.zeros(0, dtype=np.int32)
+        self.features = np.concatenate(features) if features else np.zeros(0, dtype=np.int32)
+        values = np.concatenate(values) if values else np.zeros(0, dtype=np.float32)
+
+        df = np.bincount(self.features, minlength=self.N_FEATURES)
+        self.idf = (np.log((1.0 + len(self.chunks)) / (1.0 + df)) + 1.0).astype(np.float32)
+        values = values * self.idf[self.features]
+        norms = np.sqrt(np.bincount(self.rows, weights=values * values, minlength=len(self.chunks)))
+        self.values = (values / np.where(norms > 0, norms, 1.0)[self.rows]).astype(np.float32)
+
+    @staticmethod
+    @functools.lru_cache(maxsize=CACHE_SIZE)
+    def for_transcript(transcript: str) -> "ChunkVectorIndex":
+        """Index for a transcript, built once and reused for every follow-up question"""
+        with metrics.span("qa_index_build"):
+            return ChunkVectorIndex(transcript)
+
+    @property
+    def nbytes(self) -> int:
+        return self.rows.nbytes + self.features.nbytes + self.values.nbytes + self.idf.nbytes
+
+    @staticmethod
+    def features_of(text: str) -> List[str]:
+        tokens = ChunkSelector.tokenize(text)
+        return tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+
+    @classmethod
+    def hash_counts(cls, text: str) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        (feature ids, values): signed hashed counts with sublinear TF
+        The sign bit taken from the hash keeps collisions unbiased; cancelled features are dropped
+        """
+        hashes = np.array([zlib.crc32(f.encode("utf-8")) for f in cls.features_of(text)], dtype=np.int64)
+        if not len(hashes):
+            return np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.float32)
+        signs = np.where(hashes & (1 << 31), -1.0, 1.0)
+        ids, inverse = np.unique(hashes % cls.N_FEATURES, return_inverse=True)
+        counts = np.bincount(inverse, weights=signs)
+        keep = counts != 0
+        values = np.sign(counts[keep]) * np.log1p(np.abs(counts[keep]))
+        return ids[keep].astype(np.int32), values.astype(np.float32)
+
+    def search(self, query: str, k: int = 4) -> List[Tuple[int, float]]:
+        """(chunk index, cosine score) for the k best chunks, best first; zero-score chunks are dropped"""
+        if not self.chunks:
+            return []
+        ids, values = self.hash_counts(query)
+        query_vector = np.zeros(self.N_FEATURES, dtype=np.float32)
+        query_vector[ids] = values * self.idf[ids]
+        norm = np.linalg.norm(query_vector)
+        if norm == 0:
+            return []
+        scores = np.bincount(self.rows, weights=self.values * query_vector[self.features],
+                             minlength=len(self.chunks)) / norm
+        top = np.argsort(-scores, kind="stable")[:k]
+        return [(int(i), float(scores[i])) for i in top if scores[i] > 0]
+
+    def overview(self, k: int = 4) -> List[int]:
+        """k chunk indices spread evenly from the start of the video (for questions about the whole video)"""
+        n = len(self.chunks)
+        if n <= k:
+            return list(range(n))
+        return sorted({int(i * n / k) for i in range(k)})
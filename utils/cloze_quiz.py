@@ -0,0 +1,176 @@
+"""
+Cloze Quiz - Offline fill-in-the-blank MCQs from the transcript
+Salient sentences (TF-IDF + TextRank) get their key term blanked; distractors are
+same-type terms from elsewhere in the transcript. Output matches the quiz schema.
+"""
+
+import random
+import re
+import zlib
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from utils.chunk_selector import ChunkSelector
+from utils.extractive_notes import ExtractiveNotes
+from utils.metrics import metrics
+
+
+class ClozeQuiz:
+    """Zero-quota question generator used when Gemini has no key or no quota left"""
+
+    BLANK = "_____"
+
+    MIN_SENTENCE_TOKENS = 6
+    MAX_SENTENCE_CHARS = 250
+    MIN_ANSWER_CHARS = 4
+
+    # Sentences ranked per transcript: TF-IDF / TextRank cost grows with the square of this,
+    # and an even sample across a long video still has far more candidates than questions
+    MAX_SENTENCES = 400
+
+    # Two questions whose sentences are more similar than this test the same thing
+    MAX_SENTENCE_OVERLAP = 0.6
+
+    # Coarse word classes so distractors have the same shape as the answer
+    SUFFIX_TYPES = (
+        ("tion", "noun"), ("sion", "noun"), ("ment", "noun"), ("ness", "noun"),
+        ("ity", "noun"), ("ism", "noun"), ("ance", "noun"), ("ence", "noun"),
+        ("ing", "gerund"), ("ed", "past"), ("ly", "adverb"),
+        ("ize", "verb"), ("ise", "verb"),
+        ("ous", "adjective"), ("ive", "adjective"), ("able", "adjective"),
+        ("ible", "adjective"), ("al", "adjective"), ("ic", "adjective"),
+    )
+    NUMBER = re.compile(r"^\d[\d.,\-]*$")
+
+    @staticmethod
+    def term_type(term: str, proper: set) -> str:
+        if ClozeQuiz.NUMBER.match(term):
+            return "number"
+        if term in proper:
+            return "proper"
+        for suffix, kind in ClozeQuiz.SUFFIX_TYPES:
+            if term.endswith(suffix) and len(term) > len(suffix) + 2:
+                return kind
+        return "word"
+
+    @staticmethod
+    def _proper_terms(sentences: List[str]) -> Dict[str, str]:
+        """term -> capitalized surface form, for words capitalized mid-sentence"""
+        proper = {}
+        for sentence in sentences:
+            for match in re.finditer(r"(?<=[a-z0-9,;:] )([A-Z][a-zA-Z0-9'\-]+)", sentence):
+                proper.setdefault(match.group(1).lower(), match.group(1))
+        return proper
+
+    @staticmethod
+    def _term_pattern(term: str):
+        return re.compile(rf"(?<![\w'\-]){re.escape(term)}(?![\w'\-])", re.IGNORECASE)
+
+    # ========== DISTRACTORS ==========
+
+    @staticmethod
+    def _distractors(answer: int, sentence_terms: set, terms: List[str], types: List[str],
+                     by_salience: List[int], weights: np.ndarray, difficulty: str,
+                     rng: random.Random) -> List[int]:
+        """Three term indices to offer next to the answer"""
+        stem = terms[answer][:5]
+
+        def usable(j: int) -> bool:
+            return (j != answer and terms[j] not in sentence_terms and not terms[j].startswith(stem)
+                    and len(terms[j]) >= ClozeQuiz.MIN_ANSWER_CHARS)
+
+        same_type = [j for j in by_salience if types[j] == types[answer] and usable(j)]
+        if difficulty == "Hard" and len(same_type) > 3:
+            # Terms that co-occur with the answer are the most plausible wrong options
+            affinity = weights[:, same_type].T @ weights[:, answer]
+            same_type = [same_type[k] for k in np.argsort(-affinity, kind="stable")]
+        elif difficulty == "Easy":
+            same_type = rng.sample(same_type[:30], min(len(same_type), 30))
+
+        picks: List[int] = []
+        for j in same_type + [j for j in by_salience if usable(j)]:
+            # No two options from one stem ("gradient" / "gradients")
+            if len(picks) < 3 and j not in picks and all(terms[j][:5] != terms[k][:5] for k in picks):
+                picks.append(j)
+        return picks
+
+    # ========== GENERATION ==========
+
+    @staticmethod
+    @metrics.timed("cloze_quiz")
+    def generate(transcript: str, num_questions: int = 5, difficulty: str = "Medium",
+                 exclude: Optional[List[str]] = None) -> List[Dict]:
+        """Up to num_questions fill-in-the-blank MCQs in the standard quiz schema"""
+        # Whole sentences only: merged neighbours would be too long to use as a question
+        sentences = ExtractiveNotes.split_sentences(transcript, merge=False)
+        token_lists = [ChunkSelector.tokenize(s) for s in sentences]
+        usable = [i for i, tokens in enumerate(token_lists)
+                  if len(tokens) >= ClozeQuiz.MIN_SENTENCE_TOKENS
+                  and len(sentences[i]) <= ClozeQuiz.MAX_SENTENCE_CHARS]
+        if len(usable) < 1:
+            return []
+        if len(usable) > ClozeQuiz.MAX_SENTENCES:
+            # Evenly spaced sample across the video keeps the TF-IDF / TextRank matrices bounded
+            step = len(usable) / ClozeQuiz.MAX_SENTENCES
+            usable = [usable[int(k * step)] for k in range(ClozeQuiz.MAX_SENTENCES)]
+        sentences = [sentences[i] for i in usable]
+        token_lists = [token_lists[i] for i in usable]
+
+        weights, terms = ExtractiveNotes.tfidf(token_lists)
+        scores = ExtractiveNotes.textrank(weights)
+        proper = ClozeQuiz._proper_terms(sentences)
+        types = [ClozeQuiz.term_type(t, proper.keys()) for t in terms]
+        salience = weights.sum(axis=0)
+        by_salience = [int(j) for j in np.argsort(-salience, kind="stable")]
+        index = {t: j for j, t in enumerate(terms)}
+        seen_questions = {q.strip().lower() for q in exclude or []}
+
+        questions: List[Dict] = []
+        chosen_rows: List[int] = []
+        used_answers = set()
+        for i in sorted(range(len(sentences)), key=lambda i: -scores[i]):
+            if len(questions) >= num_questions:
+                break
+            if chosen_rows and float((weights[chosen_rows] @ weights[i]).max()) > ClozeQuiz.MAX_SENTENCE_OVERLAP:
+                continue
+
+            sentence = sentences[i].strip()
+            sentence_terms = set(token_lists[i])
+            candidates = sorted(
+                (index[t] for t in sentence_terms
+                 if len(t) >= ClozeQuiz.MIN_ANSWER_CHARS and t not in used_answers),
+                # Blank the term that matters here and across the video, not a one-off word
+                key=lambda j: -weights[i, j] * salience[j]
+            )
+            rng = random.Random(zlib.crc32(f"{difficulty}:{sentence}".encode("utf-8")))
+            for answer in candidates:
+                distractors = ClozeQuiz._distractors(answer, sentence_terms, terms, types,
+                                                     by_salience, weights, difficulty, rng)
+                if len(distractors) < 3:
+                    continue
+                pattern = ClozeQuiz._term_pattern(terms[answer])
+                if not pattern.search(sentence):
+                    continue  # token came from inside a hyphenated word
+
+                question = f"Fill in the blank: {pattern.sub(ClozeQuiz.BLANK, ExtractiveNotes.tidy(sentence))}"
+                if question.lower() in seen_questions:
+                    break
+                options = [proper.get(terms[j], terms[j]) for j in [answer] + distractors]
+                correct = options[0]
+                rng.shuffle(options)
+                questions.append({
+                    "id": len(questions) + 1,
+                    "type": "mcq",
+                    "question": question,
+                    "options": options,
+                    "correct_answer": correct,
+                    "explanation": f"The video says: \"{ExtractiveNotes.tidy(sentence)}\"",
+                    "source": "offline",
+                })
+                used_answers.add(terms[answer])
+                chosen_rows.append(i)
+                break
+
+        metrics.incr("offline_questions_generated", len(questions))
+        return questions
@@ -0,0 +1,89 @@
+"""
+Content Chunker - Content-defined chunking of transcripts
+Boundaries come from a rolling hash over the last few normalized words, so an
+edit (corrected caption, re-upload with a new intro, a reused segment) only
+moves the boundaries next to it; every other chunk keeps its text and hash.
+"""
+
+import hashlib
+import re
+import zlib
+from typing import List
+
+
+class ContentChunk:
+    """A run of transcript lines plus the hash of its normalized words"""
+
+    __slots__ = ("text", "digest", "words")
+
+    def __init__(self, text: str, digest: str, words: int):
+        self.text = text
+        self.digest = digest
+        self.words = words
+
+
+class ContentChunker:
+    """Rabin-Karp rolling hash over words; cuts at the end of the line where a boundary fires"""
+
+    WINDOW_WORDS = 16
+
+    # ~1800 words (~10k chars) per chunk on average: an hour-long lecture is ~5 chunks
+    MIN_WORDS = 800
+    MAX_WORDS = 3000
+    BOUNDARY_MASK = (1 << 10) - 1  # one boundary per ~1024 words past MIN_WORDS
+
+    BASE = 1_000_003
+    MOD = (1 << 61) - 1
+
+    WORD_PATTERN = re.compile(r"[^a-z0-9]+")
+
+    @staticmethod
+    def normalize_word(word: str) -> str:
+        """Case and punctuation do not change a chunk ('Gradient,' == 'gradient')"""
+        return ContentChunker.WORD_PATTERN.sub("", word.lower())
+
+    @staticmethod
+    def digest(words: List[str]) -> str:
+        return hashlib.sha1(" ".join(words).encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def split(text: str) -> List[ContentChunk]:
+        """Chunks covering every line of text, in order"""
+        base, mod, window = ContentChunker.BASE, ContentChunker.MOD, ContentChunker.WINDOW_WORDS
+        drop = pow(base, window, mod)  # weight of the word leaving the window
+
+        chunks: List[ContentChunk] = []
+        lines: List[str] = []
+        words: List[str] = []
+        recent: List[int] = []
+        rolling = 0
+        cut_pending = False
+
+        def flush():
+            if lines:
+                chunks.append(ContentChunk("\n".join(lines), ContentChunker.digest(words), len(words)))
+
+        for line in text.split("\n"):
+            line = line.strip()
+            if not line:
+                continue
+            lines.append(line)
+            for raw in line.split():
+                word = ContentChunker.normalize_word(raw)
+                if not word:
+                    continue
+                words.append(word)
+                h = zlib.crc32(word.encode("utf-8")) + 1
+                recent.append(h)
+                rolling = (rolling * base + h) % mod
+                if len(recent) > window:
+                    rolling = (rolling - recent.pop(0) * drop) % mod
+                if len(words) >= ContentChunker.MIN_WORDS and (rolling & ContentChunker.BOUNDARY_MASK) == 0:
+                    cut_pending = True
+
+            # Cut on a line end so chunks stay readable; MAX_WORDS bounds pathological runs
+            if cut_pending or len(words) >= ContentChunker.MAX_WORDS:
+                flush()
+                lines, words, cut_pending = [], [], False
+        flush()
+        return chunks
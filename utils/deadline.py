@@ -0,0 +1,156 @@
+"""
+Deadline - End-to-end time budget and cancellation for one user request
+A Deadline is created where the user clicks, activated for the work it covers and
+picked up by every layer below it (transcript fetch, scheduler queue, model
+attempts, key rotation, retries). Each network call gets a timeout derived from the
+remaining budget, and cancel() stops the work at its next checkpoint.
+"""
+
+import contextvars
+import os
+import threading
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from contextlib import contextmanager
+from typing import Callable, Iterator, Optional, TypeVar
+
+from utils.metrics import metrics
+
+T = TypeVar("T")
+
+_current: contextvars.ContextVar = contextvars.ContextVar("request_deadline", default=None)
+
+
+class DeadlineExceeded(Exception):
+    """The request ran out of time or was cancelled"""
+
+    def __init__(self, message: str, cancelled: bool = False):
+        super().__init__(message)
+        self.cancelled = cancelled
+
+
+class Deadline:
+    """Time budget shared by every step of one request; cancellable from any thread"""
+
+    # Never hand a network call less than this, so it can at least fail cleanly
+    MIN_CALL_SECONDS = 1.0
+
+    # Workers for Deadline.run(); abandoned jobs stop at their next checkpoint
+    _executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="deadline-run")
+
+    def __init__(self, seconds: Optional[float] = None, clock: Callable[[], float] = time.monotonic):
+        self._clock = clock
+        self._expires = clock() + seconds if seconds else None
+        self._cancelled = threading.Event()
+        self._parent: Optional["Deadline"] = None
+        self._children: "weakref.WeakSet[Deadline]" = weakref.WeakSet()
+        self._children_lock = threading.Lock()
+        self.reason: Optional[str] = None
+
+    @classmethod
+    def for_request(cls, seconds: Optional[float] = None) -> "Deadline":
+        """Deadline for one user action (REQUEST_DEADLINE_SECONDS unless given)"""
+        return cls(seconds or float(os.getenv("REQUEST_DEADLINE_SECONDS", "90")))
+
+    # ========== CONTEXT ==========
+
+    def child(self) -> "Deadline":
+        """Deadline for one branch of this request: ends with it, but can also be cancelled alone"""
+        child = Deadline(clock=self._clock)
+        child._expires = self._expires
+        child._parent = self
+        with self._children_lock:
+            self._children.add(child)
+        if self.cancelled:
+            child.cancel(self.reason)
+        return child
+
+    @staticmethod
+    def current() -> "Deadline":
+        """The active deadline, or an unbounded one when none was set"""
+        return _current.get() or Deadline()
+
+    @contextmanager
+    def activate(self) -> Iterator["Deadline"]:
+        """Make this the deadline for every call in the block (and threads copying its context)"""
+        token = _current.set(self)
+        try:
+            yield self
+        finally:
+            _current.reset(token)
+
+    # ========== STATE ==========
+
+    def remaining(self) -> float:
+        if self._cancelled.is_set():
+            return 0.0
+        if self._expires is None:
+            return float("inf")
+        return max(self._expires - self._clock(), 0.0)
+
+    @property
+    def bounded(self) -> bool:
+        return self._expires is not None
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def cancel(self, reason: str = "Cancelled"):
+        """Stop the request (and every child); safe to call from any thread, repeatedly"""
+        if not self._cancelled.is_set():
+            self.reason = reason
+            self._cancelled.set()
+            if self._parent is None:
+                metrics.incr("deadline_cancellations")
+            with self._children_lock:
+                children = list(self._children)
+            for child in children:
+                child.cancel(reason)
+
+    def message(self) -> str:
+        return f"{self.reason} by user" if self.cancelled else "Request timed out"
+
+    def check(self, stage: str):
+        """Raise DeadlineExceeded if the budget is gone (a checkpoint between steps)"""
+        if self.expired():
+            metrics.incr("deadline_exceeded", stage=stage, reason="cancelled" if self.cancelled else "timeout")
+            raise DeadlineExceeded(self.message(), cancelled=self.cancelled)
+
+    def timeout(self, cap: float) -> float:
+        """Per-call timeout: the remaining budget, capped (never below MIN_CALL_SECONDS)"""
+        return max(min(cap, self.remaining()), self.MIN_CALL_SECONDS)
+
+    def sleep(self, seconds: float):
+        """Retry back-off that wakes immediately on cancellation and never outlives the budget"""
+        self._cancelled.wait(min(seconds, self.remaining()))
+
+    # ========== BACKGROUND EXECUTION ==========
+
+    def run(self, fn: Callable[[], T], on_tick: Optional[Callable[["Deadline"], None]] = None,
+            poll_seconds: float = 0.25) -> T:
+        """
+        Run fn on a worker under this deadline and wait for it
+        on_tick is called while waiting (e.g. a Streamlit placeholder update). If the
+        wait is interrupted — a Streamlit rerun raises inside on_tick — the work is cancelled
+        """
+        def work():
+            with self.activate():
+                return fn()
+
+        future = self._executor.submit(contextvars.copy_context().run, work)
+        try:
+            while True:
+                try:
+                    return future.result(timeout=poll_seconds)
+                except FutureTimeout:
+                    if on_tick:
+                        on_tick(self)
+        finally:
+            if not future.done():
+                self.cancel("Cancelled")
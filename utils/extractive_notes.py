@@ -0,0 +1,195 @@
+"""
+Extractive Notes - Zero-quota offline notes from the transcript
+TF-IDF sentence vectors + TextRank centrality (NumPy), mapped onto the same
+section headings as the AI notes. No network, runs in well under a second.
+"""
+
+import re
+from typing import Dict, List
+
+import numpy as np
+
+from utils.chunk_selector import ChunkSelector
+from utils.metrics import metrics
+from utils.notes_sections import SECTIONS, join_sections
+
+
+class ExtractiveNotes:
+    """Local extractive summarizer used when every Gemini model/key is out of quota or no key is set"""
+
+    BANNER = ("> ⚡ **Offline notes** — extracted directly from the transcript without AI. "
+              "Upgrade to AI notes once the AI is available.")
+
+    # TextRank power iteration
+    DAMPING = 0.85
+    MAX_ITERATIONS = 100
+    TOLERANCE = 1e-6
+
+    # Similarity matrix is n x n — merge neighbouring sentences above this count
+    MAX_SENTENCES = 1200
+    MIN_TOKENS = 5
+    MAX_SENTENCE_CHARS = 300
+
+    MMR_LAMBDA = 0.7
+
+    TAKEAWAY_CUES = re.compile(
+        r"\b(should|must|remember|make sure|try|avoid|don't|need to|tip|always|never|recommend|best way)\b",
+        re.IGNORECASE
+    )
+    WHY_CUES = re.compile(
+        r"\b(because|why|matters?|means|so that|impact|benefits?|helps?|therefore|reason|important)\b",
+        re.IGNORECASE
+    )
+
+    # ========== SENTENCES ==========
+
+    @staticmethod
+    def split_sentences(text: str, merge: bool = True) -> List[str]:
+        """
+        Sentences / caption lines, hard-wrapped so unpunctuated captions stay readable
+        merge: pair up neighbours until at most MAX_SENTENCES remain (bounds the similarity matrix)
+        """
+        sentences = []
+        for piece in ChunkSelector.SPLIT_PATTERN.split(text):
+            piece = (piece or "").strip()
+            while len(piece) > ExtractiveNotes.MAX_SENTENCE_CHARS:
+                cut = piece.rfind(" ", 0, ExtractiveNotes.MAX_SENTENCE_CHARS)
+                cut = cut if cut > 0 else ExtractiveNotes.MAX_SENTENCE_CHARS
+                sentences.append(piece[:cut])
+                piece = piece[cut:].strip()
+            if piece:
+                sentences.append(piece)
+
+        # Keep the similarity matrix bounded on very long videos
+        while merge and len(sentences) > ExtractiveNotes.MAX_SENTENCES:
+            sentences = [" ".join(sentences[i:i + 2]) for i in range(0, len(sentences), 2)]
+        return sentences
+
+    @staticmethod
+    def tfidf(token_lists: List[List[str]]):
+        """Row-normalized sentence x term TF-IDF matrix and the vocabulary"""
+        vocab: Dict[str, int] = {}
+        rows, cols = [], []
+        for i, tokens in enumerate(token_lists):
+            for token in tokens:
+                rows.append(i)
+                cols.append(vocab.setdefault(token, len(vocab)))
+
+        counts = np.zeros((len(token_lists), max(len(vocab), 1)), dtype=np.float64)
+        if rows:
+            np.add.at(counts, (np.array(rows), np.array(cols)), 1.0)
+
+        df = (counts > 0).sum(axis=0)
+        idf = np.log((1.0 + len(token_lists)) / (1.0 + df)) + 1.0
+        weights = np.log1p(counts) * idf
+        norms = np.linalg.norm(weights, axis=1, keepdims=True)
+        weights = np.divide(weights, norms, out=np.zeros_like(weights), where=norms > 0)
+        terms = [None] * len(vocab)
+        for term, j in vocab.items():
+            terms[j] = term
+        return weights, terms
+
+    @staticmethod
+    def textrank(weights: np.ndarray) -> np.ndarray:
+        """PageRank over the cosine-similarity graph of sentences"""
+        n = weights.shape[0]
+        similarity = weights @ weights.T
+        np.fill_diagonal(similarity, 0.0)
+        row_sums = similarity.sum(axis=1, keepdims=True)
+        transition = np.divide(similarity, row_sums, out=np.full_like(similarity, 1.0 / n),
+                               where=row_sums > 0)
+
+        scores = np.full(n, 1.0 / n)
+        for _ in range(ExtractiveNotes.MAX_ITERATIONS):
+            updated = (1 - ExtractiveNotes.DAMPING) / n + ExtractiveNotes.DAMPING * (transition.T @ scores)
+            if np.abs(updated - scores).sum() < ExtractiveNotes.TOLERANCE:
+                return updated
+            scores = updated
+        return scores
+
+    # ========== SECTIONS ==========
+
+    @staticmethod
+    def tidy(sentence: str) -> str:
+        sentence = sentence.strip()
+        sentence = sentence[:1].upper() + sentence[1:]
+        return sentence if sentence.endswith((".", "!", "?")) else sentence + "."
+
+    @staticmethod
+    def _mmr(candidates: List[int], weights: np.ndarray, scores: np.ndarray, k: int) -> List[int]:
+        """Pick k informative but mutually different sentences"""
+        chosen: List[int] = []
+        pool = list(candidates)
+        top = scores.max() or 1.0
+        while pool and len(chosen) < k:
+            if chosen:
+                redundancy = (weights[pool] @ weights[chosen].T).max(axis=1)
+            else:
+                redundancy = np.zeros(len(pool))
+            mmr = ExtractiveNotes.MMR_LAMBDA * scores[pool] / top - (1 - ExtractiveNotes.MMR_LAMBDA) * redundancy
+            chosen.append(pool.pop(int(np.argmax(mmr))))
+        return chosen
+
+    @staticmethod
+    @metrics.timed("extractive_notes")
+    def generate(transcript: str) -> str:
+        """Offline notes markdown with the standard notes section headings"""
+        sentences = ExtractiveNotes.split_sentences(transcript)
+        token_lists = [ChunkSelector.tokenize(s) for s in sentences]
+        usable = [i for i, tokens in enumerate(token_lists) if len(tokens) >= ExtractiveNotes.MIN_TOKENS]
+        if not usable:
+            usable = [i for i, tokens in enumerate(token_lists) if tokens]
+        if not usable:
+            return ""
+
+        sentences = [sentences[i] for i in usable]
+        weights, terms = ExtractiveNotes.tfidf([token_lists[i] for i in usable])
+        scores = ExtractiveNotes.textrank(weights)
+        ranked = [int(i) for i in np.argsort(-scores)]
+        used = set()
+
+        def take(indices: List[int]) -> List[int]:
+            used.update(indices)
+            return indices
+
+        def bullets(indices: List[int]) -> str:
+            return "\n".join(f"- {ExtractiveNotes.tidy(sentences[i])}" for i in indices)
+
+        # 🎯 Core concept: the two most central sentences, in transcript order
+        core = sorted(take(ranked[:2]))
+
+        # 📚 Key concepts: highest-weight terms, each explained by its best sentence
+        concepts = []
+        term_weight = weights.sum(axis=0)
+        for j in np.argsort(-term_weight)[:12]:
+            if len(concepts) >= 5:
+                break
+            holders = [i for i in ranked if weights[i, j] > 0 and i not in used]
+            if holders:
+                concepts.append((terms[j], take(holders[:1])[0]))
+
+        # 🔍 Insights: diverse central sentences not used yet
+        insights = take(ExtractiveNotes._mmr([i for i in ranked[:40] if i not in used], weights, scores, 4))
+
+        # 💡 Takeaways / 🎓 Why it matters: cue phrases first, then the best remaining sentences
+        def cued(pattern, k):
+            picks = [i for i in ranked if i not in used and pattern.search(sentences[i])][:k]
+            if len(picks) < k:
+                picks += [i for i in ranked if i not in used and i not in picks][:k - len(picks)]
+            return take(picks)
+
+        takeaways = cued(ExtractiveNotes.TAKEAWAY_CUES, 3)
+        why = sorted(cued(ExtractiveNotes.WHY_CUES, 2))
+
+        bodies = [
+            " ".join(ExtractiveNotes.tidy(sentences[i]) for i in core),
+            "\n".join(f"- **{term.capitalize()}** — {ExtractiveNotes.tidy(sentences[i])}" for term, i in concepts),
+            bullets(insights),
+            bullets(takeaways),
+            " ".join(ExtractiveNotes.tidy(sentences[i]) for i in why),
+        ]
+        sections = {"": ExtractiveNotes.BANNER}
+        for (heading, _), body in zip(SECTIONS, bodies):
+            sections[heading] = body or "_Not enough material in the transcript._"
+        metrics.incr("offline_notes_generated")
+        return join_sections(sections)
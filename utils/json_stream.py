@@ -0,0 +1,93 @@
+"""
+Incremental JSON Array Decoder
+Yields each complete top-level object of a streamed JSON array as soon as
+its closing brace arrives, without waiting for the rest of the response.
+"""
+
+import json
+import re
+from typing import Any, List
+
+
+class IncrementalArrayDecoder:
+    """Feed text chunks in; get finished array elements out"""
+
+    TRAILING_COMMA = re.compile(r',(\s*[\]\}])')
+
+    def __init__(self):
+        self._buffer = ""
+        self._pos = 0            # next character to scan
+        self._started = False    # seen the opening '['
+        self._finished = False   # seen the closing ']'
+        self._depth = 0          # nesting depth inside the current element
+        self._in_string = False
+        self._escape = False
+        self._element_start = -1
+        self.errors = 0          # elements that completed but failed to parse
+
+    @property
+    def finished(self) -> bool:
+        return self._finished
+
+    def feed(self, chunk: str) -> List[Any]:
+        """Consume a chunk; return the elements completed by it"""
+        if self._finished or not chunk:
+            return []
+        self._buffer += chunk
+        completed: List[Any] = []
+        buf = self._buffer
+        i = self._pos
+
+        while i < len(buf):
+            ch = buf[i]
+
+            if not self._started:
+                # Skip code fences / prose until the array opens
+                if ch == "[":
+                    self._started = True
+                i += 1
+                continue
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+            elif ch in "{[":
+                if self._depth == 0:
+                    self._element_start = i
+                self._depth += 1
+            elif ch in "}]":
+                if self._depth == 0 and ch == "]":
+                    self._finished = True
+                    i += 1
+                    break
+                self._depth -= 1
+                if self._depth == 0 and self._element_start >= 0:
+                    element = self._decode(buf[self._element_start:i + 1])
+                    if element is not None:
+                        completed.append(element)
+                    self._element_start = -1
+            i += 1
+
+        # Drop consumed text so the buffer only holds the element in progress
+        cut = self._element_start if self._element_start >= 0 else i
+        self._buffer = buf[cut:]
+        self._pos = i - cut
+        if self._element_start >= 0:
+            self._element_start = 0
+        return completed
+
+    def _decode(self, text: str) -> Any:
+        try:
+            return json.loads(text)
+        except json.JSONDecodeError:
+            try:
+                return json.loads(self.TRAILING_COMMA.sub(r'\1', text))
+            except json.JSONDecodeError:
+                self.errors += 1
+                return None
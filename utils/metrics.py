@@ -0,0 +1,254 @@
+"""
+Metrics Registry - Lightweight timing spans and counters
+Exports Prometheus-style text or JSON lines with p50/p95/p99 aggregation
+"""
+
+import json
+import math
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterator, List, Optional, Tuple
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile (values need not be sorted)"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100.0 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+class MetricsRegistry:
+    """Thread-safe in-process store for spans, counters and gauges"""
+
+    # Keep a bounded window of samples per series so memory stays flat
+    MAX_SAMPLES = 2048
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._samples: Dict[Tuple, deque] = defaultdict(lambda: deque(maxlen=self.MAX_SAMPLES))
+        self._totals: Dict[Tuple, List[float]] = defaultdict(lambda: [0, 0.0])
+        self._counters: Dict[Tuple, float] = defaultdict(float)
+        self._gauges: Dict[Tuple, float] = {}
+        self._jsonl_path = os.getenv("METRICS_JSONL_PATH")
+
+    @staticmethod
+    def _key(name: str, labels: Dict) -> Tuple:
+        return (name, tuple(sorted((k, str(v)) for k, v in labels.items())))
+
+    def observe(self, name: str, seconds: float, **labels):
+        """Record one duration sample"""
+        key = self._key(name, labels)
+        with self._lock:
+            self._samples[key].append(seconds)
+            total = self._totals[key]
+            total[0] += 1
+            total[1] += seconds
+        self._write_jsonl({"type": "span", "name": name, "seconds": round(seconds, 6), **labels})
+
+    def incr(self, name: str, value: float = 1, **labels):
+        """Increment a counter (e.g. fallbacks, key rotations)"""
+        with self._lock:
+            self._counters[self._key(name, labels)] += value
+        self._write_jsonl({"type": "counter", "name": name, "value": value, **labels})
+
+    def set_gauge(self, name: str, value: float, **labels):
+        """Set a point-in-time value"""
+        with self._lock:
+            self._gauges[self._key(name, labels)] = value
+
+    @contextmanager
+    def span(self, name: str, **labels) -> Iterator[Dict]:
+        """
+        Time a block of code
+        Yields a dict of labels so the block can add outcome details
+        """
+        extra: Dict = {}
+        start = time.perf_counter()
+        status = "ok"
+        try:
+            yield extra
+        except BaseException:
+            status = "error"
+            raise
+        finally:
+            labels.update(extra)
+            labels.setdefault("status", status)
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def timed(self, name: str, **labels):
+        """Decorator form of span()"""
+        def decorator(func):
+            def wrapper(*args, **kwargs):
+                with self.span(name, **labels):
+                    return func(*args, **kwargs)
+            wrapper.__name__ = func.__name__
+            wrapper.__doc__ = func.__doc__
+            wrapper.__wrapped__ = func
+            return wrapper
+        return decorator
+
+    def summary(self) -> List[Dict]:
+        """Aggregated view of every span series"""
+        with self._lock:
+            snapshot = [(k, list(v), list(self._totals[k])) for k, v in self._samples.items()]
+        rows = []
+        for (name, labels), values, (count, total) in snapshot:
+            rows.append({
+                "name": name,
+                "labels": dict(labels),
+                "count": int(count),
+                "sum": total,
+                "p50": percentile(values, 50),
+                "p95": percentile(values, 95),
+                "p99": percentile(values, 99),
+            })
+        return sorted(rows, key=lambda r: (r["name"], sorted(r["labels"].items())))
+
+    def samples_matching(self, name: str, **labels) -> List[float]:
+        """Recent samples across all series of `name` whose labels include `labels`"""
+        wanted = {k: str(v) for k, v in labels.items()}
+        values: List[float] = []
+        with self._lock:
+            for (series, series_labels), samples in self._samples.items():
+                label_map = dict(series_labels)
+                if series == name and all(label_map.get(k) == v for k, v in wanted.items()):
+                    values.extend(samples)
+        return values
+
+    def counters(self) -> List[Dict]:
+        with self._lock:
+            items = list(self._counters.items())
+        return [{"name": n, "labels": dict(l), "value": v} for (n, l), v in sorted(items)]
+
+    def gauges(self) -> List[Dict]:
+        with self._lock:
+            items = list(self._gauges.items())
+        return [{"name": n, "labels": dict(l), "value": v} for (n, l), v in sorted(items)]
+
+    # ========== EXPORTERS ==========
+
+    @staticmethod
+    def _format_labels(labels: Dict) -> str:
+        if not labels:
+            return ""
+        parts = []
+        for k, v in sorted(labels.items()):
+            v = str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", " ")
+            parts.append(f'{k}="{v}"')
+        return "{" + ",".join(parts) + "}"
+
+    def export_prometheus(self) -> str:
+        """Prometheus text exposition format"""
+        lines = []
+        seen_types = set()
+
+        for row in self.summary():
+            metric = f"{row['name']}_seconds"
+            if metric not in seen_types:
+                lines.append(f"# TYPE {metric} summary")
+                seen_types.add(metric)
+            for q in ("p50", "p95", "p99"):
+                quantile = {"p50": "0.5", "p95": "0.95", "p99": "0.99"}[q]
+                labels = self._format_labels({**row["labels"], "quantile": quantile})
+                lines.append(f"{metric}{labels} {row[q]:.6f}")
+            labels = self._format_labels(row["labels"])
+            lines.append(f"{metric}_count{labels} {row['count']}")
+            lines.append(f"{metric}_sum{labels} {row['sum']:.6f}")
+
+        for row in self.counters():
+            metric = f"{row['name']}_total"
+            if metric not in seen_types:
+                lines.append(f"# TYPE {metric} counter")
+                seen_types.add(metric)
+            lines.append(f"{metric}{self._format_labels(row['labels'])} {row['value']:g}")
+
+        for row in self.gauges():
+            metric = row["name"]
+            if metric not in seen_types:
+                lines.append(f"# TYPE {metric} gauge")
+                seen_types.add(metric)
+            lines.append(f"{metric}{self._format_labels(row['labels'])} {row['value']:g}")
+
+        return "\n".join(lines) + "\n"
+
+    def export_json_lines(self) -> str:
+        """One JSON object per aggregated series"""
+        rows = [{"type": "summary", **r} for r in self.summary()]
+        rows += [{"type": "counter", **r} for r in self.counters()]
+        rows += [{"type": "gauge", **r} for r in self.gauges()]
+        return "\n".join(json.dumps(r) for r in rows) + "\n"
+
+    def _write_jsonl(self, event: Dict):
+        """Append raw events to METRICS_JSONL_PATH when configured"""
+        if not self._jsonl_path:
+            return
+        event["ts"] = round(time.time(), 3)
+        try:
+            with self._lock:
+                with open(self._jsonl_path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(event) + "\n")
+        except OSError:
+            pass
+
+    def reset(self):
+        with self._lock:
+            self._samples.clear()
+            self._totals.clear()
+            self._counters.clear()
+            self._gauges.clear()
+
+
+# ✅ Process-wide registry shared by every Streamlit session
+metrics = MetricsRegistry()
+
+_server_lock = threading.Lock()
+_server: Optional[ThreadingHTTPServer] = None
+
+
+def start_metrics_server(port: Optional[int] = None) -> bool:
+    """
+    Serve /metrics (Prometheus) and /metrics.jsonl on a background thread
+    Enabled via METRICS_PORT; safe to call on every Streamlit rerun
+    """
+    global _server
+    if port is None:
+        port = int(os.getenv("METRICS_PORT", "0") or 0)
+    if not port:
+        return False
+
+    with _server_lock:
+        if _server is not None:
+            return True
+
+        class _Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.startswith("/metrics.jsonl"):
+                    body, ctype = metrics.export_json_lines(), "application/x-ndjson"
+                elif self.path.startswith("/metrics"):
+                    body, ctype = metrics.export_prometheus(), "text/plain; version=0.0.4"
+                else:
+                    self.send_response(404)
+                    self.end_headers()
+                    return
+                data = body.encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", ctype)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        try:
+            _server = ThreadingHTTPServer(("0.0.0.0", port), _Handler)
+        except OSError:
+            return False
+        threading.Thread(target=_server.serve_forever, daemon=True, name="metrics-http").start()
+        return True
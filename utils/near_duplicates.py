@@ -0,0 +1,148 @@
+"""
+Near-Duplicate Index - MinHash signatures over shingled question text + options
+The question stem and the options get separate MinHash permutations (the stem
+most of them), so two different questions that share four options are not merged.
+LSH banding makes each lookup roughly constant time regardless of index size.
+"""
+
+import os
+import re
+import zlib
+from typing import Dict, Hashable, List, Optional, Set, Tuple
+
+import numpy as np
+
+from utils.chunk_selector import ChunkSelector
+
+# Mersenne prime 2^31 - 1: a * x + b stays below 2^63, so uint64 math never overflows
+_PRIME = np.uint64((1 << 31) - 1)
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+class NearDuplicateIndex:
+    """Jaccard-similarity index for quiz questions (MinHash + LSH buckets)"""
+
+    NUM_PERM = 128
+    SHINGLE_SIZE = 4          # character n-grams: robust to small rewordings
+    DEFAULT_THRESHOLD = 0.75
+
+    # Share of permutations spent on the stem: similarity ~ 0.75 x stem + 0.25 x options
+    STEM_WEIGHT = 0.75
+
+    def __init__(self, threshold: Optional[float] = None, num_perm: int = NUM_PERM,
+                 shingle_size: int = SHINGLE_SIZE, seed: int = 1):
+        if threshold is None:
+            threshold = float(os.getenv("QUIZ_DEDUP_THRESHOLD", self.DEFAULT_THRESHOLD))
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self.stem_perm = round(num_perm * self.STEM_WEIGHT)
+        self.bands, self.rows = self.choose_bands(num_perm, threshold)
+
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, int(_PRIME), size=num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, int(_PRIME), size=num_perm, dtype=np.uint64)
+
+        self._signatures: Dict[Hashable, np.ndarray] = {}
+        self._buckets: List[Dict[bytes, Set[Hashable]]] = [{} for _ in range(self.bands)]
+
+    def __len__(self) -> int:
+        return len(self._signatures)
+
+    @staticmethod
+    def choose_bands(num_perm: int, threshold: float) -> Tuple[int, int]:
+        """
+        Pick (bands, rows) whose LSH S-curve midpoint (1/b)^(1/r) sits just below
+        the threshold, so true matches are rarely missed
+        """
+        best = (num_perm, 1)
+        best_gap = float("inf")
+        for rows in range(1, num_perm + 1):
+            if num_perm % rows:
+                continue
+            bands = num_perm // rows
+            midpoint = (1 / bands) ** (1 / rows)
+            gap = threshold - midpoint
+            if 0 <= gap < best_gap:
+                best, best_gap = (bands, rows), gap
+        return best
+
+    # ========== SIGNATURES ==========
+
+    @staticmethod
+    def stem_terms(question: Dict) -> List[str]:
+        """Content words of the question stem, sorted ('What is X used for?' == 'X is used for what?')"""
+        words = _WORD.findall(str(question.get('question', '')).lower())
+        return sorted({w for w in words if w not in ChunkSelector.STOPWORDS})
+
+    @staticmethod
+    def option_text(question: Dict) -> str:
+        """Lowercased option words in sorted order (option order does not matter)"""
+        options = sorted(" ".join(_WORD.findall(str(o).lower())) for o in question.get('options') or [])
+        return " | ".join(options)
+
+    def _grams(self, text: str) -> Set[int]:
+        k = self.shingle_size
+        grams = {text[i:i + k] for i in range(max(1, len(text) - k + 1))}
+        return {zlib.crc32(g.encode("utf-8")) for g in grams if g.strip(" |")}
+
+    def shingles(self, question: Dict) -> Tuple[Set[int], Set[int]]:
+        """(stem shingles, option shingles): hashed character n-grams of each stem word / the options"""
+        stem: Set[int] = set()
+        for word in self.stem_terms(question):
+            stem |= self._grams(f" {word} ")
+        return stem, self._grams(self.option_text(question))
+
+    def _minhash(self, shingles: Set[int], a: np.ndarray, b: np.ndarray) -> np.ndarray:
+        """Per permutation, min of (a*x + b) mod p over the shingles"""
+        hashes = np.fromiter(shingles, dtype=np.uint64)
+        if hashes.size == 0:
+            return np.full(len(a), _PRIME, dtype=np.uint64)
+        hashes %= _PRIME
+        permuted = (np.outer(a, hashes) + b[:, None]) % _PRIME
+        return permuted.min(axis=1)
+
+    def signature(self, question: Dict) -> np.ndarray:
+        """MinHash signature: stem permutations first, then option permutations"""
+        stem, options = self.shingles(question)
+        n = self.stem_perm
+        return np.concatenate([self._minhash(stem, self._a[:n], self._b[:n]),
+                               self._minhash(options, self._a[n:], self._b[n:])])
+
+    def _band_keys(self, signature: np.ndarray) -> List[bytes]:
+        return [signature[i * self.rows:(i + 1) * self.rows].tobytes() for i in range(self.bands)]
+
+    @staticmethod
+    def similarity(sig_a: np.ndarray, sig_b: np.ndarray) -> float:
+        """Estimated stem-weighted Jaccard similarity of two signatures"""
+        return float(np.mean(sig_a == sig_b))
+
+    # ========== INDEX ==========
+
+    def query(self, question: Dict, signature: Optional[np.ndarray] = None) -> Optional[Tuple[Hashable, float]]:
+        """Best (key, similarity) at or above the threshold, or None"""
+        sig = self.signature(question) if signature is None else signature
+        candidates: Set[Hashable] = set()
+        for bucket, band_key in zip(self._buckets, self._band_keys(sig)):
+            candidates |= bucket.get(band_key, set())
+
+        best = None
+        for key in candidates:
+            score = self.similarity(sig, self._signatures[key])
+            if score >= self.threshold and (best is None or score > best[1]):
+                best = (key, score)
+        return best
+
+    def add(self, key: Hashable, question: Dict, signature: Optional[np.ndarray] = None):
+        sig = self.signature(question) if signature is None else signature
+        self._signatures[key] = sig
+        for bucket, band_key in zip(self._buckets, self._band_keys(sig)):
+            bucket.setdefault(band_key, set()).add(key)
+
+    def add_if_new(self, key: Hashable, question: Dict) -> bool:
+        """Insert unless a near-duplicate is already indexed. Returns True if inserted"""
+        sig = self.signature(question)
+        if self.query(question, sig) is not None:
+            return False
+        self.add(key, question, sig)
+        return True
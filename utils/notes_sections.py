@@ -0,0 +1,49 @@
+"""
+Notes Sections - The fixed notes structure shared by AI and offline notes
+Split / rebuild a notes document by its "## " section headings.
+"""
+
+import re
+from typing import Dict, List
+
+# Fixed notes structure: (heading, guidance shown to the model)
+SECTIONS = [
+    ("🎯 Core Concept",           "[Main idea/theme in 1-2 sentences]"),
+    ("📚 Key Concepts Explained", "[Detailed explanation of main concepts - not summary]"),
+    ("🔍 Important Insights",     "[Key insights and deeper understanding points]"),
+    ("💡 Practical Takeaways",    "[What viewers should remember/apply]"),
+    ("🎓 Why This Matters",       "[Broader significance and relevance]"),
+]
+
+
+def heading_key(line: str) -> str:
+    """Normalize a heading for matching (drop emoji, #, case)"""
+    return re.sub(r"[^a-z ]", "", line.lower()).strip()
+
+
+def split_sections(notes: str) -> Dict[str, str]:
+    """
+    Split notes into {heading: body} using the fixed SECTIONS headings
+    Text before the first known heading is kept under ""
+    """
+    known = {heading_key(h): h for h, _ in SECTIONS}
+    sections: Dict[str, List[str]] = {"": []}
+    current = ""
+    for line in notes.split("\n"):
+        if line.startswith("## "):
+            heading = known.get(heading_key(line[3:]))
+            if heading:
+                current = heading
+                sections.setdefault(current, [])
+                continue
+        sections.setdefault(current, []).append(line)
+    return {k: "\n".join(v).strip() for k, v in sections.items()}
+
+
+def join_sections(sections: Dict[str, str]) -> str:
+    """Rebuild the notes document in the fixed section order"""
+    parts = [sections[""]] if sections.get("") else []
+    for heading, _ in SECTIONS:
+        if heading in sections:
+            parts.append(f"## {heading}\n{sections[heading]}")
+    return "\n\n".join(parts)
@@ -0,0 +1,41 @@
+"""
+Output Budget - max_output_tokens sized to the request instead of the model maximum
+Per-unit costs (tokens per quiz question / notes section) are learned from the token ledger.
+"""
+
+import math
+from typing import Dict
+
+from utils.metrics import metrics
+from utils.token_ledger import token_ledger
+
+
+class OutputBudget:
+    """Budget = overhead + units x p90(tokens per unit) x headroom, clamped to the model cap"""
+
+    # Starting point before the ledger has enough samples (measured on typical videos)
+    DEFAULT_PER_UNIT: Dict[str, int] = {"quiz": 170, "notes": 280, "notes_chunk": 260, "qa": 350}
+
+    # Fixed tokens per response (JSON brackets / intro line)
+    OVERHEAD = 64
+
+    # Margin over the p90 so a long-but-normal answer is not cut off
+    HEADROOM = 1.3
+
+    MIN_SAMPLES = 5
+    MIN_TOKENS = 256
+
+    @staticmethod
+    def per_unit(kind: str) -> float:
+        """Learned p90 output tokens per unit, or the default while history is thin"""
+        learned = token_ledger.output_per_unit(kind, pct=90, min_samples=OutputBudget.MIN_SAMPLES)
+        return learned if learned is not None else OutputBudget.DEFAULT_PER_UNIT[kind]
+
+    @staticmethod
+    def tokens(kind: str, units: int, model_cap: int) -> int:
+        """max_output_tokens for a request of `units` questions/sections/answers"""
+        per_unit = OutputBudget.per_unit(kind)
+        budget = math.ceil(OutputBudget.OVERHEAD + max(units, 1) * per_unit * OutputBudget.HEADROOM)
+        budget = max(OutputBudget.MIN_TOKENS, min(budget, model_cap))
+        metrics.set_gauge("output_budget_per_unit", per_unit, kind=kind)
+        return budget
@@ -12,6 +12,8 @@ from io import BytesIO
 from datetime import datetime
 import re
 
+from utils.metrics import metrics
+
 class PDFGenerator:
     
     @staticmethod
@@ -23,6 +25,7 @@ class PDFGenerator:
         return text
     
     @staticmethod
+    @metrics.timed("generate_notes_pdf")
     def generate_notes_pdf(notes_content, video_url="", video_id=""):
         """Generate PDF from notes"""
         buffer = BytesIO()
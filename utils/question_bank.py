@@ -0,0 +1,160 @@
+"""
+Question Bank - Persistent per-video store of validated quiz questions
+Quizzes are assembled from the bank first; the model is only called for the shortfall.
+"""
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, Optional
+
+from utils.metrics import metrics
+from utils.near_duplicates import NearDuplicateIndex
+
+DEFAULT_BANK_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                 "data", "question_bank.db")
+
+
+class QuestionBank:
+    """SQLite-backed bank indexed by (video_id, difficulty) with per-user seen tracking"""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS questions (
+            id          INTEGER PRIMARY KEY AUTOINCREMENT,
+            video_id    TEXT NOT NULL,
+            difficulty  TEXT NOT NULL,
+            qhash       TEXT NOT NULL,
+            payload     TEXT NOT NULL,
+            created_at  REAL NOT NULL,
+            UNIQUE (video_id, qhash)
+        );
+        CREATE INDEX IF NOT EXISTS idx_questions_video_difficulty
+            ON questions (video_id, difficulty);
+        CREATE TABLE IF NOT EXISTS seen (
+            user_id     TEXT NOT NULL,
+            question_id INTEGER NOT NULL,
+            seen_at     REAL NOT NULL,
+            PRIMARY KEY (user_id, question_id)
+        );
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.getenv("QUESTION_BANK_PATH", DEFAULT_BANK_PATH)
+        self._lock = threading.Lock()
+        self._indexes: Dict[str, NearDuplicateIndex] = {}  # video_id -> near-duplicate index
+        if self.path != ":memory:":
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.executescript(self.SCHEMA)
+        self._conn.commit()
+
+    @staticmethod
+    def question_hash(question: Dict) -> str:
+        """Stable hash of the normalized question text (exact-duplicate key)"""
+        text = re.sub(r"\W+", " ", str(question.get('question', '')).lower()).strip()
+        return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+    def _index_for(self, video_id: str) -> NearDuplicateIndex:
+        """Near-duplicate index for a video, rebuilt from SQLite on first use (call under lock)"""
+        index = self._indexes.get(video_id)
+        if index is None:
+            index = NearDuplicateIndex()
+            rows = self._conn.execute(
+                "SELECT qhash, payload FROM questions WHERE video_id = ?", (video_id,)
+            ).fetchall()
+            for qhash, payload in rows:
+                index.add(qhash, json.loads(payload))
+            self._indexes[video_id] = index
+        return index
+
+    def add_questions(self, video_id: str, difficulty: str, questions: Iterable[Dict]) -> int:
+        """Store validated questions; exact and near duplicates are ignored. Returns number inserted"""
+        now = time.time()
+        with self._lock:
+            index = self._index_for(video_id)
+            rows = []
+            for q in questions:
+                qhash = self.question_hash(q)
+                if not index.add_if_new(qhash, q):
+                    metrics.incr("quiz_near_duplicates_dropped", stage="bank")
+                    continue
+                payload = {k: v for k, v in q.items() if k not in ("id", "bank_id")}
+                rows.append((video_id, difficulty, qhash, json.dumps(payload), now))
+            if not rows:
+                return 0
+            before = self._conn.total_changes
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO questions (video_id, difficulty, qhash, payload, created_at) "
+                "VALUES (?, ?, ?, ?, ?)", rows
+            )
+            self._conn.commit()
+            inserted = self._conn.total_changes - before
+        metrics.incr("question_bank_inserted", inserted)
+        return inserted
+
+    def draw(self, video_id: str, difficulty: str, count: int,
+             user_id: Optional[str] = None) -> List[Dict]:
+        """Random questions for this video/difficulty that user_id has not seen yet"""
+        if count <= 0:
+            return []
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT q.id, q.payload FROM questions q "
+                "WHERE q.video_id = ? AND q.difficulty = ? "
+                "AND NOT EXISTS (SELECT 1 FROM seen s WHERE s.user_id = ? AND s.question_id = q.id) "
+                "ORDER BY RANDOM() LIMIT ?",
+                (video_id, difficulty, user_id or "", count)
+            ).fetchall()
+
+        questions = []
+        for bank_id, payload in rows:
+            q = json.loads(payload)
+            q['bank_id'] = bank_id
+            questions.append(q)
+        metrics.incr("question_bank_served", len(questions))
+        return questions
+
+    def bank_ids(self, video_id: str, questions: Iterable[Dict]) -> List[int]:
+        """Look up bank ids for questions by their hash"""
+        hashes = [self.question_hash(q) for q in questions]
+        if not hashes:
+            return []
+        placeholders = ",".join("?" * len(hashes))
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT id FROM questions WHERE video_id = ? AND qhash IN ({placeholders})",
+                (video_id, *hashes)
+            ).fetchall()
+        return [r[0] for r in rows]
+
+    def mark_seen(self, user_id: str, question_ids: Iterable[int]):
+        now = time.time()
+        rows = [(user_id, qid, now) for qid in question_ids if qid is not None]
+        if not user_id or not rows:
+            return
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO seen (user_id, question_id, seen_at) VALUES (?, ?, ?)", rows
+            )
+            self._conn.commit()
+
+    def count(self, video_id: str, difficulty: Optional[str] = None) -> int:
+        with self._lock:
+            if difficulty:
+                row = self._conn.execute(
+                    "SELECT COUNT(*) FROM questions WHERE video_id = ? AND difficulty = ?",
+                    (video_id, difficulty)
+                ).fetchone()
+            else:
+                row = self._conn.execute(
+                    "SELECT COUNT(*) FROM questions WHERE video_id = ?", (video_id,)
+                ).fetchone()
+        return row[0]
+
+
+# ✅ Process-wide bank shared by every Streamlit session
+question_bank = QuestionBank()
@@ -0,0 +1,71 @@
+"""
+Summary Cache - Persistent summaries keyed by content hash
+A summary is stored under (kind, key) where key hashes the exact input and the
+prompt version, so unchanged content is never summarized twice — across
+videos, re-uploads and server restarts.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, Optional
+
+from utils.metrics import metrics
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                  "data", "summaries.db")
+
+
+class SummaryCache:
+    """SQLite-backed (kind, key) -> summary text"""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS summaries (
+            kind        TEXT NOT NULL,
+            key         TEXT NOT NULL,
+            summary     TEXT NOT NULL,
+            created_at  REAL NOT NULL,
+            PRIMARY KEY (kind, key)
+        );
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.getenv("SUMMARY_CACHE_PATH", DEFAULT_CACHE_PATH)
+        self._lock = threading.Lock()
+        if self.path != ":memory:":
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.executescript(self.SCHEMA)
+        self._conn.commit()
+
+    def get_many(self, kind: str, keys: Iterable[str]) -> Dict[str, str]:
+        """Cached summaries for the keys that have one"""
+        keys = list(dict.fromkeys(keys))
+        if not keys:
+            return {}
+        placeholders = ",".join("?" * len(keys))
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT key, summary FROM summaries WHERE kind = ? AND key IN ({placeholders})",
+                (kind, *keys)
+            ).fetchall()
+        found = dict(rows)
+        metrics.incr("summary_cache_hits", len(found), kind=kind)
+        metrics.incr("summary_cache_misses", len(keys) - len(found), kind=kind)
+        return found
+
+    def get(self, kind: str, key: str) -> Optional[str]:
+        return self.get_many(kind, [key]).get(key)
+
+    def put(self, kind: str, key: str, summary: str):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO summaries (kind, key, summary, created_at) VALUES (?, ?, ?, ?)",
+                (kind, key, summary, time.time())
+            )
+            self._conn.commit()
+
+
+# ✅ Process-wide cache shared by every Streamlit session
+summary_cache = SummaryCache()
@@ -0,0 +1,183 @@
+"""
+Token Ledger - Token accounting for every Gemini call
+Aggregates prompt/response tokens per day, model, key, video and feature
+"""
+
+import json
+import math
+import os
+import re
+import threading
+from collections import defaultdict, deque
+from datetime import date
+from typing import Dict, List, Optional
+
+from utils.metrics import metrics, percentile
+
+DEFAULT_LEDGER_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                   "data", "token_usage.jsonl")
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap local estimate (~4 chars per token for English)"""
+    return int(math.ceil(len(text) / 4.0)) if text else 0
+
+
+def parse_daily_limit(limit: str) -> Optional[int]:
+    """'1000/day' -> 1000 (requests per day)"""
+    match = re.match(r"\s*(\d+)\s*/\s*day", limit or "")
+    return int(match.group(1)) if match else None
+
+
+class TokenLedger:
+    """Thread-safe usage store, persisted as JSON lines so restarts keep today's totals"""
+
+    FIELDS = ("requests", "prompt_tokens", "output_tokens", "cached_tokens")
+
+    # Recent output-tokens-per-unit samples kept per unit kind ("quiz", "notes")
+    UNIT_SAMPLES = 200
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path if path is not None else os.getenv("TOKEN_LEDGER_PATH", DEFAULT_LEDGER_PATH)
+        self._lock = threading.Lock()
+        self._rows: Dict[tuple, Dict[str, int]] = defaultdict(lambda: {f: 0 for f in self.FIELDS})
+        self._per_unit: Dict[str, deque] = defaultdict(lambda: deque(maxlen=self.UNIT_SAMPLES))
+        self._load_today()
+
+    def _load_today(self):
+        """Today's totals, plus per-unit samples from any day"""
+        if not self.path or not os.path.exists(self.path):
+            return
+        today = date.today().isoformat()
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        event = json.loads(line)
+                    except ValueError:
+                        continue
+                    if event.get("day") == today:
+                        self._add(event)
+                    self._add_unit_sample(event)
+        except OSError:
+            pass
+
+    def _add(self, event: Dict):
+        key = (event["day"], event["model"], event["key"], event.get("video_id") or "-", event["feature"])
+        row = self._rows[key]
+        for field in self.FIELDS:
+            row[field] += int(event.get(field, 0) or 0)
+
+    def _add_unit_sample(self, event: Dict):
+        units = event.get("units") or 0
+        if event.get("unit_kind") and units > 0 and event.get("output_tokens"):
+            self._per_unit[event["unit_kind"]].append(event["output_tokens"] / units)
+
+    def record(self, model: str, key: str, feature: str, prompt_tokens: int,
+               output_tokens: int, video_id: Optional[str] = None, cached_tokens: int = 0,
+               requests: int = 1, unit_kind: Optional[str] = None, units: int = 0):
+        """Add one call's usage (units: questions/sections requested, for output budgets)"""
+        event = {
+            "day": date.today().isoformat(),
+            "model": model,
+            "key": key,
+            "video_id": video_id or "-",
+            "feature": feature,
+            "requests": requests,
+            "prompt_tokens": int(prompt_tokens or 0),
+            "output_tokens": int(output_tokens or 0),
+            "cached_tokens": int(cached_tokens or 0),
+        }
+        if unit_kind and units:
+            event["unit_kind"] = unit_kind
+            event["units"] = int(units)
+        with self._lock:
+            self._add(event)
+            self._add_unit_sample(event)
+            if self.path:
+                try:
+                    os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                    with open(self.path, "a", encoding="utf-8") as f:
+                        f.write(json.dumps(event) + "\n")
+                except OSError:
+                    pass
+
+        metrics.incr("gemini_requests", requests, model=model, key=key, feature=feature)
+        metrics.incr("gemini_prompt_tokens", event["prompt_tokens"], model=model, key=key, feature=feature)
+        metrics.incr("gemini_output_tokens", event["output_tokens"], model=model, key=key, feature=feature)
+
+    def record_response(self, response, model: str, key: str, feature: str,
+                        prompt: str = "", video_id: Optional[str] = None,
+                        unit_kind: Optional[str] = None, units: int = 0):
+        """
+        Record usage from response.usage_metadata, estimating locally when it is missing
+        Thought tokens count as output: they are billed as output and use up max_output_tokens
+        """
+        usage = getattr(response, "usage_metadata", None)
+        prompt_tokens = getattr(usage, "prompt_token_count", None)
+        output_tokens = getattr(usage, "candidates_token_count", None)
+        cached_tokens = getattr(usage, "cached_content_token_count", None) or 0
+
+        if prompt_tokens is None:
+            prompt_tokens = estimate_tokens(prompt)
+        if output_tokens is None:
+            output_tokens = estimate_tokens(getattr(response, "text", "") or "")
+        output_tokens += getattr(usage, "thoughts_token_count", None) or 0
+
+        self.record(model, key, feature, prompt_tokens, output_tokens,
+                    video_id=video_id, cached_tokens=cached_tokens,
+                    unit_kind=unit_kind, units=units)
+
+    # ========== QUERIES ==========
+
+    def rows(self, day: Optional[str] = None) -> List[Dict]:
+        """Flat usage rows for one day (default: today)"""
+        day = day or date.today().isoformat()
+        with self._lock:
+            items = [(k, dict(v)) for k, v in self._rows.items() if k[0] == day]
+        return [
+            {"day": k[0], "model": k[1], "key": k[2], "video_id": k[3], "feature": k[4], **v}
+            for k, v in sorted(items)
+        ]
+
+    def totals(self, group_by: tuple = ("model", "key"), day: Optional[str] = None) -> List[Dict]:
+        """Aggregate today's rows by any subset of model/key/video_id/feature"""
+        grouped: Dict[tuple, Dict[str, int]] = defaultdict(lambda: {f: 0 for f in self.FIELDS})
+        for row in self.rows(day):
+            bucket = grouped[tuple(row[g] for g in group_by)]
+            for field in self.FIELDS:
+                bucket[field] += row[field]
+        return [{**dict(zip(group_by, k)), **v} for k, v in sorted(grouped.items())]
+
+    def output_per_unit(self, unit_kind: str, pct: float = 90, min_samples: int = 5) -> Optional[float]:
+        """Percentile of output tokens per question/section over recent calls"""
+        with self._lock:
+            samples = list(self._per_unit.get(unit_kind, ()))
+        if len(samples) < min_samples:
+            return None
+        return percentile(samples, pct)
+
+    def requests_today(self, model: str, key: Optional[str] = None) -> int:
+        return sum(r["requests"] for r in self.rows()
+                   if r["model"] == model and (key is None or r["key"] == key))
+
+    def quota_report(self, models: List[Dict], keys: List[str]) -> List[Dict]:
+        """Daily request consumption against the limits declared in a `models` list"""
+        report = []
+        for model_info in models:
+            limit = parse_daily_limit(model_info.get("limit", ""))
+            for key in keys:
+                used = self.requests_today(model_info["name"], key)
+                report.append({
+                    "model": model_info["name"],
+                    "key": key,
+                    "requests": used,
+                    "limit": limit,
+                    "remaining": (limit - used) if limit is not None else None,
+                    "used_pct": round(100.0 * used / limit, 1) if limit else None,
+                })
+        return report
+
+
+# ✅ Process-wide ledger shared by every Streamlit session
+token_ledger = TokenLedger()
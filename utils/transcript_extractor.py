@@ -5,14 +5,45 @@ EXACT COPY from working reference project
 
 from youtube_transcript_api import YouTubeTranscriptApi
 import re
-from typing import Optional, Tuple
+import requests
+from typing import Dict, List, Optional, Tuple
+
+from utils.deadline import Deadline
+from utils.metrics import metrics
+from utils.transcript_normalizer import TranscriptNormalizer
+
+
+class _DeadlineSession(requests.Session):
+    """HTTP session whose every request checks the deadline and fits its timeout into it"""
+
+    def __init__(self, deadline: Deadline, cap: float):
+        super().__init__()
+        self._deadline = deadline
+        self._cap = cap
+
+    def request(self, *args, **kwargs):
+        self._deadline.check("transcript_fetch")
+        kwargs["timeout"] = self._deadline.timeout(self._cap)
+        return super().request(*args, **kwargs)
+
 
 class TranscriptExtractor:
     """Handles YouTube transcript extraction"""
+
+    # Upper bound per HTTP request; a request deadline can only shorten it
+    HTTP_TIMEOUT_SECONDS = 10
+
+    # Title get_video_metadata returns when YouTube gave none (format with video_id)
+    FALLBACK_TITLE = "YouTube Video ({video_id})"
     
     @staticmethod
     def extract_video_id(url: str) -> Optional[str]:
         """Extract video ID from YouTube URL - EXACT from working project"""
+        # watch?v=... (also inside playlist URLs) — the query string is stripped below
+        match = re.search(r'[?&]v=([0-9A-Za-z_-]{11})', url)
+        if match:
+            return match.group(1)
+
         # Remove any extra parameters first
         url = url.split('&')[0].split('?')[0] if '?' in url else url
         
@@ -45,6 +76,39 @@ class TranscriptExtractor:
         
         return True, "Valid URL"
     
+    @staticmethod
+    def extract_playlist_id(url: str) -> Optional[str]:
+        """Playlist ID from a ...?list=... URL"""
+        match = re.search(r'[?&]list=([0-9A-Za-z_-]+)', url or "")
+        return match.group(1) if match else None
+
+    @staticmethod
+    @metrics.timed("playlist_fetch")
+    def get_playlist_video_ids(playlist_id: str,
+                               deadline: Optional[Deadline] = None) -> Tuple[List[str], Optional[str]]:
+        """
+        Video IDs of a public playlist in playlist order (first page, ~100 videos)
+        Read from the playlist page's embedded data, so no API key is needed
+        """
+        deadline = deadline or Deadline.current()
+        try:
+            deadline.check("playlist_fetch")
+            response = requests.get(
+                f"https://www.youtube.com/playlist?list={playlist_id}",
+                headers={"Accept-Language": "en-US,en;q=0.9"},
+                timeout=deadline.timeout(TranscriptExtractor.HTTP_TIMEOUT_SECONDS)
+            )
+            if response.status_code != 200:
+                return [], f"Playlist page returned HTTP {response.status_code}"
+            ids = re.findall(r'"playlistVideoRenderer":\{"videoId":"([0-9A-Za-z_-]{11})"', response.text)
+            ids = list(dict.fromkeys(ids))
+            if not ids:
+                return [], "No videos found — is the playlist public?"
+            return ids, None
+        except Exception as e:
+            metrics.incr("playlist_fetch_failures")
+            return [], f"Could not load playlist: {str(e)}"
+
     @staticmethod
     def get_video_metadata_simple(video_id: str) -> tuple:
         """
@@ -69,13 +133,15 @@ class TranscriptExtractor:
         except Exception as e:
             return None, str(e)
     @staticmethod
-    def get_video_metadata(video_id):
+    @metrics.timed("video_metadata")
+    def get_video_metadata(video_id, deadline: Optional[Deadline] = None):
         """Get video metadata like title, channel, views, etc."""
+        deadline = deadline or Deadline.current()
         try:
             # Method 1: Try YouTube oEmbed API
             url = f"https://www.youtube.com/oembed?url=https://www.youtube.com/watch?v={video_id}&format=json"
             
-            response = requests.get(url, timeout=10)
+            response = requests.get(url, timeout=deadline.timeout(TranscriptExtractor.HTTP_TIMEOUT_SECONDS))
             
             if response.status_code == 200:
                 data = response.json()
@@ -95,7 +161,8 @@ class TranscriptExtractor:
             
             # Method 2: Try scraping the page title
             page_url = f"https://www.youtube.com/watch?v={video_id}"
-            page_response = requests.get(page_url, timeout=10)
+            deadline.check("video_metadata")
+            page_response = requests.get(page_url, timeout=deadline.timeout(TranscriptExtractor.HTTP_TIMEOUT_SECONDS))
             
             if page_response.status_code == 200:
                 # Extract title from page HTML
@@ -120,8 +187,9 @@ class TranscriptExtractor:
                         return metadata, None
             
             # Fallback: Return basic metadata
+            metrics.incr("video_metadata_fallbacks", reason="no_title")
             return {
-                'title': f"YouTube Video ({video_id})",
+                'title': TranscriptExtractor.FALLBACK_TITLE.format(video_id=video_id),
                 'channel': 'Unknown',
                 'thumbnail': f"https://img.youtube.com/vi/{video_id}/maxresdefault.jpg",
                 'duration': 'N/A',
@@ -131,8 +199,9 @@ class TranscriptExtractor:
                 
         except Exception as e:
             # Return basic fallback
+            metrics.incr("video_metadata_fallbacks", reason="error")
             return {
-                'title': f"YouTube Video ({video_id})",
+                'title': TranscriptExtractor.FALLBACK_TITLE.format(video_id=video_id),
                 'channel': 'Unknown',
                 'thumbnail': f"https://img.youtube.com/vi/{video_id}/maxresdefault.jpg",
                 'duration': 'N/A',
@@ -143,20 +212,42 @@ class TranscriptExtractor:
 
 
     @staticmethod
-    def get_transcript(video_id: str) -> Tuple[Optional[str], Optional[str]]:
+    def get_transcript_segments(video_id: str,
+                                deadline: Optional[Deadline] = None) -> Tuple[Optional[List[Dict]], Optional[str]]:
         """
-        Get transcript - EXACT method from working reference project
+        Get raw caption segments ({'text', 'start', 'duration'})
+        Every HTTP request made by the caption client is bounded by the deadline
         """
-        try:
-            # EXACT API usage from working project
-            ytt_api = YouTubeTranscriptApi()
-            fetched_transcript = ytt_api.fetch(video_id)
-            
-            # Convert to raw data and format
-            raw_data = fetched_transcript.to_raw_data()
-            formatted_text = '\n'.join([entry['text'] for entry in raw_data])
-            
-            return formatted_text, None
-            
-        except Exception as e:
-            return None, f"No captions: {str(e)}"
+        deadline = deadline or Deadline.current()
+        with metrics.span("transcript_fetch") as span:
+            try:
+                # EXACT API usage from working project
+                ytt_api = YouTubeTranscriptApi(
+                    http_client=_DeadlineSession(deadline, TranscriptExtractor.HTTP_TIMEOUT_SECONDS)
+                )
+                fetched_transcript = ytt_api.fetch(video_id)
+                
+                # Convert to raw data
+                return fetched_transcript.to_raw_data(), None
+                
+            except Exception as e:
+                if deadline.expired():
+                    span["status"] = "cancelled" if deadline.cancelled else "timeout"
+                    return None, f"⏱️ {deadline.message()}"
+                span["status"] = "error"
+                metrics.incr("transcript_fetch_failures")
+                return None, f"No captions: {str(e)}"
+
+    @staticmethod
+    def get_transcript(video_id: str, deadline: Optional[Deadline] = None) -> Tuple[Optional[str], Optional[str]]:
+        """
+        Get normalized transcript text (noise markers, fillers and rolling-caption repeats removed)
+        """
+        raw_data, error = TranscriptExtractor.get_transcript_segments(video_id, deadline)
+        if error:
+            return None, error
+        
+        formatted_text, _ = TranscriptNormalizer.normalize(raw_data)
+        if not formatted_text:
+            return None, "No captions: transcript is empty after cleanup"
+        return formatted_text, None
@@ -0,0 +1,477 @@
+"""
+Transcript Index - Local full-text search over every transcript seen
+Positional inverted index (term -> video -> token positions) with caption
+timestamps, stored as immutable segment files that are merged like a binary
+counter as videos are added. Segments are flat NumPy arrays, so loading is a
+single read per file and queries touch only the postings they need.
+"""
+
+import heapq
+import json
+import os
+import re
+import struct
+import threading
+import zlib
+from collections import defaultdict
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from utils.chunk_selector import ChunkSelector
+from utils.metrics import metrics
+from utils.transcript_normalizer import TranscriptNormalizer
+
+DEFAULT_INDEX_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                  "data", "transcript_index")
+
+
+def index_term(token: str) -> str:
+    """Index key for a lowercased token: 'back-propagation' -> 'backpropagation', 'layers' -> 'layer'"""
+    term = token.replace("-", "").replace("'", "")
+    if len(term) > 4 and term.endswith("s") and not term.endswith("ss"):
+        term = term[:-1]
+    return term
+
+
+def indexable(token: str) -> bool:
+    return token not in ChunkSelector.STOPWORDS and len(token) > 2
+
+
+class IndexSegment:
+    """
+    Immutable index over a batch of videos
+    Postings: term_ptr -> (pair_doc, pair_ptr) -> positions. Captions: seg_ptr ->
+    (seg_pos, seg_time). Cleaned caption text is kept zlib-compressed per video for snippets.
+    """
+
+    MAGIC = b"TIX1"
+
+    ARRAYS = ("doc_len", "vocab", "term_ptr", "pair_doc", "pair_ptr", "positions",
+              "seg_ptr", "seg_pos", "seg_time", "text_ptr", "text")
+
+    def __init__(self, videos: List[str], titles: List[str], arrays: Dict[str, np.ndarray]):
+        self.videos = videos
+        self.titles = titles
+        for name in self.ARRAYS:
+            setattr(self, name, arrays[name])
+        self.terms = bytes(self.vocab).decode("utf-8").split("\n") if len(self.vocab) else []
+        self.term_ids = {t: i for i, t in enumerate(self.terms)}
+
+    def __len__(self) -> int:
+        return len(self.videos)
+
+    @property
+    def total_tokens(self) -> int:
+        return int(self.doc_len.sum())
+
+    # ========== BUILD ==========
+
+    @staticmethod
+    def tokenize_segments(segments: Sequence[Dict]) -> Tuple[List[str], List[int], List[float], List[str]]:
+        """
+        Caption segments -> (tokens, segment start positions, segment start times, segment texts)
+        Uses the normalizer's cleanup so [Music], fillers and rolling-caption repeats are not indexed
+        """
+        tokens: List[str] = []
+        seg_pos: List[int] = []
+        seg_time: List[float] = []
+        texts: List[str] = []
+        words: List[str] = []
+        for segment in segments:
+            new_words = TranscriptNormalizer._words(segment.get("text", ""))
+            k = TranscriptNormalizer._overlap(words, new_words)
+            new_words = new_words[k:]
+            if not new_words:
+                continue
+            words.extend(new_words)
+            text = " ".join(new_words)
+            seg_pos.append(len(tokens))
+            seg_time.append(float(segment.get("start", 0.0)))
+            texts.append(text)
+            tokens.extend(ChunkSelector.TOKEN_PATTERN.findall(text.lower()))
+        return tokens, seg_pos, seg_time, texts
+
+    @classmethod
+    def build(cls, video_id: str, title: str, segments: Sequence[Dict]) -> "IndexSegment":
+        """Single-video segment; larger segments come from merge()"""
+        tokens, seg_pos, seg_time, texts = cls.tokenize_segments(segments)
+        postings: Dict[str, List[int]] = defaultdict(list)
+        for position, token in enumerate(tokens):
+            if indexable(token):
+                postings[index_term(token)].append(position)
+
+        terms = sorted(postings)
+        lengths = [len(postings[t]) for t in terms]
+        positions = [p for t in terms for p in postings[t]]
+        text = zlib.compress("\n".join(texts).encode("utf-8"))
+        return cls([video_id], [title or video_id], {
+            "doc_len": np.array([len(tokens)], dtype=np.uint32),
+            "vocab": np.frombuffer("\n".join(terms).encode("utf-8"), dtype=np.uint8),
+            "term_ptr": np.arange(len(terms) + 1, dtype=np.int64),
+            "pair_doc": np.zeros(len(terms), dtype=np.uint32),
+            "pair_ptr": np.concatenate(([0], np.cumsum(lengths, dtype=np.int64))).astype(np.int64),
+            "positions": cls._narrow(np.array(positions, dtype=np.int64)),
+            "seg_ptr": np.array([0, len(seg_pos)], dtype=np.int64),
+            "seg_pos": np.array(seg_pos, dtype=np.uint32),
+            "seg_time": np.array(seg_time, dtype=np.float32),
+            "text_ptr": np.array([0, len(text)], dtype=np.int64),
+            "text": np.frombuffer(text, dtype=np.uint8),
+        })
+
+    @staticmethod
+    def _narrow(positions: np.ndarray) -> np.ndarray:
+        """uint16 positions when every video is shorter than 65k tokens (most lectures)"""
+        if not len(positions) or positions.max() < np.iinfo(np.uint16).max:
+            return positions.astype(np.uint16)
+        return positions.astype(np.uint32)
+
+    @classmethod
+    def merge(cls, parts: Sequence["IndexSegment"]) -> "IndexSegment":
+        """One segment holding every video of parts (vectorized re-sort of the postings)"""
+        terms = sorted(set().union(*(p.terms for p in parts)))
+        term_ids = {t: i for i, t in enumerate(terms)}
+
+        gterm, gdoc, starts, lengths, seg_pos, seg_time = [], [], [], [], [], []
+        doc_offset = position_offset = 0
+        for part in parts:
+            local_to_global = np.array([term_ids[t] for t in part.terms], dtype=np.int64)
+            pair_terms = np.repeat(np.arange(len(part.terms)), np.diff(part.term_ptr))
+            gterm.append(local_to_global[pair_terms])
+            gdoc.append(part.pair_doc.astype(np.int64) + doc_offset)
+            starts.append(part.pair_ptr[:-1] + position_offset)
+            lengths.append(np.diff(part.pair_ptr))
+            seg_pos.append(part.seg_pos)
+            seg_time.append(part.seg_time)
+            doc_offset += len(part)
+            position_offset += len(part.positions)
+
+        gterm, gdoc = np.concatenate(gterm), np.concatenate(gdoc)
+        starts, lengths = np.concatenate(starts), np.concatenate(lengths)
+        order = np.lexsort((gdoc, gterm))
+        lengths = lengths[order]
+        pair_ptr = np.concatenate(([0], np.cumsum(lengths))).astype(np.int64)
+        # Gather each pair's position run into its new place in one indexing pass
+        gather = np.repeat(starts[order] - pair_ptr[:-1], lengths) + np.arange(pair_ptr[-1])
+        positions = np.concatenate([p.positions.astype(np.uint32) for p in parts])[gather]
+
+        texts = [bytes(p.text[p.text_ptr[d]:p.text_ptr[d + 1]]) for p in parts for d in range(len(p))]
+        return cls(
+            [v for p in parts for v in p.videos], [t for p in parts for t in p.titles], {
+                "doc_len": np.concatenate([p.doc_len for p in parts]),
+                "vocab": np.frombuffer("\n".join(terms).encode("utf-8"), dtype=np.uint8),
+                "term_ptr": np.concatenate(([0], np.cumsum(np.bincount(gterm, minlength=len(terms))))
+                                           ).astype(np.int64),
+                "pair_doc": gdoc[order].astype(np.uint32),
+                "pair_ptr": pair_ptr,
+                "positions": cls._narrow(positions),
+                "seg_ptr": np.concatenate(([0], np.cumsum(np.concatenate([np.diff(p.seg_ptr) for p in parts])))
+                                          ).astype(np.int64),
+                "seg_pos": np.concatenate(seg_pos).astype(np.uint32),
+                "seg_time": np.concatenate(seg_time).astype(np.float32),
+                "text_ptr": np.concatenate(([0], np.cumsum([len(t) for t in texts]))).astype(np.int64),
+                "text": np.frombuffer(b"".join(texts), dtype=np.uint8),
+            })
+
+    # ========== ON-DISK FORMAT ==========
+    # MAGIC | uint32 header length | JSON header | 8-byte aligned raw arrays
+
+    def save(self, path: str):
+        layout, blobs, offset = {}, [], 0
+        for name in self.ARRAYS:
+            array = np.ascontiguousarray(getattr(self, name))
+            layout[name] = [array.dtype.str, offset, len(array)]
+            data = array.tobytes()
+            padding = -len(data) % 8
+            blobs.append(data + b"\0" * padding)
+            offset += len(data) + padding
+        header = json.dumps({"videos": self.videos, "titles": self.titles, "arrays": layout}).encode("utf-8")
+        header += b" " * (-(len(header) + 8) % 8)
+
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(self.MAGIC + struct.pack("<I", len(header)) + header)
+            for blob in blobs:
+                f.write(blob)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "IndexSegment":
+        """One read; arrays are zero-copy views of the file buffer"""
+        with open(path, "rb") as f:
+            buffer = f.read()
+        if buffer[:4] != cls.MAGIC:
+            raise ValueError(f"{path} is not a transcript index segment")
+        header_len = struct.unpack("<I", buffer[4:8])[0]
+        header = json.loads(buffer[8:8 + header_len])
+        base = 8 + header_len
+        arrays = {
+            name: np.frombuffer(buffer, dtype=np.dtype(dtype), count=count, offset=base + offset)
+            for name, (dtype, offset, count) in header["arrays"].items()
+        }
+        return cls(header["videos"], header["titles"], arrays)
+
+    # ========== LOOKUP ==========
+
+    def postings(self, term: str) -> Tuple[np.ndarray, np.ndarray]:
+        """(docs, pair indices) for a term; empty when absent"""
+        t = self.term_ids.get(term)
+        if t is None:
+            return np.empty(0, dtype=np.uint32), np.empty(0, dtype=np.int64)
+        return self.pair_doc[self.term_ptr[t]:self.term_ptr[t + 1]], np.arange(self.term_ptr[t], self.term_ptr[t + 1])
+
+    def positions_of(self, pair: int) -> np.ndarray:
+        return self.positions[self.pair_ptr[pair]:self.pair_ptr[pair + 1]].astype(np.int64)
+
+    def caption_at(self, doc: int, position: int) -> int:
+        """Index (within the video) of the caption segment holding a token position"""
+        starts = self.seg_pos[self.seg_ptr[doc]:self.seg_ptr[doc + 1]]
+        return max(int(np.searchsorted(starts, position, side="right")) - 1, 0)
+
+    def time_at(self, doc: int, caption: int) -> float:
+        return float(self.seg_time[self.seg_ptr[doc] + caption])
+
+    def captions(self, doc: int) -> List[str]:
+        return zlib.decompress(bytes(self.text[self.text_ptr[doc]:self.text_ptr[doc + 1]])).decode("utf-8").split("\n")
+
+
+class TranscriptIndex:
+    """Incrementally built, disk-backed search index over retained transcripts"""
+
+    # BM25
+    K1 = 1.2
+    B = 0.75
+
+    # Token span scored as one hit inside a video (~10-15 s of speech)
+    WINDOW_TOKENS = 30
+
+    MANIFEST = "manifest.json"
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path if path is not None else os.getenv("TRANSCRIPT_INDEX_PATH", DEFAULT_INDEX_PATH)
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()  # one add/merge at a time; searches never wait on it
+        self._segments: List[Tuple[str, IndexSegment]] = []  # (file name, segment), oldest first
+        self._videos = set()
+        self._next_id = 0
+        self._load()
+
+    # ========== PERSISTENCE ==========
+
+    def _load(self):
+        if not self.path:
+            return
+        manifest_path = os.path.join(self.path, self.MANIFEST)
+        if not os.path.exists(manifest_path):
+            return
+        with metrics.span("transcript_index_load"):
+            try:
+                with open(manifest_path, encoding="utf-8") as f:
+                    manifest = json.load(f)
+                for name in manifest["segments"]:
+                    self._segments.append((name, IndexSegment.load(os.path.join(self.path, name))))
+                self._next_id = manifest.get("next_id", len(self._segments))
+            except (OSError, ValueError, KeyError) as e:
+                # A broken index only costs search results; transcripts are re-added as they are fetched
+                metrics.incr("transcript_index_load_errors", reason=type(e).__name__)
+                self._segments = []
+        for _, segment in self._segments:
+            self._videos.update(segment.videos)
+        metrics.set_gauge("transcript_index_videos", len(self._videos))
+
+    def _write_manifest(self):
+        tmp_path = os.path.join(self.path, f"{self.MANIFEST}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"segments": [name for name, _ in self._segments], "next_id": self._next_id}, f)
+        os.replace(tmp_path, os.path.join(self.path, self.MANIFEST))
+
+    def _store(self, segment: IndexSegment) -> str:
+        """Persist a new segment and return its file name (call under the write lock)"""
+        name = f"seg_{self._next_id:08d}.tix"
+        self._next_id += 1
+        if self.path:
+            os.makedirs(self.path, exist_ok=True)
+            segment.save(os.path.join(self.path, name))
+        return name
+
+    # ========== INDEXING ==========
+
+    def __len__(self) -> int:
+        return len(self._videos)
+
+    def __contains__(self, video_id: str) -> bool:
+        return video_id in self._videos
+
+    def add(self, video_id: str, segments: Sequence[Dict], title: Optional[str] = None) -> bool:
+        """Index one video's caption segments. Returns False if it was already indexed"""
+        if not video_id or not segments or video_id in self._videos:
+            return False
+        with metrics.span("transcript_index_add"), self._write_lock:
+            if video_id in self._videos:
+                return False
+            segment = IndexSegment.build(video_id, title, segments)
+            stack = self._segments + [(self._store(segment), segment)]
+
+            # Binary-counter merging keeps ~log2(videos) segments with O(log n) rewrites per video.
+            # Searches keep using the old list until the merged one is swapped in
+            retired = []
+            while len(stack) > 1 and len(stack[-1][1]) >= len(stack[-2][1]):
+                (older_name, older), (newer_name, newer) = stack[-2:]
+                merged = IndexSegment.merge([older, newer])
+                stack[-2:] = [(self._store(merged), merged)]
+                retired += [older_name, newer_name]
+                metrics.incr("transcript_index_merges")
+
+            with self._lock:
+                self._segments = stack
+                self._videos.add(video_id)
+            if self.path:
+                self._write_manifest()
+                for name in retired:
+                    try:
+                        os.remove(os.path.join(self.path, name))
+                    except OSError:
+                        pass
+        metrics.set_gauge("transcript_index_videos", len(self._videos))
+        metrics.set_gauge("transcript_index_segments", len(self._segments))
+        return True
+
+    # ========== SEARCH ==========
+
+    @staticmethod
+    def parse_query(query: str) -> Tuple[List[str], List[List[Tuple[int, str]]]]:
+        """Loose terms and "quoted phrases" (each as (offset, term) pairs; stopwords keep their slot)"""
+        phrases = []
+        for phrase in re.findall(r'"([^"]+)"', query):
+            tokens = ChunkSelector.TOKEN_PATTERN.findall(phrase.lower())
+            phrase_terms = [(i, index_term(t)) for i, t in enumerate(tokens) if indexable(t)]
+            if phrase_terms:
+                phrases.append(phrase_terms)
+        loose = re.sub(r'"[^"]*"', " ", query)
+        terms = [index_term(t) for t in ChunkSelector.TOKEN_PATTERN.findall(loose.lower()) if indexable(t)]
+        return list(dict.fromkeys(terms)), phrases
+
+    @staticmethod
+    def _pair(lookup: Dict[str, Tuple[np.ndarray, np.ndarray]], term: str, doc: int) -> Optional[int]:
+        """Postings pair of (term, doc) — a term's docs are sorted, so binary search"""
+        docs, pairs = lookup[term]
+        i = int(np.searchsorted(docs, doc))
+        return int(pairs[i]) if i < len(docs) and docs[i] == doc else None
+
+    @staticmethod
+    def _phrase_starts(segment: IndexSegment, lookup: Dict[str, Tuple[np.ndarray, np.ndarray]], doc: int,
+                       phrase: List[Tuple[int, str]]) -> np.ndarray:
+        """Token positions in doc where the phrase starts"""
+        starts = None
+        for offset, term in phrase:
+            pair = TranscriptIndex._pair(lookup, term, doc)
+            if pair is None:
+                return np.empty(0, dtype=np.int64)
+            shifted = segment.positions_of(pair) - offset
+            starts = shifted if starts is None else np.intersect1d(starts, shifted, assume_unique=True)
+            if not len(starts):
+                break
+        return starts
+
+    def search(self, query: str, limit: int = 10, hits_per_video: int = 3) -> List[Dict]:
+        """
+        Ranked videos for a query, each with its best moments
+        Returns: [{'video_id', 'title', 'score', 'hits': [{'time', 'snippet'}]}]
+        """
+        terms, phrases = self.parse_query(query)
+        all_terms = list(dict.fromkeys(terms + [t for phrase in phrases for _, t in phrase]))
+        if not all_terms:
+            return []
+
+        with metrics.span("transcript_search") as span:
+            with self._lock:
+                segments = [segment for _, segment in self._segments]
+            total_docs = sum(len(s) for s in segments)
+            if not total_docs:
+                return []
+            avg_len = max(sum(s.total_tokens for s in segments) / total_docs, 1.0)
+
+            looked_up = [{t: s.postings(t) for t in all_terms} for s in segments]
+            df = {t: sum(len(lookup[t][0]) for lookup in looked_up) for t in all_terms}
+            idf = {t: float(np.log(1 + (total_docs - df[t] + 0.5) / (df[t] + 0.5))) for t in all_terms}
+
+            candidates = []
+            for si, (segment, lookup) in enumerate(zip(segments, looked_up)):
+                scores = np.zeros(len(segment))
+                norm = self.K1 * (1 - self.B + self.B * segment.doc_len / avg_len)
+                matched = np.zeros(len(segment), dtype=bool)
+                for term in all_terms:
+                    docs, pairs = lookup[term]
+                    if not len(docs):
+                        continue
+                    tf = segment.pair_ptr[pairs + 1] - segment.pair_ptr[pairs]
+                    scores[docs] += idf[term] * tf * (self.K1 + 1) / (tf + norm[docs])
+                    matched[docs] = True
+
+                docs = np.flatnonzero(matched)
+                if phrases:
+                    # Quoted phrases are required: keep only videos where every phrase occurs in order
+                    docs = [d for d in docs.tolist()
+                            if all(len(self._phrase_starts(segment, lookup, d, p)) for p in phrases)]
+                candidates.extend((float(scores[d]), si, int(d)) for d in docs)
+
+            top = heapq.nlargest(limit, candidates)
+            results = [self._result(segments[si], looked_up[si], doc, score, terms, phrases, idf, hits_per_video)
+                       for score, si, doc in top]
+            span["results"] = str(len(results))
+        metrics.incr("transcript_searches")
+        return results
+
+    def _result(self, segment: IndexSegment, lookup: Dict, doc: int, score: float, terms: List[str],
+                phrases: List[List[Tuple[int, str]]], idf: Dict[str, float], hits_per_video: int) -> Dict:
+        """Best non-overlapping windows of one video, with caption time and snippet"""
+        marks: List[Tuple[int, float, str]] = []  # (position, weight, term)
+        for term in terms:
+            pair = self._pair(lookup, term, doc)
+            if pair is not None:
+                marks.extend((int(p), idf[term], term) for p in segment.positions_of(pair))
+        for i, phrase in enumerate(phrases):
+            weight = sum(idf[t] for _, t in phrase) * 2
+            marks.extend((int(p), weight, f'"{i}') for p in self._phrase_starts(segment, lookup, doc, phrase))
+        marks.sort()
+
+        # Score each window starting at a mark by the distinct terms it covers
+        windows = []
+        right = 0
+        for left, (start, _, _) in enumerate(marks):
+            right = max(right, left)
+            while right + 1 < len(marks) and marks[right + 1][0] - start < self.WINDOW_TOKENS:
+                right += 1
+            covered = {}
+            for _, weight, term in marks[left:right + 1]:
+                covered[term] = weight
+            windows.append((sum(covered.values()), start))
+
+        chosen: List[int] = []
+        for _, start in sorted(windows, key=lambda w: (-w[0], w[1])):
+            if len(chosen) >= hits_per_video:
+                break
+            if all(abs(start - other) >= self.WINDOW_TOKENS for other in chosen):
+                chosen.append(start)
+
+        captions = segment.captions(doc) if chosen else []
+        highlight = set(terms) | {t for phrase in phrases for _, t in phrase}
+        hits = []
+        for start in sorted(chosen):
+            caption = segment.caption_at(doc, start)
+            snippet = " ".join(captions[max(caption - 1, 0):caption + 2])
+            hits.append({"time": segment.time_at(doc, caption), "snippet": self.highlight(snippet, highlight)})
+        return {"video_id": segment.videos[doc], "title": segment.titles[doc],
+                "score": round(score, 3), "hits": hits}
+
+    @staticmethod
+    def highlight(text: str, terms: set) -> str:
+        """Bold the words that matched (markdown)"""
+        def bold(match):
+            word = match.group(0)
+            return f"**{word}**" if index_term(word.lower()) in terms else word
+        return re.sub(r"[A-Za-z0-9][A-Za-z0-9'\-]*[A-Za-z0-9]", bold, text)
+
+
+# ✅ Process-wide index shared by every Streamlit session
+transcript_index = TranscriptIndex()
@@ -0,0 +1,115 @@
+"""
+Transcript Normalizer - Compacts raw YouTube captions before prompting
+Strips non-speech markers and fillers, removes rolling-caption overlap and
+merges one-word-per-line fragments into sentences in a single pass.
+"""
+
+import re
+from typing import Dict, Iterable, List, Tuple, Union
+
+from utils.metrics import metrics
+
+
+class TranscriptNormalizer:
+    """Single-pass caption cleanup with precompiled patterns"""
+
+    # Caption cues that are never speech: [Music], (applause), [Laughter], [Foreign] ...
+    CUE_WORDS = (r"music|applause|laugh\w*|inaudible|indistinct|unintelligible|silence|cheer\w*"
+                 r"|crosstalk|foreign|noise|clap\w*|cough\w*|sigh\w*|blank_audio")
+
+    # [Music], (laughs), ♪ lyrics ♪, >> speaker changes, and fillers that are never content
+    NOISE_PATTERN = re.compile(
+        rf"\[[^\]]{{0,20}}?\b(?:{CUE_WORDS})\b[^\]]{{0,20}}\]"
+        rf"|\([^)]{{0,20}}?\b(?:{CUE_WORDS})\b[^)]{{0,20}}\)"
+        r"|♪[^♪]{0,200}♪|[♪♫]+"
+        r"|>>+"
+        r"|\b(?:um+|uh+|erm+|ah+|hmm+)\b[,.]?",
+        re.IGNORECASE,
+    )
+    SPACE_PATTERN = re.compile(r"\s+")
+    SPACE_BEFORE_PUNCT = re.compile(r"\s+([,.!?;:])")
+    SENTENCE_END = re.compile(r"[.!?][\"')\]]?$")
+
+    # Longest caption overlap checked when de-duplicating rolling captions
+    MAX_OVERLAP_WORDS = 30
+
+    # Auto-captions have no punctuation — wrap into lines of this many words
+    WORDS_PER_LINE = 25
+
+    @staticmethod
+    def _words(text: str) -> List[str]:
+        text = TranscriptNormalizer.NOISE_PATTERN.sub(" ", text)
+        text = TranscriptNormalizer.SPACE_BEFORE_PUNCT.sub(r"\1", text)
+        return TranscriptNormalizer.SPACE_PATTERN.sub(" ", text).strip().split(" ") if text.strip() else []
+
+    @staticmethod
+    def _overlap(tail: List[str], head: List[str]) -> int:
+        """
+        Largest k where the last k output words equal the first k new words
+        A single repeated word counts unless it ended a sentence ("... the end." / "End users")
+        """
+        limit = min(len(tail), len(head), TranscriptNormalizer.MAX_OVERLAP_WORDS)
+        if not limit:
+            return 0
+        tail_lower = [w.lower().strip(",.!?") for w in tail[-limit:]]
+        head_lower = [w.lower().strip(",.!?") for w in head[:limit]]
+        for k in range(limit, 0, -1):
+            if tail_lower[-k:] == head_lower[:k]:
+                if k == 1 and len(head) > 1 and TranscriptNormalizer.SENTENCE_END.search(tail[-1]):
+                    continue
+                return k
+        return 0
+
+    @staticmethod
+    def normalize(segments: Iterable[Union[str, Dict]]) -> Tuple[str, Dict]:
+        """
+        Clean caption segments (raw strings or {'text': ...} dicts)
+        Returns: (normalized_text, stats) — stats include the compression ratio
+        """
+        with metrics.span("transcript_normalize"):
+            raw_chars = 0
+            raw_segments = 0
+            words: List[str] = []
+            lines: List[str] = []
+            line_start = 0
+            duplicate_words = 0
+
+            for segment in segments:
+                text = segment.get("text", "") if isinstance(segment, dict) else str(segment)
+                raw_chars += len(text) + 1
+                raw_segments += 1
+
+                new_words = TranscriptNormalizer._words(text)
+                if not new_words:
+                    continue
+
+                # Rolling captions repeat the previous line's tail — keep only the new part
+                k = TranscriptNormalizer._overlap(words, new_words)
+                duplicate_words += k
+                words.extend(new_words[k:])
+
+                # Flush completed sentences (or long unpunctuated runs) as lines
+                if words and (TranscriptNormalizer.SENTENCE_END.search(words[-1])
+                              or len(words) - line_start >= TranscriptNormalizer.WORDS_PER_LINE):
+                    lines.append(" ".join(words[line_start:]))
+                    line_start = len(words)
+
+            if line_start < len(words):
+                lines.append(" ".join(words[line_start:]))
+
+            text = "\n".join(lines)
+            clean_chars = len(text)
+            ratio = clean_chars / raw_chars if raw_chars else 1.0
+            stats = {
+                "raw_chars": raw_chars,
+                "clean_chars": clean_chars,
+                "raw_segments": raw_segments,
+                "lines": len(lines),
+                "duplicate_words": duplicate_words,
+                "compression_ratio": round(ratio, 3),
+            }
+
+        metrics.set_gauge("transcript_compression_ratio_last", ratio)
+        metrics.incr("transcript_chars_raw", raw_chars)
+        metrics.incr("transcript_chars_clean", clean_chars)
+        return text, stats